@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# Benchmark-Suite für die Heat-Analyse und die LSTM-Pipeline.
+#
+#   python benchmark.py                                   # 10k, 100k, 1M, 10M Zeilen
+#   python benchmark.py --sizes 10k,100k -o bench.json
+#   python benchmark.py --save-baseline data/tests/bench/baseline.json
+#   python benchmark.py --baseline data/tests/bench/baseline.json   # Exit-Code 1 bei Regressionen
+#
+# Die Testdaten erzeugt lstm/simulate.py (fester Seed, einmal erzeugt und unter
+# data/tests/bench wiederverwendet). Jede Größe läuft in einem frischen Prozess,
+# damit Peak-RSS und TensorFlow-Zustand nicht von der vorherigen Größe abhängen.
+# Gemessen wird jede Stufe so, wie die Skripte sie aufrufen: CSV laden, Skalierung,
+# Sequenzen, eine Trainings-Epoche, Batch-Predict, autoregressive Prognose (kalt =
+# mit Tracing, warm), Rolling-Statistiken und Plot-Rendering. Nur CPU, kein Netz.
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '-1')  # CPU only, also on machines with a GPU
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, 'lstm'))
+
+DEFAULT_SIZES = '10k,100k,1M,10M'
+DEFAULT_DATA_DIR = 'data/tests/bench'
+SIZE_SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+def format_size(rows):
+    for suffix, factor in (('M', 1_000_000), ('k', 1_000)):
+        if rows >= factor and rows % factor == 0:
+            return f'{rows // factor}{suffix}'
+    return str(rows)
+
+# --- Messung --------------------------------------------------------------
+
+def reset_peak_rss():
+    # Linux (x86 und Pi): "5" setzt VmHWM auf die aktuelle RSS zurück
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def peak_rss_mb():
+    """Peak RSS since the last reset_peak_rss() (process lifetime where that isn't supported)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class StageTimer:
+    def __init__(self, repeat=1, quiet=True):
+        self.repeat = repeat
+        self.quiet = quiet
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def output(self):
+        """Hide what the benchmarked functions print, unless verbose."""
+        if not self.quiet:
+            yield
+            return
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    def run(self, name, fn, repeat=None, **info):
+        """Run fn() `repeat` times; records the fastest run and the peak RSS, returns fn's result."""
+        times, peak, result = [], 0.0, None
+        for _ in range(repeat or self.repeat):
+            reset_peak_rss()
+            with self.output():
+                start = time.perf_counter()
+                result = fn()
+                times.append(time.perf_counter() - start)
+            peak = max(peak, peak_rss_mb())
+        self.stages[name] = {'seconds': round(min(times), 4), 'peak_rss_mb': peak, **info}
+        print(f"  {name:<16} {min(times):9.3f}s  {peak:8.1f} MB", flush=True)
+        return result
+
+# --- Pipeline (läuft im Kindprozess) -------------------------------------
+
+def run_pipeline(csv_path, rows, opts):
+    import matplotlib
+    matplotlib.use('Agg')
+    import tensorflow as tf
+    from sklearn.preprocessing import MinMaxScaler
+
+    from heat_store import load_telemetry
+    from lstm_model_little import build_model, calculate_training_params, forecast_future, prepare_sequences
+    from python_analysis import decimate_minmax, plot_boxplots, render_time_window, time_windows
+    from rolling_stats import compute_window
+    from sequences import split_chronological
+    from streaming import array_dataset
+
+    if opts['threads']:
+        tf.config.threading.set_intra_op_parallelism_threads(opts['threads'])
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    tf.keras.utils.set_random_seed(opts['seed'])
+    timer = StageTimer(opts['repeat'], quiet=not opts['verbose'])
+    seq_length = opts['seq_length']
+    import_rss = current_rss_mb()  # libraries loaded, no data yet
+
+    df = timer.run('csv_load', lambda: load_telemetry(csv_path))
+
+    def scale():
+        data = df[['temp', 'avg_mhz']].values
+        scalers = MinMaxScaler(), MinMaxScaler()
+        scaled = np.column_stack((
+            scalers[0].fit_transform(data[:, 0].reshape(-1, 1)),
+            scalers[1].fit_transform(data[:, 1].reshape(-1, 1))
+        ))
+        return scaled, scalers
+    data_scaled, scalers = timer.run('scaling', scale)
+
+    def sequences():
+        X, y, _ = prepare_sequences(data_scaled, df['timestamp'].values, seq_length)
+        return split_chronological(X, y, 0.7, 0.15)
+    (X_train, y_train), _, (X_test, y_test) = timer.run('sequences', sequences)
+
+    with timer.output():
+        epochs, batch_size = calculate_training_params(rows, opts['training_ratio'])
+        model = build_model(seq_length)
+    n_train = min(len(X_train), opts['max_train_windows'])
+    # The most recent windows, like the end of a real training run sees them
+    X_fit, y_fit = X_train[-n_train:], y_train[-n_train:]
+    timer.run('train_epoch', lambda: model.fit(array_dataset(X_fit, y_fit, batch_size, shuffle=True), epochs=1, verbose=0),
+              windows=n_train, batch_size=batch_size, planned_epochs=epochs)
+    timer.stages['train_epoch']['windows_per_s'] = round(n_train / timer.stages['train_epoch']['seconds'], 1)
+
+    n_predict = min(len(X_test), opts['max_predict_windows'])
+    timer.run('predict', lambda: model.predict(X_test[:n_predict], verbose=0), windows=n_predict)
+
+    mean_mhz = df['avg_mhz'].mean()
+    steps = opts['forecast_steps']
+    timer.run('forecast_cold', lambda: forecast_future(model, X_test[-1], steps, scalers, mean_mhz), repeat=1, steps=steps)
+    timer.run('forecast', lambda: forecast_future(model, X_test[-1], steps, scalers, mean_mhz), steps=steps)
+
+    def rolling():
+        return {name: decimate_minmax(compute_window(df, w['minutes'], w['window_size']), ['temp', 'avg_mhz'])
+                for name, w in time_windows.items()}
+    windows = timer.run('rolling_stats', rolling, windows=len(time_windows))
+
+    with tempfile.TemporaryDirectory() as graph_dir:
+        def render():
+            for i, (name, window_df) in enumerate(windows.items()):
+                if len(window_df):
+                    render_time_window(window_df, f'{graph_dir}/plot_{i}_{name}.png', name,
+                                       time_windows[name]['window_size'])
+        timer.run('plot_render', render, windows=len(windows))
+        timer.run('boxplot', lambda: plot_boxplots(df, graph_dir, show=False))
+
+    return {
+        'rows': rows,
+        'stages': timer.stages,
+        'import_rss_mb': import_rss,
+        'peak_rss_mb': max(stage['peak_rss_mb'] for stage in timer.stages.values()),
+    }
+
+# --- Daten, Ergebnisse, Baseline -----------------------------------------
+
+def ensure_data(rows, data_dir, seed, interval=1.0):
+    """Synthetic CSV with `rows` rows (generated once, then reused)."""
+    from simulate import simulate, write_csv
+    path = os.path.join(data_dir, f'sim_{format_size(rows)}_seed{seed}.csv')
+    if not os.path.exists(path):
+        print(f"Generating {rows} rows -> {path}", flush=True)
+        tmp = path + '.tmp'
+        write_csv(simulate('2025-01-01', rows * interval, interval, seed), tmp, interval)
+        os.replace(tmp, path)
+    return path
+
+def machine_info():
+    import pandas as pd
+    info = {
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'node': platform.node(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'cpus': os.cpu_count(),
+    }
+    try:
+        from importlib.metadata import version
+        info['tensorflow'] = version('tensorflow')
+    except Exception:
+        pass
+    return info
+
+def compare(results, baseline, time_threshold=0.2, rss_threshold=0.25, min_seconds=0.05, min_rss_mb=20.0):
+    """Print current vs. baseline per size and stage; returns the list of regressions."""
+    if baseline['meta'].get('machine') != results['meta'].get('machine'):
+        print(f"Warning: baseline is from {baseline['meta'].get('machine')}, this is {results['meta'].get('machine')}")
+    regressions = []
+    print(f"\n{'size':>6} {'stage':<16} {'base s':>9} {'now s':>9} {'ratio':>6} {'base MB':>8} {'now MB':>8}")
+    for size, current in results['sizes'].items():
+        base_size = baseline['sizes'].get(size)
+        if base_size is None:
+            continue
+        for stage, now in current['stages'].items():
+            base = base_size['stages'].get(stage)
+            if base is None:
+                continue
+            ratio = now['seconds'] / base['seconds'] if base['seconds'] else math.inf
+            flags = []
+            if now['seconds'] - base['seconds'] > min_seconds and ratio > 1 + time_threshold:
+                flags.append('SLOWER')
+            if (now['peak_rss_mb'] - base['peak_rss_mb'] > min_rss_mb
+                    and now['peak_rss_mb'] > base['peak_rss_mb'] * (1 + rss_threshold)):
+                flags.append('MORE MEMORY')
+            if flags:
+                regressions.append((size, stage, flags))
+            print(f"{format_size(int(size)):>6} {stage:<16} {base['seconds']:9.3f} {now['seconds']:9.3f} {ratio:6.2f} "
+                  f"{base['peak_rss_mb']:8.1f} {now['peak_rss_mb']:8.1f}  {' '.join(flags)}")
+    return regressions
+
+def write_json(data, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the heat analytics and LSTM pipeline')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma-separated row counts, e.g. 10k,100k,1M')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where the synthetic CSVs are cached')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default=None, help='Results JSON (default: <data-dir>/results_<machine>.json)')
+    parser.add_argument('--baseline', default=None, help='Compare against this results JSON')
+    parser.add_argument('--save-baseline', default=None, help='Also write the results to this path')
+    parser.add_argument('--time-threshold', type=float, default=0.2, help='Allowed slowdown per stage (0.2 = +20%%)')
+    parser.add_argument('--rss-threshold', type=float, default=0.25, help='Allowed peak RSS growth per stage')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per stage, the fastest one counts')
+    parser.add_argument('--threads', type=int, default=None, help='TensorFlow threads (default: all cores)')
+    parser.add_argument('--seq-length', type=int, default=20)
+    parser.add_argument('--training-ratio', type=float, default=0.01, help='As in lstm_model_little.py')
+    parser.add_argument('--max-train-windows', type=int, default=50_000, help='Windows in the timed epoch')
+    parser.add_argument('--max-predict-windows', type=int, default=100_000)
+    parser.add_argument('--forecast-steps', type=int, default=600)
+    parser.add_argument('-v', '--verbose', action='store_true', help='Show the output of the benchmarked functions')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    opts = {key: getattr(args, key) for key in ('seed', 'repeat', 'threads', 'seq_length', 'training_ratio',
+                                                 'max_train_windows', 'max_predict_windows', 'forecast_steps',
+                                                 'verbose')}
+    results = {
+        'meta': {**machine_info(), 'date': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'options': opts},
+        'sizes': {},
+    }
+    output = args.output or os.path.join(args.data_dir, f"results_{results['meta']['machine']}.json")
+
+    for rows in sizes:
+        csv_path = ensure_data(rows, args.data_dir, args.seed)
+        print(f"\n{format_size(rows)} rows ({csv_path})", flush=True)
+        # Fresh process per size: own peak RSS, no TensorFlow state from the previous size
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            results['sizes'][str(rows)] = pool.submit(run_pipeline, csv_path, rows, opts).result()
+        write_json(results, output)  # keep finished sizes if a later one fails
+
+    print(f"\nResults saved to {output}")
+    if args.save_baseline:
+        write_json(results, args.save_baseline)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.time_threshold, args.rss_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.baseline}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# Binärer, spaltenfester Speicher für die Heat-Telemetrie.
+#
+# Layout: <store>/schema.json + ein Segment pro UTC-Tag (<YYYY-MM-DD>.bin).
+# Jedes Segment ist ein Array fester Records (int64 epoch ms + float32 Spalten),
+# wird nur angehängt und ist per np.memmap direkt lesbar. Die Segmentnamen sind
+# der grobe Zeitindex, innerhalb eines Segments wird per searchsorted gesucht.
+
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE = 'data/store'
+DEFAULT_COLUMNS = ['temp', 'avg_mhz']
+EPOCH = pd.Timestamp(0, tz='UTC')
+SEGMENT_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})\.bin$')
+
+class HeatStore:
+    def __init__(self, path=DEFAULT_STORE, columns=None, create=False):
+        """Open the store at path; only writers (create=True) set up a missing one."""
+        self.path = path
+        schema_path = os.path.join(path, 'schema.json')
+        if os.path.exists(schema_path):
+            with open(schema_path) as f:
+                self.columns = json.load(f)['columns']
+            if columns is not None and list(columns) != self.columns:
+                raise ValueError(f"Store {path} has columns {self.columns}, not {list(columns)}")
+        elif not create:
+            raise FileNotFoundError(f"{path} is not a heat store (no schema.json); convert a log with heat_store.py first")
+        else:
+            self.columns = list(columns or DEFAULT_COLUMNS)
+            os.makedirs(path, exist_ok=True)
+            with open(schema_path, 'w') as f:
+                json.dump({'columns': self.columns, 'time_unit': 'ms'}, f)
+        self.dtype = np.dtype([('ts', '<i8')] + [(col, '<f4') for col in self.columns])
+
+    # --- Schreiben -------------------------------------------------------
+
+    def append(self, ts_ms, values):
+        """Append rows; ts_ms is int64 epoch milliseconds, values maps column -> array.
+
+        Rows must be appended in time order. Missing columns are stored as NaN.
+        """
+        ts_ms = np.asarray(ts_ms, dtype=np.int64)
+        if len(ts_ms) == 0:
+            return
+        records = np.empty(len(ts_ms), dtype=self.dtype)
+        records['ts'] = ts_ms
+        for col in self.columns:
+            records[col] = values[col] if col in values else np.nan
+
+        days = ts_ms // 86_400_000
+        boundaries = np.flatnonzero(np.diff(days)) + 1
+        for part in np.split(records, boundaries):
+            day = datetime.fromtimestamp(part['ts'][0] / 1000, tz=timezone.utc).date()
+            with open(self._segment_path(day), 'ab') as f:
+                f.write(part.tobytes())
+
+    def append_frame(self, df, after=None):
+        """Append a DataFrame with a 'timestamp' column plus data columns.
+
+        Rows at or before `after` (e.g. last_timestamp()) are skipped, so
+        re-running a conversion only adds what is new. Returns the row count.
+        """
+        ts = pd.to_datetime(df['timestamp'], utc=True, format='ISO8601')
+        keep = np.ones(len(df), dtype=bool) if after is None else (ts > after).to_numpy()
+        ts_ms = ((ts - EPOCH) // pd.Timedelta(milliseconds=1)).to_numpy()[keep]
+        self.append(ts_ms, {col: df[col].to_numpy()[keep] for col in df.columns if col in self.columns})
+        return int(keep.sum())
+
+    # --- Lesen -----------------------------------------------------------
+
+    def _segment_path(self, day):
+        return os.path.join(self.path, f'{day.isoformat()}.bin')
+
+    def segments(self):
+        """Sorted list of (date, path) for all non-empty segments."""
+        found = []
+        for name in os.listdir(self.path):
+            match = SEGMENT_RE.match(name)
+            path = os.path.join(self.path, name)
+            if match and os.path.getsize(path) > 0:
+                found.append((datetime.strptime(match.group(1), '%Y-%m-%d').date(), path))
+        return sorted(found)
+
+    def _memmap(self, path):
+        return np.memmap(path, dtype=self.dtype, mode='r')
+
+    def last_timestamp(self):
+        segments = self.segments()
+        if not segments:
+            return None
+        return pd.Timestamp(int(self._memmap(segments[-1][1])['ts'][-1]), unit='ms', tz='UTC')
+
+    def read_records(self, start=None, end=None):
+        """Structured record array for [start, end); only overlapping segments are opened."""
+        start_ms = None if start is None else pd.Timestamp(start).value // 1_000_000
+        end_ms = None if end is None else pd.Timestamp(end).value // 1_000_000
+        parts = []
+        for day, path in self.segments():
+            day_start = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+            if end_ms is not None and day_start >= end_ms:
+                break
+            if start_ms is not None and day_start + 86_400_000 <= start_ms:
+                continue
+            records = self._memmap(path)
+            lo = 0 if start_ms is None else np.searchsorted(records['ts'], start_ms, side='left')
+            hi = len(records) if end_ms is None else np.searchsorted(records['ts'], end_ms, side='left')
+            parts.append(records[lo:hi])
+        if not parts:
+            return np.empty(0, dtype=self.dtype)
+        return np.concatenate(parts)
+
+    def read(self, start=None, end=None, columns=None):
+        """DataFrame with a UTC 'timestamp' column, like the CSV loaders return."""
+        records = self.read_records(start, end)
+        df = pd.DataFrame({'timestamp': pd.to_datetime(records['ts'], unit='ms', utc=True)})
+        for col in columns or self.columns:
+            df[col] = records[col]
+        return df
+
+    def last(self, minutes, columns=None):
+        """Rows of the last `minutes` before the newest record (10 min, 4 h, 1 w ...)."""
+        last = self.last_timestamp()
+        if last is None:
+            return self.read(columns=columns)
+        return self.read(start=last - timedelta(minutes=minutes), columns=columns)
+
+def load_telemetry(source, columns=None):
+    """Load telemetry from a HeatStore directory or a CSV file."""
+    if os.path.isdir(source):
+        return HeatStore(source).read(columns=columns)
+    return pd.read_csv(source, parse_dates=['timestamp'])
+
+# --- Konverter -----------------------------------------------------------
+
+def convert_csv(csv_path, store_path=DEFAULT_STORE, chunksize=500_000):
+    header = pd.read_csv(csv_path, nrows=0).columns
+    store = HeatStore(store_path, columns=[col for col in header if col != 'timestamp'], create=True)
+    last, rows = store.last_timestamp(), 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        rows += store.append_frame(chunk.dropna(subset=['timestamp']), after=last)
+    print(f"Converted {rows} rows from {csv_path} into {store_path}")
+    return store
+
+def convert_json(json_path, store_path=DEFAULT_STORE, workers=None):
+    # Legacy-Logs: eine JSON-Zeile pro Messung, Temperatur teilweise mit Dezimalkomma.
+    # Parallel und fortsetzbar über legacy/json_to_csv.py (merkt sich den Byte-Offset).
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from legacy.json_to_csv import convert
+    rows, rejects = convert(json_path, store_path=store_path, workers=workers)
+    print(f"Converted {rows} rows from {json_path} into {store_path} ({rejects} rejected lines)")
+    return HeatStore(store_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert heat logs into the binary store')
+    parser.add_argument('source', help='CSV log (temp_log_multi.csv) or legacy JSON log')
+    parser.add_argument('-s', '--store', default=DEFAULT_STORE, help='Store directory')
+    args = parser.parse_args()
+
+    if args.source.endswith('.json'):
+        convert_json(args.source, args.store)
+    else:
+        convert_csv(args.source, args.store)
@@ -22,7 +22,7 @@ echo "Creating analysis wrapper script..."
 cat <<EOL > "$run_analysis_path"
 #!/bin/bash
 source "$venv_path/bin/activate"
-python3 "$python_analysis_path"
+python3 "$python_analysis_path" --batch
 deactivate
 EOL
 
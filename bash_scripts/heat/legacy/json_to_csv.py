@@ -1,57 +1,205 @@
 #!/usr/bin/env python3
+# Converter for the legacy JSON heat logs (one {"timestamp": ..., "temp": 61,0} per line).
+#
+#   python legacy/json_to_csv.py                              # data/temp_log.json -> data/temp_log.csv
+#   python legacy/json_to_csv.py archive.json -o out.csv -w 8
+#   python legacy/json_to_csv.py archive.json --store data/store
+#
+# The file is cut into byte ranges (aligned to line ends) that a process pool
+# parses in parallel. Each range is matched with one precompiled pattern for the
+# known record shape; only lines that don't match it go through json.loads.
+# Results are written in bulk and in file order. A state file remembers the byte
+# offset of the last converted line, so a re-run only converts what was appended.
+
+import argparse
 import json
+import os
 import re
-import csv
-from datetime import datetime
+import sys
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from heat_store import HeatStore
+
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# {"timestamp": "2025-03-01T12:00:00+01:00", "temp": 61,0} exactly as the logger wrote it, temperature with
+# decimal comma or point. Only timestamps already in datetime.isoformat() form match, so the fast path can
+# write them unchanged. Any other non-empty line is captured whole (third group) for the json.loads fallback.
+LINE = re.compile(
+    rb'^(?:\{"timestamp": "(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.\d{6})?(?:[+-]\d\d:\d\d)?)", '
+    rb'"temp": (-?\d+(?:[.,]\d+)?)\}\r?|(.+))$',
+    re.MULTILINE,
+)
+FIX_COMMA = re.compile(r'("temp":\s*)(-?\d+),(\d+)')
+
+def byte_ranges(path, start=0, chunk_bytes=CHUNK_BYTES):
+    """[start, end) ranges that each end after a newline; a trailing partial line is left out."""
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        ranges = []
+        while start < size:
+            f.seek(min(start + chunk_bytes, size) - 1)
+            f.readline()  # move to the end of the line containing the cut
+            end = f.tell()
+            if end == size:
+                f.seek(size - 1)
+                if f.read(1) != b'\n':
+                    # Last line is still being written; stop after the last complete one
+                    f.seek(start)
+                    end = start + f.read(size - start).rfind(b'\n') + 1
+                    if end <= start:
+                        break
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def parse_odd_line(line):
+    """json.loads fallback for lines the fast pattern doesn't match; (timestamp, temp, b'') or None."""
+    try:
+        entry = json.loads(FIX_COMMA.sub(r'\1\2.\3', line.decode('utf-8', 'replace')))
+        ts, temp = entry['timestamp'], float(entry['temp'])
+        return datetime.fromisoformat(ts).isoformat().encode(), repr(temp).encode(), b''
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def parse_block(data):
+    """(timestamp, temp, _) byte tuples of the lines in data plus the number of rejected lines."""
+    found = LINE.findall(data)
+    odd = [i for i, (_, _, line) in enumerate(found) if line]
+    rejects = 0
+    for i in odd:
+        line = found[i][2].strip()
+        found[i] = parse_odd_line(line) if line else None  # blank lines are skipped, not rejected
+        rejects += bool(line) and found[i] is None
+    if odd:
+        found = [record for record in found if record is not None]
+    return found, rejects
+
+def epoch_ms(timestamps):
+    """int64 epoch milliseconds of isoformat() timestamps (bytes); naive ones count as UTC."""
+    # numpy parses the local part, the few distinct UTC offsets are looked up once each
+    local = [ts[:26] if ts[19:20] == b'.' else ts[:19] for ts in timestamps]
+    suffixes = [ts[len(base):] for ts, base in zip(timestamps, local)]
+    offset_ms = {suffix: datetime.fromisoformat('2000-01-01T00:00:00' + suffix.decode()).utcoffset()
+                 // timedelta(milliseconds=1) if suffix else 0 for suffix in set(suffixes)}
+    return (np.array(local, dtype='datetime64[ms]').astype(np.int64)
+            - np.array([offset_ms[suffix] for suffix in suffixes], dtype=np.int64))
+
+def parse_range(task):
+    """Worker: convert bytes [start, end) of the log.
+
+    Returns the CSV lines (bytes, if as_csv), epoch ms and temperatures (if
+    as_arrays), the row count and the number of rejected lines.
+    """
+    path, start, end, as_csv, as_arrays = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        records, rejects = parse_block(f.read(end - start))
+
+    # Few distinct temperature spellings, so format each one once: same text as float() + csv would give
+    canonical = {raw: repr(float(raw.replace(b',', b'.'))).encode() for raw in {record[1] for record in records}}
+    csv_block = b''.join([record[0] + b',' + canonical[record[1]] + b'\n' for record in records]) if as_csv else None
+    arrays = None
+    if as_arrays:
+        arrays = (epoch_ms([record[0] for record in records]),
+                  np.array([canonical[record[1]] for record in records]).astype(np.float64))
+    return csv_block, arrays, len(records), rejects
+
+class OffsetState:
+    """Byte offset of the last converted line, per source file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def resume_offset(self, source):
+        entry = self.state.get(os.path.abspath(source))
+        if entry is None or os.path.getsize(source) < entry['offset']:
+            return 0  # new or truncated/rotated log: start over
+        return entry['offset']
+
+    def forget(self, source):
+        self.state.pop(os.path.abspath(source), None)
+
+    def update(self, source, offset, rows, rejects):
+        entry = self.state.setdefault(os.path.abspath(source), {'offset': 0, 'rows': 0, 'rejects': 0})
+        entry['offset'] = offset
+        entry['rows'] += rows
+        entry['rejects'] += rejects
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp, self.path)
+
+def convert(json_path, csv_path=None, store_path=None, workers=None, chunk_bytes=CHUNK_BYTES, state_path=None):
+    """Convert the log into a CSV and/or a HeatStore; returns (rows, rejects)."""
+    if not csv_path and not store_path:
+        raise ValueError("Need a CSV path or a store path")
+    state = OffsetState(state_path or f'{csv_path or os.path.join(store_path, "legacy")}.offsets.json')
+    start = state.resume_offset(json_path)
+    if csv_path and not os.path.exists(csv_path):
+        start = 0  # CSV was removed: convert everything again
+    if start == 0:
+        state.forget(json_path)
+    ranges = byte_ranges(json_path, start, chunk_bytes)
+
+    csv_file = None
+    if csv_path:
+        csv_file = open(csv_path, 'ab' if start else 'wb')
+        if not start:
+            csv_file.write(b'timestamp,temp\n')
+    store = HeatStore(store_path, create=True) if store_path else None
+    last = store.last_timestamp() if store else None
+    last_ms = None if last is None else last.value // 1_000_000
+
+    rows = rejects = 0
+    tasks = [(json_path, s, e, csv_file is not None, store is not None) for s, e in ranges]
+    try:
+        with Pool(workers) as pool:
+            # imap keeps file order while later ranges are already being parsed
+            for (_, end), (csv_block, arrays, count, bad) in zip(ranges, pool.imap(parse_range, tasks)):
+                if csv_file:
+                    csv_file.write(csv_block)
+                    csv_file.flush()
+                if store:
+                    ts_ms, temps = arrays
+                    if last_ms is not None:
+                        # Rows already in the store (e.g. converted before the state file existed)
+                        keep = ts_ms > last_ms
+                        ts_ms, temps = ts_ms[keep], temps[keep]
+                    store.append(ts_ms, {'temp': temps})
+                rows += count
+                rejects += bad
+                state.update(json_path, end, count, bad)
+    finally:
+        if csv_file:
+            csv_file.close()
+    return rows, rejects
 
 def main():
-    log_file = "data/temp_log.json"  # Path to your log file
-    csv_file = "data/temp_log.csv"   # Path to your output CSV file
-
-    with open(log_file, "r") as f, open(csv_file, "w", newline='') as csvfile:
-        fieldnames = ['timestamp', 'temp']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Preprocess the line:
-            # Replace the comma in the "temp" value (e.g., "temp": 61,0) with a dot.
-            # This regex handles an optional negative sign.
-            line_fixed = re.sub(r'("temp":\s*)(-?\d+),(\d+)', r'\1\2.\3', line)
-            
-            try:
-                entry = json.loads(line_fixed)
-            except json.JSONDecodeError:
-                print(f"Skipping invalid JSON line: {line_fixed}")
-                continue
-
-            ts = entry.get("timestamp")
-            temp = entry.get("temp")
-
-            if not ts or temp is None:
-                continue
-
-            # Parse the ISO 8601 timestamp
-            try:
-                dt = datetime.fromisoformat(ts)
-            except Exception as e:
-                print(f"Skipping invalid timestamp '{ts}': {e}")
-                continue
-
-            # Convert temperature to float (it should already be fixed by our regex)
-            try:
-                temp = float(temp)
-            except ValueError:
-                print(f"Skipping invalid temperature '{temp}'")
-                continue
-
-            writer.writerow({'timestamp': dt.isoformat(), 'temp': temp})
-
-    print(f"CSV file saved as {csv_file}")
+    parser = argparse.ArgumentParser(description='Convert legacy JSON heat logs')
+    parser.add_argument('source', nargs='?', default='data/temp_log.json')
+    parser.add_argument('-o', '--output', default=None, help='CSV file (default: data/temp_log.csv without --store)')
+    parser.add_argument('-s', '--store', default=None, help='Binary store directory (see heat_store.py)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Processes (default: all cores)')
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_BYTES // (1024 * 1024))
+    parser.add_argument('--state', default=None, help='Offset state file')
+    args = parser.parse_args()
+
+    if not args.output and not args.store:
+        args.output = 'data/temp_log.csv'
+    rows, rejects = convert(args.source, args.output, args.store, args.workers, args.chunk_mb * 1024 * 1024,
+                            args.state)
+    print(f"Converted {rows} rows, {rejects} rejected lines")
+    if args.output:
+        print(f"CSV file saved as {args.output}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
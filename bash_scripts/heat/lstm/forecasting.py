@@ -0,0 +1,113 @@
+import os
+import weakref
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.layers import LSTM, Dense
+from tensorflow.keras.optimizers import Adam
+
+# Forecasting-Engine für die LSTM-Modelle:
+#  - direct: ein Modell mit Dense(horizon) liefert den ganzen Horizont in einem Aufruf
+#  - autoregressiv: kompilierte tf.function, die Schritt für Schritt vorhersagt und die
+#    Eingabesequenz in einem gespiegelten Ringpuffer hält (kein np.roll, kein predict())
+#  - Szenarien (z.B. verschiedene MHz-Annahmen) laufen gemeinsam als ein Batch
+
+def build_direct_model(sequence_length, n_features, horizon, units=32):
+    """LSTM that predicts the next `horizon` temperatures at once (seq2seq-style head)."""
+    model = Sequential([
+        LSTM(units, activation='relu', input_shape=(sequence_length, n_features)),
+        Dense(16, activation='relu'),
+        Dense(horizon)
+    ])
+    model.compile(optimizer=Adam(learning_rate=0.001), loss='mse')
+    return model
+
+def forecast_direct(model, windows):
+    """One forward pass for a batch of windows -> (batch, horizon)."""
+    windows = np.asarray(windows, dtype=np.float32)
+    if windows.ndim == 2:
+        windows = windows[np.newaxis]
+    return model(windows, training=False).numpy()
+
+def make_autoregressive_forecaster(model, sequence_length):
+    """Compile a step loop for next-step models.
+
+    The returned function takes windows (batch, seq, F), the exogenous feature
+    values (batch, F - 1) that are held constant over the horizon, and the number
+    of steps, and returns the predicted target column (batch, steps).
+
+    The window lives time-major in a buffer of length 2 * seq: every new row is
+    written to slot head and head + seq, so buf[head + 1 : head + 1 + seq] is
+    always the current window in order and no np.roll/concat is needed. Tensors
+    are immutable, though: tensor_scatter_nd_update still returns a new copy of
+    the whole (2 * seq, batch, F) buffer on every step.
+    The function only holds a weak reference to the model, so a cached forecaster
+    does not keep the model alive.
+    """
+    model_ref = weakref.ref(model)
+
+    @tf.function(reduce_retracing=True)
+    def run(windows, exog, steps):
+        buf = tf.transpose(tf.concat([windows, windows], axis=1), [1, 0, 2])
+        preds = tf.TensorArray(tf.float32, size=steps)
+        for step in tf.range(steps):
+            head = step % sequence_length
+            current = tf.transpose(buf[head:head + sequence_length], [1, 0, 2])
+            next_temp = tf.cast(model_ref()(current, training=False)[:, :1], tf.float32)
+            row = tf.concat([next_temp, exog], axis=1)
+            buf = tf.tensor_scatter_nd_update(
+                buf, [[head], [head + sequence_length]], tf.stack([row, row])
+            )
+            preds = preds.write(step, next_temp[:, 0])
+        return tf.transpose(preds.stack())
+
+    return run
+
+# model -> {sequence_length: compiled forecaster}; entries go away with their model
+_forecasters = weakref.WeakKeyDictionary()
+
+def forecast_autoregressive(model, windows, exog, steps):
+    """Run the compiled step loop; windows (batch, seq, F), exog (batch, F - 1)."""
+    windows = tf.convert_to_tensor(windows, dtype=tf.float32)
+    if windows.shape.rank == 2:
+        windows = windows[tf.newaxis]
+    exog = tf.reshape(tf.convert_to_tensor(exog, dtype=tf.float32), [windows.shape[0], -1])
+    compiled = _forecasters.setdefault(model, {})
+    seq = windows.shape[1]
+    if seq not in compiled:
+        compiled[seq] = make_autoregressive_forecaster(model, seq)
+    return compiled[seq](windows, exog, tf.constant(steps, dtype=tf.int32)).numpy()
+
+def forecast(model, windows, steps, exog=None):
+    """Forecast `steps` target values for each window (scaled units).
+
+    Models with a multi-output head covering the horizon are answered by a single
+    forward pass, next-step models fall back to the autoregressive loop.
+    """
+    horizon = model.output_shape[-1]
+    if horizon > 1 and horizon >= steps:
+        return forecast_direct(model, windows)[:, :steps]
+    if exog is None:
+        raise ValueError("Autoregressive forecasting needs exogenous feature values")
+    return forecast_autoregressive(model, windows, exog, steps)
+
+def forecast_scenarios(model, last_sequence, steps, scaler, mhz_values):
+    """Forecast one scenario per assumed MHz value as a single batch.
+
+    Returns the inverse-transformed temperatures with shape (len(mhz_values), steps).
+    """
+    mhz_values = np.asarray(mhz_values, dtype=np.float64).reshape(-1, 1)
+    scaled_mhz = scaler[1].transform(mhz_values).astype(np.float32)
+    windows = np.repeat(np.asarray(last_sequence, dtype=np.float32)[np.newaxis], len(mhz_values), axis=0)
+    preds = forecast(model, windows, steps, exog=scaled_mhz)
+    return scaler[0].inverse_transform(preds.reshape(-1, 1)).reshape(preds.shape)
+
+def write_forecast_csv(path, timestamps, temps):
+    """Write a forecast as timestamp,temp CSV (read by fan_controll.py --predictive)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    pd.DataFrame({
+        'timestamp': pd.DatetimeIndex(timestamps).map(lambda ts: ts.isoformat()),
+        'temp': np.asarray(temps, dtype=np.float64).ravel().round(2),
+    }).to_csv(path, index=False)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# Schlanke Inferenz für die mit tflite_export.py exportierten LSTM-Modelle.
+#
+#   python lite_forecaster.py ../models/little -s ../data/raw/temp_log_multi.csv --steps 300 \
+#       -o ../data/processed/forecast.csv
+#
+# Lädt nur meta.json (Features, Sequenzlänge, MinMaxScaler-Parameter) und model.tflite.
+# Der Interpreter kommt aus tflite_runtime bzw. ai_edge_litert, wenn installiert
+# (pip install tflite-runtime); nur sonst wird das komplette TensorFlow geladen.
+# Skalierung und der autoregressive Prognose-Loop sind reines numpy.
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from heat_store import HeatStore
+
+_import_start = time.perf_counter()
+try:
+    from tflite_runtime.interpreter import Interpreter
+    INTERPRETER = 'tflite_runtime'
+except ImportError:
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        INTERPRETER = 'ai_edge_litert'
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+        INTERPRETER = 'tensorflow'
+IMPORT_SECONDS = time.perf_counter() - _import_start
+
+class LiteForecaster:
+    """TFLite model plus the scaler parameters it was trained with."""
+
+    def __init__(self, model_dir, threads=None, max_batch=256):
+        with open(os.path.join(model_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.features = [scaler['name'] for scaler in self.meta['scalers']]
+        self.seq_length = self.meta['sequence_length']
+        # MinMaxScaler.transform: x * scale_ + min_
+        self.scale_ = np.array([scaler['scale'] for scaler in self.meta['scalers']], dtype=np.float32)
+        self.min_ = np.array([scaler['min'] for scaler in self.meta['scalers']], dtype=np.float32)
+        self.interpreter = Interpreter(model_path=os.path.join(model_dir, 'model.tflite'), num_threads=threads)
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.max_batch = max_batch
+        self.batch = None
+
+    def _resize(self, batch):
+        if batch != self.batch:
+            self.interpreter.resize_tensor_input(self.input_index, [batch, self.seq_length, len(self.features)])
+            self.interpreter.allocate_tensors()
+            self.batch = batch
+
+    def scale(self, values):
+        """Raw feature rows (N, F) -> scaled float32 rows."""
+        return np.asarray(values, dtype=np.float32) * self.scale_ + self.min_
+
+    def unscale_target(self, values):
+        """Scaled predictions of the target (column 0) -> °C."""
+        return (np.asarray(values, dtype=np.float32) - self.min_[0]) / self.scale_[0]
+
+    def predict_one(self, window):
+        """Scaled window (seq, F) -> scaled next target value."""
+        self._resize(1)
+        self.interpreter.set_tensor(self.input_index, np.asarray(window, dtype=np.float32)[np.newaxis])
+        self.interpreter.invoke()
+        return float(self.interpreter.get_tensor(self.output_index)[0, 0])
+
+    def predict(self, windows):
+        """Scaled windows (N, seq, F) -> scaled next target values (N,)."""
+        windows = np.asarray(windows, dtype=np.float32)
+        out = np.empty(len(windows), dtype=np.float32)
+        for start in range(0, len(windows), self.max_batch):
+            batch = windows[start:start + self.max_batch]
+            self._resize(len(batch))
+            self.interpreter.set_tensor(self.input_index, np.ascontiguousarray(batch))
+            self.interpreter.invoke()
+            out[start:start + len(batch)] = self.interpreter.get_tensor(self.output_index)[:, 0]
+        return out
+
+    def forecast(self, recent, steps, exog=None):
+        """Forecast `steps` temperatures (°C) after the raw rows `recent` (>= seq, F).
+
+        The other features are held at `exog` (raw values, default: their mean
+        over `recent`), like forecast_future does with the mean MHz. The window
+        lives in a buffer of length 2 * seq, so no step shifts any data.
+        """
+        recent = np.asarray(recent, dtype=np.float32)[-self.seq_length:]
+        if exog is None:
+            exog = recent[:, 1:].mean(axis=0)
+        exog_scaled = self.scale(np.concatenate(([0.0], np.ravel(exog))))[1:]
+        buf = np.concatenate((self.scale(recent), self.scale(recent)))
+        preds = np.empty(steps, dtype=np.float32)
+        for step in range(steps):
+            head = step % self.seq_length
+            preds[step] = self.predict_one(buf[head:head + self.seq_length])
+            buf[head, 0] = buf[head + self.seq_length, 0] = preds[step]
+            buf[head, 1:] = buf[head + self.seq_length, 1:] = exog_scaled
+        return self.unscale_target(preds)
+
+def read_recent(source, rows, columns):
+    """Timestamps and feature rows of the last `rows` records, without reading the whole log."""
+    if os.path.isdir(source):
+        store = HeatStore(source)
+        last = store.last_timestamp()
+        if last is None:
+            raise ValueError(f"Store {source} has no records")
+        records = store.read_records(start=last - timedelta(days=1))[-rows:]
+        if len(records) < rows:
+            records = store.read_records()[-rows:]
+        return (pd.DatetimeIndex(pd.to_datetime(records['ts'], unit='ms', utc=True)),
+                np.column_stack([records[col] for col in columns]))
+    # CSV: header plus the tail of the file
+    with open(source, 'rb') as f:
+        header = f.readline()
+        size = f.seek(0, os.SEEK_END)
+        tail = b''
+        offset = size
+        chunk = 64 * 1024
+        while tail.count(b'\n') <= rows and offset > 0:
+            chunk *= 2
+            offset = f.seek(max(size - chunk, 0))
+            tail = f.read()
+    lines = tail.splitlines()
+    if offset == 0:
+        lines = lines[1:]  # the tail reaches the start of the file: drop the header line
+    lines = lines[-rows:]
+    if not lines:
+        raise ValueError(f"{source} has no data rows")
+    df = pd.read_csv(io.BytesIO(header + b'\n'.join(lines)), parse_dates=['timestamp'])
+    return pd.DatetimeIndex(df['timestamp']), df[columns].to_numpy(dtype=np.float32)
+
+def write_forecast(path, timestamps, temps):
+    """Same timestamp,temp CSV as forecasting.write_forecast_csv (read by fan_controll.py --predictive)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'temp'])
+        for ts, temp in zip(timestamps, temps):
+            writer.writerow([ts.isoformat(), round(float(temp), 2)])
+
+def latency_stats(seconds):
+    seconds = np.asarray(seconds) * 1000
+    return {'p50_ms': round(float(np.percentile(seconds, 50)), 4),
+            'p95_ms': round(float(np.percentile(seconds, 95)), 4),
+            'mean_ms': round(float(seconds.mean()), 4)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Forecast with an exported TFLite model')
+    parser.add_argument('model_dir', help='Export directory (tflite_export.py -o)')
+    parser.add_argument('-s', '--source', default='../data/raw/temp_log_multi.csv', help='CSV log or store directory')
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--exog', type=float, nargs='*', default=None,
+                        help='Values of the other features during the forecast (default: recent mean)')
+    parser.add_argument('-o', '--output', default=None, help='Forecast CSV, e.g. ../data/processed/forecast.csv')
+    parser.add_argument('-t', '--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    forecaster = LiteForecaster(args.model_dir, args.threads)
+    load_time = time.perf_counter() - start
+    timestamps, recent = read_recent(args.source, max(forecaster.seq_length, 100), forecaster.features)
+
+    window = forecaster.scale(recent[-forecaster.seq_length:])
+    calls = []
+    for _ in range(200):
+        t = time.perf_counter()
+        forecaster.predict_one(window)
+        calls.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    temps = forecaster.forecast(recent, args.steps, args.exog)
+    forecast_time = time.perf_counter() - t
+
+    step = pd.Series(timestamps[-100:]).diff().median().total_seconds() if len(timestamps) > 1 else 1.0
+    future = [timestamps[-1] + timedelta(seconds=step * (i + 1)) for i in range(args.steps)]
+    latency = latency_stats(calls)
+    print(f"Interpreter: {INTERPRETER} (import {IMPORT_SECONDS:.2f}s), model loaded in {load_time:.3f}s")
+    print(f"Per call: p50 {latency['p50_ms']:.3f} ms, p95 {latency['p95_ms']:.3f} ms; "
+          f"{args.steps} steps in {forecast_time * 1000:.1f} ms")
+    print(f"Forecast: {temps[0]:.1f} °C -> {temps[-1]:.1f} °C ({future[-1]:%Y-%m-%d %H:%M:%S})")
+    if args.output:
+        write_forecast(args.output, future, temps)
+        print(f"Saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
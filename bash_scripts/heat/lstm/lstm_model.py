@@ -4,33 +4,50 @@ from sklearn.preprocessing import MinMaxScaler
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense
 from tensorflow.keras.optimizers import Adam
+import argparse
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from heat_store import load_telemetry
+from sequences import sliding_windows, split_chronological
+from streaming import array_dataset, streaming_splits
+from model_registry import DEFAULT_REGISTRY, update_model
 
-def prepare_sequences(data, seq_length):
-    X, y = [], []
-    for i in range(len(data) - seq_length):
-        X.append(data[i:(i + seq_length)])
-        y.append(data[i + seq_length])
-    return np.array(X), np.array(y)
+def prepare_sequences(data, seq_length, dtype=np.float32):
+    return sliding_windows(data, seq_length, dtype=dtype)
 
-def train_basic_lstm(df, sequence_length=60):
+def in_memory_splits(X, y, train_ratio, val_ratio, batch_size):
+    # Gleiche Form wie streaming_splits: fit-/evaluate-Argumente pro Split,
+    # die Fenster-Views werden batchweise kopiert statt in fit() als dichtes Array
+    (X_train, y_train), (X_val, y_val), (X_test, y_test) = split_chronological(X, y, train_ratio, val_ratio)
+    return dataset_splits(
+        array_dataset(X_train, y_train, batch_size, shuffle=True),
+        array_dataset(X_val, y_val, batch_size),
+        array_dataset(X_test, y_test, batch_size),
+    )
+
+def dataset_splits(train_ds, val_ds, test_ds):
+    return {'x': train_ds}, val_ds, {'x': test_ds}
+
+def train_basic_lstm(df, sequence_length=60, csv_path=None, scaler=None, batch_size=32):
     # Prepare data
-    data = df['temp'].values.reshape(-1, 1)
-    scaler = MinMaxScaler()
-    data_scaled = scaler.fit_transform(data)
-    
-    # Create sequences
-    X, y = prepare_sequences(data_scaled, sequence_length)
-    
-    # Split into train (50%), validation (30%), test (20%)
-    train_size = int(len(X) * 0.5)
-    val_size = int(len(X) * 0.3)
-    
-    X_train = X[:train_size]
-    y_train = y[:train_size]
-    X_val = X[train_size:train_size+val_size]
-    y_val = y[train_size:train_size+val_size]
-    X_test = X[train_size+val_size:]
-    y_test = y[train_size+val_size:]
+    if csv_path is not None:
+        # Streaming mode: read csv_path in chunks instead of using df
+        (scaler,), _, datasets = streaming_splits(
+            csv_path, ['temp'], sequence_length, 0.5, 0.3, batch_size,
+            target=[0], scalers=[scaler] if scaler is not None else None
+        )
+        train_data, val_data, test_data = dataset_splits(*datasets)
+    else:
+        data = df['temp'].values.reshape(-1, 1)
+        scaler = MinMaxScaler()
+        data_scaled = scaler.fit_transform(data)
+        
+        # Create sequences
+        X, y = prepare_sequences(data_scaled, sequence_length)
+        
+        # Split into train (50%), validation (30%), test (20%)
+        train_data, val_data, test_data = in_memory_splits(X, y, 0.5, 0.3, batch_size)
     
     # Build model
     model = Sequential([
@@ -42,53 +59,46 @@ def train_basic_lstm(df, sequence_length=60):
     
     # Train
     history = model.fit(
-        X_train, y_train,
-        validation_data=(X_val, y_val),
+        **train_data,
+        validation_data=val_data,
         epochs=50,
-        batch_size=32,
         verbose=1
     )
     
     # Evaluate
-    test_loss = model.evaluate(X_test, y_test, verbose=0)
+    test_loss = model.evaluate(**test_data, verbose=0)
     print(f'Test MSE: {test_loss}')
     
     return model, scaler, history
 
-def train_lstm_with_regressor(df, regressor_col, sequence_length=60):
+def train_lstm_with_regressor(df, regressor_col, sequence_length=60, csv_path=None, scalers=None, batch_size=32):
     # Prepare data
-    temp_data = df['temp'].values.reshape(-1, 1)
-    reg_data = df[regressor_col].values.reshape(-1, 1)
-    
-    # Scale both features
-    temp_scaler = MinMaxScaler()
-    reg_scaler = MinMaxScaler()
-    
-    temp_scaled = temp_scaler.fit_transform(temp_data)
-    reg_scaled = reg_scaler.fit_transform(reg_data)
-    
-    # Combine features
-    combined_data = np.hstack((temp_scaled, reg_scaled))
-    
-    # Create sequences
-    X, y = [], []
-    for i in range(len(combined_data) - sequence_length):
-        X.append(combined_data[i:(i + sequence_length)])
-        y.append(temp_scaled[i + sequence_length])
-    
-    X = np.array(X)
-    y = np.array(y)
-    
-    # Split data
-    train_size = int(len(X) * 0.5)
-    val_size = int(len(X) * 0.3)
-    
-    X_train = X[:train_size]
-    y_train = y[:train_size]
-    X_val = X[train_size:train_size+val_size]
-    y_val = y[train_size:train_size+val_size]
-    X_test = X[train_size+val_size:]
-    y_test = y[train_size+val_size:]
+    if csv_path is not None:
+        # Streaming mode: read csv_path in chunks instead of using df
+        (temp_scaler, reg_scaler), _, datasets = streaming_splits(
+            csv_path, ['temp', regressor_col], sequence_length, 0.5, 0.3, batch_size,
+            target=[0], scalers=scalers
+        )
+        train_data, val_data, test_data = dataset_splits(*datasets)
+    else:
+        temp_data = df['temp'].values.reshape(-1, 1)
+        reg_data = df[regressor_col].values.reshape(-1, 1)
+        
+        # Scale both features
+        temp_scaler = MinMaxScaler()
+        reg_scaler = MinMaxScaler()
+        
+        temp_scaled = temp_scaler.fit_transform(temp_data)
+        reg_scaled = reg_scaler.fit_transform(reg_data)
+        
+        # Combine features
+        combined_data = np.hstack((temp_scaled, reg_scaled))
+        
+        # Create sequences (temperature is column 0 and the prediction target)
+        X, y = sliding_windows(combined_data, sequence_length, target=[0], dtype=np.float32)
+        
+        # Split data
+        train_data, val_data, test_data = in_memory_splits(X, y, 0.5, 0.3, batch_size)
     
     # Build model
     model = Sequential([
@@ -100,34 +110,41 @@ def train_lstm_with_regressor(df, regressor_col, sequence_length=60):
     
     # Train
     history = model.fit(
-        X_train, y_train,
-        validation_data=(X_val, y_val),
+        **train_data,
+        validation_data=val_data,
         epochs=50,
-        batch_size=32,
         verbose=1
     )
     
     # Evaluate
-    test_loss = model.evaluate(X_test, y_test, verbose=0)
+    test_loss = model.evaluate(**test_data, verbose=0)
     print(f'Test MSE: {test_loss}')
     
     return model, (temp_scaler, reg_scaler), history
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train the LSTM variants')
+    parser.add_argument('source', nargs='?', default='data/raw/temp_log_2.csv', help='CSV log or store directory')
+    parser.add_argument('--full', action='store_true', help='Retrain from scratch instead of fine-tuning the newest versions')
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY, help='Model registry directory')
+    args = parser.parse_args()
+
     print("\nLoading data...")
-    df = pd.read_csv('data/raw/temp_log_2.csv', parse_dates=['timestamp'])
+    df = load_telemetry(args.source)
     
+    # Basic and regressor models are versioned in the registry and fine-tuned on new rows
     print("\nTraining basic LSTM model...")
-    model, scaler, history = train_basic_lstm(df)
+    model, scaler, meta = update_model('basic', args.source, args.registry, args.full, df=df)
     
     print("\nTraining LSTM model with CPU metrics...")
     # Train with CPU MHz as regressor
     print("\nTraining with CPU MHz as regressor...")
-    model_mhz, scalers_mhz, history_mhz = train_lstm_with_regressor(df, 'MHz')
+    model_mhz, scalers_mhz, meta_mhz = update_model('regressor_MHz', args.source, args.registry, args.full, df=df)
     
     # Train with CPU load as regressor
     print("\nTraining with CPU load as regressor...")
-    model_load, scalers_load, history_load = train_lstm_with_regressor(df, 'cpu_load_percent')
+    model_load, scalers_load, meta_load = update_model('regressor_cpu_load_percent', args.source, args.registry,
+                                                       args.full, df=df)
     
     # Train with both CPU metrics
     print("\nTraining with both CPU metrics and fan status...")
@@ -153,24 +170,10 @@ if __name__ == "__main__":
     
     # Create sequences for combined features
     sequence_length = 60
-    X, y = [], []
-    for i in range(len(combined_data) - sequence_length):
-        X.append(combined_data[i:(i + sequence_length)])
-        y.append(temp_scaled[i + sequence_length])
-    
-    X = np.array(X)
-    y = np.array(y)
+    X, y = sliding_windows(combined_data, sequence_length, target=[0], dtype=np.float32)
     
     # Split data as before
-    train_size = int(len(X) * 0.5)
-    val_size = int(len(X) * 0.3)
-    
-    X_train = X[:train_size]
-    y_train = y[:train_size]
-    X_val = X[train_size:train_size+val_size]
-    y_val = y[train_size:train_size+val_size]
-    X_test = X[train_size+val_size:]
-    y_test = y[train_size+val_size:]
+    (X_train, y_train), (X_val, y_val), (X_test, y_test) = split_chronological(X, y, 0.5, 0.3)
     
     # Build and train model with all features
     model_combined = Sequential([
@@ -181,14 +184,13 @@ if __name__ == "__main__":
     model_combined.compile(optimizer=Adam(learning_rate=0.001), loss='mse')
     
     history_combined = model_combined.fit(
-        X_train, y_train,
-        validation_data=(X_val, y_val),
+        array_dataset(X_train, y_train, 32, shuffle=True),
+        validation_data=array_dataset(X_val, y_val, 32),
         epochs=50,
-        batch_size=32,
         verbose=1
     )
     
-    test_loss = model_combined.evaluate(X_test, y_test, verbose=0)
+    test_loss = model_combined.evaluate(array_dataset(X_test, y_test, 32), verbose=0)
     print(f'Combined features test MSE: {test_loss}')
     
     print("\nTraining completed!")
@@ -7,7 +7,16 @@ from tensorflow.keras.optimizers import Adam
 import matplotlib.pyplot as plt
 from datetime import timedelta
 import os
+import argparse
 import getpass
+import json
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from heat_store import load_telemetry
+from sequences import multi_horizon_windows, sliding_windows, split_chronological
+from streaming import array_dataset, scan_log, streaming_splits
+from forecasting import build_direct_model, forecast, forecast_scenarios, write_forecast_csv
+from model_registry import DEFAULT_REGISTRY, update_model
 
 intense_ratio = 0.01 # less intense training
 # intense_ratio = 0.002 # more intense training 
@@ -15,22 +24,27 @@ training_ratio = 0.01 # Default
 # training_ratio = 0.002 # Default # more intense training
 
 # Hilfsfunktion zur Erstellung von Sequenzen für das LSTM-Modell
-def prepare_sequences(data, timestamps, seq_length):
+def prepare_sequences(data, timestamps, seq_length, dtype=np.float32):
     print(f"\nPreparing sequences with length {seq_length}...")
-    X, y, time_index = [], [], []
-    total_sequences = len(data) - seq_length
-    for i in range(total_sequences):
-        if i % (total_sequences // 10) == 0:  # Progress update every 10%
-            print(f"Processing sequences: {(i/total_sequences)*100:.1f}% complete")
-        X.append(data[i:(i + seq_length)])
-        y.append(data[i + seq_length, 0])
-        time_index.append(pd.to_datetime(timestamps[i + seq_length]))
+    X, y = sliding_windows(data, seq_length, target=0, dtype=dtype)
+    time_index = pd.DatetimeIndex(pd.to_datetime(timestamps[seq_length:]))
     print("Sequence preparation complete!")
-    return np.array(X), np.array(y), pd.DatetimeIndex(time_index)
+    return X, y, time_index
 
 # Funktion zur Berechnung optimaler Trainingsparameter
-def calculate_training_params(dataset_length, intense_ratio=0.01):
+# Optional aus dem best.json von sweep.py: nur der beste Trial mit genau diesem Modell
+# (Architektur, Sequenzlänge, Units, Features, Lernrate) wird übernommen.
+def calculate_training_params(dataset_length, intense_ratio=0.01, sweep_path=None, model='little'):
     print("\nCalculating optimal training parameters...")
+    if sweep_path:
+        with open(sweep_path) as f:
+            best = json.load(f)['models'].get(model)
+        if best is not None:
+            # Batch size of the best matching trial and the epoch at which it reached its best validation loss
+            batch_size, epochs = best['batch_size'], best['best_epoch']
+            print(f"Parameters from sweep {sweep_path} (trial {best['trial']}): batch_size={batch_size}, epochs={epochs}")
+            return epochs, batch_size
+        print(f"No {model} trial in {sweep_path}, falling back to the heuristic")
     ratio = intense_ratio
     batch_size = min(max(int(np.sqrt(dataset_length) * ratio * 10), 16), 128)
     batch_size = int(batch_size / 8) * 8  # Batch-Größe für optimale Performance anpassen
@@ -38,101 +52,130 @@ def calculate_training_params(dataset_length, intense_ratio=0.01):
     print(f"Calculated parameters: batch_size={batch_size}, epochs={epochs}")
     return epochs, batch_size
 
+# LSTM-Modell mit Temperatur- und MHz-Wert als Features (auch von benchmark.py und sweep.py genutzt)
+def build_model(sequence_length, n_features=2, units=32):
+    model = Sequential([
+        LSTM(units, activation='relu', input_shape=(sequence_length, n_features), dropout=0.2, recurrent_dropout=0.2),
+        Dense(16, activation='relu'),
+        Dense(1)
+    ])
+    model.compile(optimizer=Adam(learning_rate=0.001), loss='mse')
+    return model
+
 # Trainingsfunktion für LSTM-Modell mit Temperatur- und MHz-Wert als Features
-def train_lstm(df, sequence_length=20, training_ratio=training_ratio):
+# Mit csv_path wird das Log in Chunks gestreamt statt df komplett zu laden.
+def train_lstm(df, sequence_length=20, training_ratio=training_ratio, csv_path=None, scalers=None, sweep_path=None):
     print("\nInitializing LSTM training process...")
-    print(f"Dataset size: {len(df)} rows")
+    if csv_path is not None:
+        print(f"Streaming dataset from {csv_path}")
+        (scaler_temp, scaler_mhz), n_rows = scan_log(csv_path, ['temp', 'avg_mhz'], scalers)
+    else:
+        n_rows = len(df)
+    print(f"Dataset size: {n_rows} rows")
     print(f"Sequence length: {sequence_length}")
-    
-    print("\nExtracting and scaling features...")
-    data = df[['temp', 'avg_mhz']].values
-    timestamps = df['timestamp'].values
-    
-    # Skalierung der Features
-    scaler_temp, scaler_mhz = MinMaxScaler(), MinMaxScaler()
-    data_scaled = np.column_stack((
-        scaler_temp.fit_transform(data[:, 0].reshape(-1, 1)),
-        scaler_mhz.fit_transform(data[:, 1].reshape(-1, 1))
-    ))
-    print("Feature scaling complete!")
 
-    # Erstellung von Sequenzen
-    X, y, time_index = prepare_sequences(data_scaled, timestamps, sequence_length)
+    # Trainingsparameter berechnen
+    epochs, batch_size = calculate_training_params(n_rows, training_ratio, sweep_path)
+
+    if csv_path is not None:
+        _, _, (train_ds, val_ds, test_ds) = streaming_splits(
+            csv_path, ['temp', 'avg_mhz'], sequence_length, 0.7, 0.15, batch_size,
+            scalers=(scaler_temp, scaler_mhz), n_rows=n_rows, shuffle_buffer=10 * batch_size
+        )
+        train_data, val_data, test_data = {'x': train_ds}, val_ds, {'x': test_ds}
+    else:
+        print("\nExtracting and scaling features...")
+        data = df[['temp', 'avg_mhz']].values
+        timestamps = df['timestamp'].values
+        
+        # Skalierung der Features
+        scaler_temp, scaler_mhz = MinMaxScaler(), MinMaxScaler()
+        data_scaled = np.column_stack((
+            scaler_temp.fit_transform(data[:, 0].reshape(-1, 1)),
+            scaler_mhz.fit_transform(data[:, 1].reshape(-1, 1))
+        ))
+        print("Feature scaling complete!")
 
-    print("\nSplitting dataset...")
-    train_size = int(len(X) * 0.7)
-    val_size = int(len(X) * 0.15)
-    print(f"Training set size: {train_size}")
-    print(f"Validation set size: {val_size}")
-    print(f"Test set size: {len(X) - train_size - val_size}")
+        # Erstellung von Sequenzen
+        X, y, time_index = prepare_sequences(data_scaled, timestamps, sequence_length)
 
-    X_train, y_train = X[:train_size], y[:train_size]
-    X_val, y_val = X[train_size:train_size + val_size], y[train_size:train_size + val_size]
-    X_test, y_test = X[train_size + val_size:], y[train_size + val_size:]
+        print("\nSplitting dataset...")
+        train_size = int(len(X) * 0.7)
+        val_size = int(len(X) * 0.15)
+        print(f"Training set size: {train_size}")
+        print(f"Validation set size: {val_size}")
+        print(f"Test set size: {len(X) - train_size - val_size}")
+
+        (X_train, y_train), (X_val, y_val), (X_test, y_test) = split_chronological(X, y, 0.7, 0.15)
+        # Fenster-Views batchweise einspeisen, statt sie in fit() als dichtes Array zu kopieren
+        train_data = {'x': array_dataset(X_train, y_train, batch_size, shuffle=True)}
+        val_data = array_dataset(X_val, y_val, batch_size)
+        test_data = {'x': array_dataset(X_test, y_test, batch_size)}
 
     print("\nBuilding LSTM model...")
-    model = Sequential([
-        LSTM(32, activation='relu', input_shape=(sequence_length, 2), dropout=0.2, recurrent_dropout=0.2),
-        Dense(16, activation='relu'),
-        Dense(1)
-    ])
-    model.compile(optimizer=Adam(learning_rate=0.001), loss='mse')
+    model = build_model(sequence_length)
     print("Model architecture:")
     model.summary()
 
-    # Trainingsparameter berechnen
-    epochs, batch_size = calculate_training_params(len(df), training_ratio)
-
     print("\nStarting model training...")
     # Modell trainieren
     history = model.fit(
-        X_train, y_train,
-        validation_data=(X_val, y_val),
+        **train_data,
+        validation_data=val_data,
         epochs=epochs,
-        batch_size=batch_size,
-        verbose=1,
-        shuffle=True
+        verbose=1
     )
 
     print("\nEvaluating model on test set...")
     # Modell bewerten
-    test_loss = model.evaluate(X_test, y_test, verbose=1)
+    test_loss = model.evaluate(**test_data, verbose=1)
     print(f'Final Test MSE: {test_loss:.6f}')
 
     return model, (scaler_temp, scaler_mhz), history
 
+# Direktes Modell: sagt die nächsten `horizon` Temperaturen in einem Aufruf vorher (--horizon)
+# Trainiert auf denselben skalierten Daten und Splits wie das Schritt-für-Schritt-Modell.
+def train_direct(data_scaled, sequence_length, horizon, training_ratio=training_ratio):
+    print(f"\nTraining direct model for {horizon} steps...")
+    X, Y = multi_horizon_windows(data_scaled, sequence_length, horizon, dtype=np.float32)
+    (X_train, Y_train), (X_val, Y_val), (X_test, Y_test) = split_chronological(X, Y, 0.7, 0.15)
+    epochs, batch_size = calculate_training_params(len(data_scaled), training_ratio)
+    model = build_direct_model(sequence_length, X.shape[2], horizon)
+    model.fit(array_dataset(X_train, Y_train, batch_size, shuffle=True),
+              validation_data=array_dataset(X_val, Y_val, batch_size), epochs=epochs, verbose=1)
+    print(f'Direct model test MSE: {model.evaluate(array_dataset(X_test, Y_test, batch_size), verbose=0):.6f}')
+    return model
+
 # Funktion zur Vorhersage zukünftiger Werte
+# Läuft über die kompilierte Forecasting-Engine statt einem model.predict() pro Schritt
 def forecast_future(model, last_sequence, steps, scaler, mean_mhz):
     print(f"\nGenerating future forecast for {steps} steps...")
-    current_sequence = last_sequence.copy()
-    future_predictions = []
 
     # Scale the mean MHz value
-    scaled_mhz = scaler[1].transform([[mean_mhz]])[0][0]
+    scaled_mhz = scaler[1].transform([[mean_mhz]]).astype(np.float32)
 
-    for step in range(steps):
-        if step % (steps // 5) == 0:  # Progress update every 20%
-            print(f"Forecasting progress: {(step/steps)*100:.1f}%")
-        next_pred = model.predict(current_sequence[np.newaxis, :, :], verbose=0)
-        future_predictions.append(next_pred[0])
-
-        # Verschieben der Sequenz und Einfügen neuer Werte
-        current_sequence = np.roll(current_sequence, -1, axis=0)
-        current_sequence[-1, 0] = next_pred[0]  # Temperatur aktualisieren
-        current_sequence[-1, 1] = scaled_mhz    # MHz auf Durchschnitt setzen
+    future_predictions = forecast(model, last_sequence[np.newaxis], steps, exog=scaled_mhz)
 
     print("Forecast generation complete!")
-    return np.array(future_predictions)
+    return future_predictions.reshape(-1, 1)
 
 # Funktion zur Modellvorhersage und Visualisierung der Ergebnisse
-def make_predictions(model, scaler, X_test, y_test, timestamps_test, mean_mhz):
+# direct_model (train_direct) liefert die Prognose in einem Aufruf über seinen ganzen Horizont;
+# scenarios sind MHz-Annahmen, die als ein Batch mit dem Schritt-Modell vorhergesagt werden.
+def make_predictions(model, scaler, X_test, y_test, timestamps_test, mean_mhz, forecast_path='data/processed/forecast.csv',
+                     direct_model=None, scenarios=None):
     print("\nMaking predictions on test data...")
     predictions = model.predict(X_test)
 
     print("\nGenerating future predictions...")
-    forecast_steps = len(predictions) // 3
     last_sequence = X_test[-1]
-    future_pred = forecast_future(model, last_sequence, forecast_steps, scaler, mean_mhz)
+    if direct_model is not None:
+        forecast_steps = direct_model.output_shape[-1]
+        future_pred = forecast(direct_model, last_sequence[np.newaxis], forecast_steps).reshape(-1, 1)
+    else:
+        forecast_steps = len(predictions) // 3
+        future_pred = forecast_future(model, last_sequence, forecast_steps, scaler, mean_mhz)
+    scenario_preds = forecast_scenarios(model, last_sequence, forecast_steps, scaler, scenarios) if scenarios else None
 
     print("\nInverse transforming scaled values...")
     # Inverse Transformation der Skalierten Werte
@@ -142,8 +185,13 @@ def make_predictions(model, scaler, X_test, y_test, timestamps_test, mean_mhz):
 
     print("\nPreparing visualization...")
     # Zeitachsen für Prognosen erstellen
+    # Ein Modellschritt ist ein Messintervall (3 s bei temp_logger.sh), nicht eine Sekunde
     last_timestamp = pd.to_datetime(timestamps_test[-1])
-    future_timestamps = pd.date_range(start=last_timestamp, periods=forecast_steps + 1, freq='S')[1:]
+    step = pd.Series(pd.to_datetime(timestamps_test[-100:])).diff().median() if len(timestamps_test) > 1 else pd.Timedelta(seconds=1)
+    future_timestamps = pd.date_range(start=last_timestamp, periods=forecast_steps + 1, freq=step)[1:]
+    if forecast_path:
+        print(f"Saving forecast to '{forecast_path}'...")
+        write_forecast_csv(forecast_path, future_timestamps, future_pred)
 
     print("Creating prediction plot...")
     # Ergebnisse visualisieren
@@ -151,6 +199,9 @@ def make_predictions(model, scaler, X_test, y_test, timestamps_test, mean_mhz):
     plt.plot(timestamps_test, y_test, label='Echte Temperatur', color='blue')
     plt.plot(timestamps_test, predictions, label='Vorhersage', color='red', alpha=0.7)
     plt.plot(future_timestamps, future_pred, label='Prognose', color='green', linestyle='--', alpha=0.7)
+    if scenario_preds is not None:
+        for mhz, temps in zip(scenarios, scenario_preds):
+            plt.plot(future_timestamps, temps, linestyle=':', alpha=0.7, label=f'Szenario {mhz:.0f} MHz')
     plt.axvline(x=last_timestamp, color='gray', linestyle=':', label='Prognose-Start')
     plt.title('Temperaturvorhersage')
     plt.xlabel('Zeit')
@@ -176,12 +227,26 @@ if __name__ == "__main__":
     print("Temperature Prediction Model Training")
     print("="*50)
     
+    parser = argparse.ArgumentParser(description='Train (or fine-tune) the little LSTM model and forecast')
+    parser.add_argument('source', nargs='?', default='data/raw/temp_log_multi.csv', help='CSV log or store directory')
+    parser.add_argument('--full', action='store_true', help='Retrain from scratch instead of fine-tuning the newest version')
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY, help='Model registry directory')
+    parser.add_argument('--sweep', default=None, help='best.json of sweep.py: batch size and epochs for full training')
+    parser.add_argument('--horizon', type=int, default=0,
+                        help='Also train a direct model for this many steps and forecast with a single call')
+    parser.add_argument('--scenarios', type=float, nargs='+', default=None, metavar='MHZ',
+                        help='Additional forecasts assuming these CPU frequencies, run as one batch')
+    args = parser.parse_args()
+
     print("\nLoading data...")
-    df = pd.read_csv('data/raw/temp_log_multi.csv', parse_dates=['timestamp'])
+    df = load_telemetry(args.source)
     print(f"Dataset loaded successfully with {len(df)} records")
 
     print("\nInitiating LSTM model training...")
-    model, (scaler_temp, scaler_mhz), history = train_lstm(df, training_ratio=0.01)
+    # Newest registered version fine-tuned on the new rows; full training only for the first version or --full
+    model, (scaler_temp, scaler_mhz), meta = update_model('little', args.source, args.registry, args.full, df=df,
+                                                           sweep_path=args.sweep)
+    print(f"Using model version {meta['version']} (data until {meta['data_range']['end']})")
 
     print("\nPreparing test data from last 4 hours...")
     last_timestamp = df['timestamp'].max()
@@ -202,6 +267,14 @@ if __name__ == "__main__":
 
     # Calculate mean MHz before making predictions
     mean_mhz = df['avg_mhz'].mean()
+
+    direct_model = None
+    if args.horizon:
+        history = df[['temp', 'avg_mhz']].values
+        direct_model = train_direct(np.column_stack((
+            scaler_temp.transform(history[:, 0].reshape(-1, 1)),
+            scaler_mhz.transform(history[:, 1].reshape(-1, 1))
+        )), 20, args.horizon)
     
     print("\nErstelle Vorhersagen...")
     predictions, y_test, future_predictions = make_predictions(
@@ -210,7 +283,9 @@ if __name__ == "__main__":
         X_test, 
         y_test, 
         timestamps_test,
-        mean_mhz
+        mean_mhz,
+        direct_model=direct_model,
+        scenarios=args.scenarios
     )
 
     print("\nAnalysis complete!")
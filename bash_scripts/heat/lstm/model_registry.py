@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# Lokale Modell-Registry für die LSTM-Modelle mit inkrementellem Nachtraining.
+#
+#   python model_registry.py update little -s ../data/store        # nightly: fine-tune on the new rows
+#   python model_registry.py update little -s ../data/store --full # train from scratch on the whole history
+#   python model_registry.py list little
+#   python model_registry.py compare little -s ../data/store --hours 24
+#
+# Layout: <registry>/<name>/v0001/, v0002/, ... mit model.keras und meta.json im
+# selben Format wie ein tflite_export.py-Export (Features, Sequenzlänge, Split,
+# MinMaxScaler-Parameter), dazu Datenbereich, Elternversion und Metriken.
+# Jede Version lässt sich also mit tflite_export.py --from weiterverarbeiten.
+#
+# Nachtraining: die neueste Version wird geladen und nur auf den Zeilen nach dem
+# Ende ihres Datenbereichs trainiert, gemischt mit einer Zufallsstichprobe älterer
+# Fenster (Replay), damit das Modell das ältere Verhalten nicht vergisst. Liegen
+# neue Werte außerhalb des Scaler-Bereichs, wird der Bereich (mit Reserve)
+# erweitert und die erste und letzte Schicht so umgerechnet, dass das Modell
+# vorher exakt dieselben Vorhersagen in °C liefert.
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from heat_store import HeatStore, load_telemetry
+from sequences import sliding_windows
+
+DEFAULT_REGISTRY = 'models/registry'
+VERSION_RE = re.compile(r'^v(\d{4,})$')
+
+# Modellvarianten: Features, Sequenzlänge und Split wie in den Trainingsfunktionen
+MODELS = {
+    'little': {'features': ['temp', 'avg_mhz'], 'sequence_length': 20, 'split': (0.7, 0.15), 'units': 32},
+    'basic': {'features': ['temp'], 'sequence_length': 60, 'split': (0.5, 0.3), 'units': 50},
+    'regressor': {'features': ['temp', 'avg_mhz'], 'sequence_length': 60, 'split': (0.5, 0.3), 'units': 50},
+}
+
+def scaler_params(scaler, name):
+    """JSON-friendly parameters of a fitted single-column MinMaxScaler."""
+    return {
+        'name': name,
+        'data_min': float(scaler.data_min_[0]),
+        'data_max': float(scaler.data_max_[0]),
+        'feature_range': [float(v) for v in scaler.feature_range],
+        'scale': float(scaler.scale_[0]),
+        'min': float(scaler.min_[0]),
+    }
+
+def scaler_from_params(params):
+    """Fitted MinMaxScaler from scaler_params() output."""
+    from sklearn.preprocessing import MinMaxScaler
+    scaler = MinMaxScaler(feature_range=tuple(params['feature_range']))
+    scaler.fit(np.array([[params['data_min']], [params['data_max']]]))
+    return scaler
+
+def model_meta(features, sequence_length, split, scalers):
+    """meta.json content apart from the conversion details."""
+    return {
+        'features': list(features),
+        'target': features[0],
+        'sequence_length': int(sequence_length),
+        'split': list(split),
+        'scalers': [scaler_params(scaler, name) for scaler, name in zip(scalers, features)],
+    }
+
+def model_spec(name):
+    """(kind, features, sequence_length, split) of a registry name: little, basic, regressor[_<column>]."""
+    kind, _, regressor = name.partition('_')
+    if kind not in MODELS:
+        raise ValueError(f"Unknown model {name!r}, use one of {sorted(MODELS)} (regressor_<column> for others)")
+    spec = MODELS[kind]
+    features = ['temp', regressor] if kind == 'regressor' and regressor else spec['features']
+    return kind, features, spec['sequence_length'], spec['split']
+
+def train(kind, df, features, sequence_length, csv_path=None, sweep_path=None):
+    """Train one of the model variants with its existing training function; returns (model, scalers, history).
+
+    sweep_path (best.json of sweep.py) sets batch size and epochs of the little model.
+    """
+    if kind == 'little':
+        from lstm_model_little import train_lstm
+        return train_lstm(df, sequence_length, csv_path=csv_path, sweep_path=sweep_path)
+    if kind == 'basic':
+        from lstm_model import train_basic_lstm
+        model, scaler, history = train_basic_lstm(df, sequence_length, csv_path=csv_path)
+        return model, (scaler,), history
+    from lstm_model import train_lstm_with_regressor
+    return train_lstm_with_regressor(df, features[1], sequence_length, csv_path=csv_path)
+
+def utc_timestamps(df):
+    # Naive timestamps count as UTC, like in the store
+    return pd.DatetimeIndex(pd.to_datetime(df['timestamp'], utc=True, format='ISO8601'))
+
+def load_rows(source, features, start=None, df=None):
+    """Timestamps (UTC) and feature rows from a store or CSV (or an already loaded df), from `start` on."""
+    if df is None and os.path.isdir(source):
+        df = HeatStore(source).read(start=start, columns=features)
+        start = None
+    elif df is None:
+        df = load_telemetry(source)
+    ts = utc_timestamps(df)
+    keep = slice(None) if start is None else ts >= start
+    return ts[keep], df[features].to_numpy(dtype=np.float64)[keep]
+
+# --- Scaler-Erweiterung ------------------------------------------------------
+
+def expanded_params(params, values, margin=0.1):
+    """Scaler params covering `values`; unchanged if they fit, otherwise widened with `margin` reserve."""
+    lo, hi = float(np.nanmin(values)), float(np.nanmax(values))
+    if params['data_min'] <= lo and hi <= params['data_max']:
+        return params
+    reserve = margin * max(params['data_max'] - params['data_min'], hi - lo, 1e-6)
+    data_min = min(params['data_min'], lo - reserve) if lo < params['data_min'] else params['data_min']
+    data_max = max(params['data_max'], hi + reserve) if hi > params['data_max'] else params['data_max']
+    return scaler_params(scaler_from_params({**params, 'data_min': data_min, 'data_max': data_max}),
+                         params['name'])
+
+def remap_scalers(model, old, new):
+    """Rewrite the input and output layer for new scaler params, keeping predictions in °C identical.
+
+    Scaling is affine per feature (x * scale + min), so old-scaled inputs are an
+    affine function of new-scaled ones; that folds into the first layer's input
+    kernel and bias. The target column's change folds into the last Dense layer.
+    """
+    old_scale = np.array([p['scale'] for p in old])
+    old_min = np.array([p['min'] for p in old])
+    new_scale = np.array([p['scale'] for p in new])
+    new_min = np.array([p['min'] for p in new])
+    if np.array_equal(old_scale, new_scale) and np.array_equal(old_min, new_min):
+        return
+
+    # x_old = ratio * x_new + shift
+    ratio = old_scale / new_scale
+    shift = old_min - new_min * ratio
+    first = model.layers[0]
+    kernel, *rest = first.get_weights()
+    bias = rest[-1]
+    first.set_weights([kernel * ratio[:, None].astype(kernel.dtype), *rest[:-1],
+                       (bias + shift @ kernel).astype(bias.dtype)])
+
+    # y_new = (y_old - min_old) * scale_new / scale_old + min_new
+    out_ratio = new_scale[0] / old_scale[0]
+    last = model.layers[-1]
+    kernel, bias = last.get_weights()
+    last.set_weights([(kernel * out_ratio).astype(kernel.dtype),
+                      ((bias - old_min[0]) * out_ratio + new_min[0]).astype(bias.dtype)])
+
+# --- Registry ------------------------------------------------------------------
+
+class ModelRegistry:
+    """Versioned model.keras + meta.json directories per model name."""
+
+    def __init__(self, path=DEFAULT_REGISTRY):
+        self.path = path
+
+    def versions(self, name):
+        """Sorted version numbers of a model."""
+        directory = os.path.join(self.path, name)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(match.group(1)) for match in map(VERSION_RE.match, os.listdir(directory)) if match)
+
+    def version_dir(self, name, version):
+        return os.path.join(self.path, name, f'v{version:04d}')
+
+    def latest(self, name):
+        versions = self.versions(name)
+        return versions[-1] if versions else None
+
+    def meta(self, name, version=None):
+        version = self.latest(name) if version is None else version
+        if version is None:
+            raise FileNotFoundError(f"No versions of {name!r} in {self.path}")
+        with open(os.path.join(self.version_dir(name, version), 'meta.json')) as f:
+            return json.load(f)
+
+    def load(self, name, version=None):
+        """(model, scalers, meta) of a version, the newest by default."""
+        import tensorflow as tf
+        meta = self.meta(name, version)
+        model = tf.keras.models.load_model(os.path.join(self.version_dir(name, meta['version']), 'model.keras'))
+        return model, tuple(scaler_from_params(p) for p in meta['scalers']), meta
+
+    def register(self, name, model, meta):
+        """Store a new version; written to a temporary directory first, so a crash leaves no half version."""
+        version = (self.latest(name) or 0) + 1
+        final = self.version_dir(name, version)
+        tmp = f'{final}.tmp'
+        os.makedirs(tmp, exist_ok=True)
+        meta = {**meta, 'name': name, 'version': version, 'registered': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        model.save(os.path.join(tmp, 'model.keras'))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, final)
+        return meta
+
+def data_range(timestamps, rows):
+    return {'start': timestamps[0].isoformat(), 'end': timestamps[-1].isoformat(), 'rows': int(rows)}
+
+def csv_data_range(csv_path, block=1024 * 1024):
+    """data_range of a CSV log from its first and last line plus a newline count, without loading it."""
+    rows = 0
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        first = f.readline()
+        f.seek(len(header))
+        last_byte = b'\n'
+        while data := f.read(block):
+            rows += data.count(b'\n')
+            last_byte = data[-1:]
+        size = f.tell()
+        rows += last_byte != b'\n'  # last line without newline
+        f.seek(max(size - 64 * 1024, len(header)))
+        last = f.read().rstrip(b'\r\n').rsplit(b'\n', 1)[-1]
+    if not first.strip():
+        raise ValueError(f"{csv_path} has no data rows")
+    edges = pd.read_csv(io.BytesIO(header + first.rstrip(b'\r\n') + b'\n' + last + b'\n'), usecols=['timestamp'])
+    return data_range(utc_timestamps(edges), rows)
+
+# --- Training ------------------------------------------------------------------
+
+def train_full(registry, name, source, stream=False, df=None, sweep_path=None):
+    """Train from scratch on the whole history and register the result."""
+    kind, features, sequence_length, split = model_spec(name)
+    stream = stream and not os.path.isdir(source)
+    if stream:
+        # The training functions read the CSV in chunks; only its first/last line and row count are needed here
+        rows_range = csv_data_range(source)
+    else:
+        df = load_telemetry(source) if df is None else df
+        rows_range = data_range(utc_timestamps(df), len(df))
+    start = time.perf_counter()
+    model, scalers, history = train(kind, df, features, sequence_length, source if stream else None, sweep_path)
+    meta = model_meta(features, sequence_length, split, scalers)
+    meta.update(
+        kind=kind, mode='full', parent=None,
+        data_range=rows_range,
+        epochs=len(history.history['loss']),
+        val_mse=float(history.history['val_loss'][-1]),
+        train_seconds=round(time.perf_counter() - start, 1),
+    )
+    return model, scalers, registry.register(name, model, meta)
+
+def fine_tune(registry, name, source, epochs=5, replay=1.0, replay_days=30, learning_rate=1e-4,
+              batch_size=64, val_ratio=0.15, margin=0.1, min_rows=None, seed=0, df=None):
+    """Warm-start the newest version on the rows after its data range plus a replay sample.
+
+    Returns (model, scalers, meta); meta is the parent's if there was too little new data.
+    """
+    import tensorflow as tf
+    from streaming import array_dataset
+    model, scalers, parent = registry.load(name)
+    features, seq = parent['features'], parent['sequence_length']
+    end = pd.Timestamp(parent['data_range']['end'])
+    ts, rows = load_rows(source, features, start=end - timedelta(days=replay_days), df=df)
+
+    first_new = int(ts.searchsorted(end, side='right'))
+    n_new = len(rows) - first_new
+    min_rows = min_rows or max(10 * seq, 200)
+    if n_new < min_rows:
+        print(f"{name} v{parent['version']}: {n_new} new rows since {end}, need {min_rows}; nothing to do")
+        return model, scalers, parent
+
+    params = [expanded_params(p, rows[first_new:, i], margin) for i, p in enumerate(parent['scalers'])]
+    expanded = [p['name'] for p, old in zip(params, parent['scalers']) if p is not old]
+    if expanded:
+        remap_scalers(model, parent['scalers'], params)
+        print(f"Scaler range widened for {', '.join(expanded)}")
+    scale = np.array([p['scale'] for p in params])
+    offset = np.array([p['min'] for p in params])
+    X, y = sliding_windows(rows * scale + offset, seq, target=0, dtype=np.float32)
+
+    # Window i predicts row i + seq: new windows start where their target is a new row
+    new_start = max(first_new - seq, 0)
+    n_val = max(int((len(X) - new_start) * val_ratio), 1)
+    train_idx = np.arange(new_start, len(X) - n_val)
+    rng = np.random.default_rng(seed)
+    n_replay = min(int(len(train_idx) * replay), new_start)
+    replay_idx = np.sort(rng.choice(new_start, n_replay, replace=False)) if n_replay else np.empty(0, dtype=int)
+    idx = np.concatenate((replay_idx, train_idx))
+    X_val, y_val = np.ascontiguousarray(X[-n_val:]), np.ascontiguousarray(y[-n_val:])
+
+    print(f"Fine-tuning {name} v{parent['version']} on {len(train_idx)} new + {n_replay} replay windows "
+          f"({n_val} for validation)")
+    start = time.perf_counter()
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate), loss='mse')
+    parent_val = float(model.evaluate(X_val, y_val, batch_size=256, verbose=0))
+    parent_weights = model.get_weights()
+    history = model.fit(
+        array_dataset(X, y, batch_size, shuffle=True, indices=idx), validation_data=(X_val, y_val), epochs=epochs,
+        callbacks=[tf.keras.callbacks.EarlyStopping(patience=2, restore_best_weights=True)], verbose=1,
+    )
+    val = min(history.history['val_loss'])
+    if val >= parent_val:
+        # No improvement on the newest data: keep the parent's weights (already remapped), still advance the range
+        model.set_weights(parent_weights)
+        val = parent_val
+
+    meta = {key: parent[key] for key in ('features', 'target', 'sequence_length', 'split', 'kind')}
+    meta.update(
+        scalers=params, mode='finetune', parent=parent['version'],
+        data_range={'start': parent['data_range']['start'], 'end': ts[-1].isoformat(),
+                    'rows': parent['data_range']['rows'] + n_new},
+        new_rows=n_new, replay_windows=n_replay, scaler_expanded=expanded,
+        epochs=len(history.history['loss']), learning_rate=learning_rate,
+        val_mse=val, parent_val_mse=parent_val, improved=val < parent_val,
+        train_seconds=round(time.perf_counter() - start, 1),
+    )
+    meta = registry.register(name, model, meta)
+    return model, tuple(scaler_from_params(p) for p in params), meta
+
+def update_model(name, source, registry=None, full=False, stream=False, df=None, sweep_path=None,
+                 **fine_tune_args):
+    """Fine-tune the newest version, or train from scratch if there is none (or full=True).
+
+    Returns (model, scalers, meta). Pass df if the source is already loaded.
+    """
+    registry = registry if isinstance(registry, ModelRegistry) else ModelRegistry(registry or DEFAULT_REGISTRY)
+    if full or registry.latest(name) is None:
+        return train_full(registry, name, source, stream, df, sweep_path)
+    return fine_tune(registry, name, source, df=df, **fine_tune_args)
+
+# --- Vergleich -------------------------------------------------------------------
+
+def compare_versions(registry, name, source, hours=24, versions=None):
+    """One-step MAE/RMSE in °C of each version on the last `hours` of data."""
+    versions = versions or registry.versions(name)
+    features = registry.meta(name, versions[0])['features']
+    if os.path.isdir(source):
+        ts, rows = load_rows(source, features, start=HeatStore(source).last_timestamp() - timedelta(hours=hours))
+    else:
+        ts, rows = load_rows(source, features)
+        keep = ts >= ts[-1] - timedelta(hours=hours)
+        ts, rows = ts[keep], rows[keep]
+    results = []
+    for version in versions:
+        model, _, meta = registry.load(name, version)
+        scale = np.array([p['scale'] for p in meta['scalers']])
+        offset = np.array([p['min'] for p in meta['scalers']])
+        X, y = sliding_windows(rows * scale + offset, meta['sequence_length'], target=0, dtype=np.float32)
+        pred = model.predict(X, batch_size=256, verbose=0).ravel()
+        error = (pred - y) / scale[0]
+        results.append({'version': version, 'mode': meta['mode'], 'end': meta['data_range']['end'],
+                        'windows': len(X), 'mae': float(np.abs(error).mean()),
+                        'rmse': float(np.sqrt(np.mean(error ** 2)))})
+    return results
+
+def print_versions(registry, name):
+    print(f"{'version':>7}  {'mode':<8} {'parent':>6}  {'data until':<25} {'rows':>10}  {'val mse':>9}  {'train s':>8}")
+    for version in registry.versions(name):
+        meta = registry.meta(name, version)
+        parent = '-' if meta['parent'] is None else meta['parent']
+        print(f"{version:>7}  {meta['mode']:<8} {parent:>6}  {meta['data_range']['end']:<25} "
+              f"{meta['data_range']['rows']:>10}  {meta['val_mse']:>9.6f}  {meta['train_seconds']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Versioned LSTM models with incremental retraining')
+    parser.add_argument('-r', '--registry', default=DEFAULT_REGISTRY, help='Registry directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    update = commands.add_parser('update', help='Fine-tune the newest version on new rows (or train the first one)')
+    update.add_argument('name', help='little, basic, regressor or regressor_<column>')
+    update.add_argument('-s', '--source', default='data/raw/temp_log_multi.csv', help='CSV log or store directory')
+    update.add_argument('--full', action='store_true', help='Train from scratch on the whole history')
+    update.add_argument('--stream', action='store_true', help='With --full: train from the CSV in chunks')
+    update.add_argument('--sweep', default=None, help='With --full: best.json of sweep.py for batch size and epochs')
+    update.add_argument('--epochs', type=int, default=5)
+    update.add_argument('--replay', type=float, default=1.0, help='Replay windows per new training window')
+    update.add_argument('--replay-days', type=float, default=30, help='Age limit of the replay sample')
+    update.add_argument('--lr', type=float, default=1e-4, help='Fine-tuning learning rate')
+    update.add_argument('--batch-size', type=int, default=64)
+
+    listing = commands.add_parser('list', help='Show the versions of a model')
+    listing.add_argument('name')
+
+    compare = commands.add_parser('compare', help='Evaluate versions on the most recent data')
+    compare.add_argument('name')
+    compare.add_argument('-s', '--source', default='data/raw/temp_log_multi.csv')
+    compare.add_argument('--hours', type=float, default=24)
+    compare.add_argument('--versions', type=int, nargs='*', default=None)
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    if args.command == 'update':
+        _, _, meta = update_model(args.name, args.source, registry, args.full, args.stream,
+                                  sweep_path=args.sweep, epochs=args.epochs,
+                                  replay=args.replay, replay_days=args.replay_days, learning_rate=args.lr,
+                                  batch_size=args.batch_size)
+        print(f"{args.name} v{meta['version']}: data until {meta['data_range']['end']}, "
+              f"val MSE {meta['val_mse']:.6f}, {meta['train_seconds']:.0f}s")
+    elif args.command == 'list':
+        print_versions(registry, args.name)
+    else:
+        for result in compare_versions(registry, args.name, args.source, args.hours, args.versions):
+            print(f"v{result['version']:04d} ({result['mode']}, data until {result['end']}): "
+                  f"MAE {result['mae']:.3f} °C, RMSE {result['rmse']:.3f} °C on {result['windows']} windows")
+
+if __name__ == "__main__":
+    main()
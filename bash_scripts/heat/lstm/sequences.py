@@ -0,0 +1,75 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Gemeinsamer Sequenz-Builder für lstm_model.py und lstm_model_little.py.
+# Statt Slice-Kopien in einer Python-Schleife zu sammeln, werden die Fenster
+# als read-only Views auf das (einmal skalierte) Eingangsarray erzeugt.
+
+def sliding_windows(data, seq_length, target=None, dtype=None):
+    """Return (X, y) for next-step prediction without copying the windows.
+
+    data:   array of shape (N,) or (N, F)
+    target: column index for y, or None to return the full row (N - seq_length, F)
+    dtype:  e.g. np.float32 to cast the input once before windowing
+
+    X has shape (N - seq_length, seq_length, F) and is a strided, read-only view.
+    """
+    data = np.asarray(data, dtype=dtype)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    if len(data) <= seq_length:
+        raise ValueError(f"Need more than {seq_length} rows to build sequences, got {len(data)}")
+
+    # (N - seq_length + 1, F, seq_length) -> (N - seq_length, seq_length, F)
+    windows = sliding_window_view(data, seq_length, axis=0)[:-1]
+    X = np.moveaxis(windows, -1, 1)
+
+    y = data[seq_length:] if target is None else data[seq_length:, target]
+    y = y.view()
+    y.flags.writeable = False
+    return X, y
+
+def multi_horizon_windows(data, seq_length, horizon, target=0, dtype=None):
+    """Return (X, Y) for direct multi-step forecasting, both as views.
+
+    Y[i] holds the next `horizon` values of the target column after window X[i],
+    shape (N - seq_length - horizon + 1, horizon).
+    """
+    data = np.asarray(data, dtype=dtype)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    n_windows = len(data) - seq_length - horizon + 1
+    if n_windows <= 0:
+        raise ValueError(f"Need at least {seq_length + horizon} rows, got {len(data)}")
+
+    X = np.moveaxis(sliding_window_view(data, seq_length, axis=0)[:n_windows], -1, 1)
+    Y = sliding_window_view(data[seq_length:, target], horizon)
+    return X, Y
+
+def split_chronological(X, y, train_ratio, val_ratio):
+    """Split sequences in time order into train/val/test views."""
+    train_size = int(len(X) * train_ratio)
+    val_size = int(len(X) * val_ratio)
+    train_end, val_end = train_size, train_size + val_size
+    return (
+        (X[:train_end], y[:train_end]),
+        (X[train_end:val_end], y[train_end:val_end]),
+        (X[val_end:], y[val_end:]),
+    )
+
+def iter_batches(X, y, batch_size, shuffle=False, seed=None, indices=None):
+    """Lazily yield contiguous (X_batch, y_batch) copies, one batch at a time.
+
+    Only one batch of windows is ever materialized, so this works on views
+    that would not fit into memory as a dense (N, seq_length, F) array.
+    indices restricts the batches to these windows (in this order unless shuffled).
+    """
+    contiguous = indices is None and not shuffle
+    indices = np.arange(len(X)) if indices is None else np.array(indices)
+    if shuffle:
+        np.random.default_rng(seed).shuffle(indices)
+    for start in range(0, len(indices), batch_size):
+        batch = indices[start:start + batch_size]
+        if contiguous:
+            batch = slice(batch[0], batch[-1] + 1)
+        yield np.ascontiguousarray(X[batch]), np.ascontiguousarray(y[batch])
@@ -1,60 +1,181 @@
-# /home/pi/Desktop/nico-hoff/generate_future_data.py
-import csv
-from datetime import datetime, timedelta
-import random
-
-def generate_full_load(duration_minutes):
-    data = []
-    current_time = datetime.now()
-    
-    for i in range(duration_minutes * 60):  # One entry per second
-        timestamp = current_time + timedelta(seconds=i)
-        # Full load with small variations
-        mhz = random.uniform(1750, 1800)
-        data.append([timestamp.strftime('%Y-%m-%d %H:%M:%S'), f'{mhz:.2f}'])
-    
-    return data
-
-def generate_idle(duration_minutes):
-    data = []
-    current_time = datetime.now()
-    
-    for i in range(duration_minutes * 60):
-        timestamp = current_time + timedelta(seconds=i)
-        # Idle state with small variations
-        mhz = random.uniform(1450, 1500)
-        data.append([timestamp.strftime('%Y-%m-%d %H:%M:%S'), f'{mhz:.2f}'])
-    
-    return data
-
-def generate_dynamic(duration_minutes):
-    data = []
-    current_time = datetime.now()
-    
-    for i in range(duration_minutes * 60):
-        timestamp = current_time + timedelta(seconds=i)
-        # Create a dynamic pattern
-        base = 1500 + 300 * abs(((i % 300) - 150) / 150)  # 5-minute cycle
-        variation = random.uniform(-50, 50)
-        mhz = base + variation
-        data.append([timestamp.strftime('%Y-%m-%d %H:%M:%S'), f'{mhz:.2f}'])
-    
-    return data
+#!/usr/bin/env python3
+# Synthetic heat telemetry (timestamp,temp,avg_mhz,load,fan) for load tests of
+# python_analysis.py and the LSTM scripts.
+#
+#   python simulate.py --days 14 --interval 1 -o ../data/tests/sim.csv
+#   python simulate.py --days 60 --interval 3 --store ../data/tests/sim_store --seed 7
+#
+# Model (fully vectorized, generated in chunks so weeks of sub-second data fit in memory):
+#   load     regimes of random length: idle, full load and a 5-minute dynamic cycle
+#            (the patterns of the old generator), plus noise
+#   avg_mhz  follows the load, capped when the SoC gets hot (thermal throttling)
+#   temp     first-order lag towards ambient + load heat - fan cooling, plus sensor noise
+#   fan      hysteresis controller (on above --fan-on, off below --fan-off)
+# Defaults: full load settles at ambient + 52 - 8 (fan) = 79-85 °C over the day, so
+# daytime load peaks cross throttle_temp (80 °C) and avg_mhz is capped by 200 MHz
+# per °C above it (median ~1480 MHz while >= 80 °C in a simulated week). That gives
+# throttle_events.py over_temp and freq_drop episodes. Idle sits around 40 °C, the
+# dynamic cycle around 60-70 °C. --load-heat/--fan-cooling shift this.
+# The fan couples back into the temperature, which a vectorized filter can't express
+# exactly: the fan state is derived from the temperature without fan, then the
+# temperature is recomputed with the fan's cooling. Same seed, same data.
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from heat_store import HeatStore
+
+COLUMNS = ['temp', 'avg_mhz', 'load', 'fan']
+IDLE, FULL, DYNAMIC = 0, 1, 2
+
+class ThermalModel:
+    def __init__(self, ambient=38.0, ambient_swing=3.0, load_heat=52.0, fan_cooling=8.0, tau=90.0,
+                 min_mhz=600.0, max_mhz=1800.0, throttle_temp=80.0, throttle_mhz_per_deg=200.0,
+                 fan_on=65.0, fan_off=55.0, temp_noise=0.3, mhz_noise=15.0, mean_regime_minutes=10.0):
+        self.ambient, self.ambient_swing = ambient, ambient_swing
+        self.load_heat, self.fan_cooling, self.tau = load_heat, fan_cooling, tau
+        self.min_mhz, self.max_mhz = min_mhz, max_mhz
+        self.throttle_temp, self.throttle_mhz_per_deg = throttle_temp, throttle_mhz_per_deg
+        self.fan_on, self.fan_off = fan_on, fan_off
+        self.temp_noise, self.mhz_noise = temp_noise, mhz_noise
+        self.mean_regime_minutes = mean_regime_minutes
+
+def regimes(rng, duration_s, mean_minutes):
+    """(start_seconds, kind) of consecutive load regimes covering the duration."""
+    n = int(duration_s / (mean_minutes * 60) * 2) + 2
+    lengths = rng.exponential(mean_minutes * 60, n)
+    while lengths.sum() < duration_s:
+        lengths = np.concatenate((lengths, rng.exponential(mean_minutes * 60, n)))
+    starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+    kinds = rng.choice([IDLE, FULL, DYNAMIC], size=len(starts), p=[0.5, 0.2, 0.3])
+    keep = starts < duration_s
+    return starts[keep], kinds[keep]
+
+def load_series(rng, t, regime_starts, regime_kinds):
+    kind = regime_kinds[np.searchsorted(regime_starts, t, side='right') - 1]
+    # Same shapes as the old generator: idle ~1450-1500 MHz, full ~1750-1800, 5-minute triangle
+    idle = rng.uniform(0.05, 0.15, len(t))
+    full = rng.uniform(0.9, 1.0, len(t))
+    dynamic = 0.3 + 0.6 * np.abs(((t % 300) - 150) / 150) + rng.uniform(-0.05, 0.05, len(t))
+    load = np.select([kind == IDLE, kind == FULL], [idle, full], dynamic)
+    return np.clip(load, 0.0, 1.0)
+
+def lag(x, alpha, state):
+    """y[i] = y[i-1] + alpha * (x[i] - y[i-1]) as an IIR filter; returns (y, last y)."""
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * state])
+    return y, y[-1]
+
+def hysteresis(temp, on, off, state):
+    """Fan state per sample: switches on at >= on, off at <= off, otherwise keeps the last state."""
+    trigger = np.full(len(temp), -1, dtype=np.int8)
+    trigger[temp >= on] = 1
+    trigger[temp <= off] = 0
+    # Forward-fill the last trigger via the running maximum of its index
+    idx = np.where(trigger >= 0, np.arange(len(temp)), -1)
+    np.maximum.accumulate(idx, out=idx)
+    return np.where(idx >= 0, trigger[np.maximum(idx, 0)], state).astype(np.int8)
+
+def simulate(start, duration_s, interval=1.0, seed=None, model=None, chunk_rows=1_000_000):
+    """Yield (timestamps_ms, {column: array}) chunks covering the duration."""
+    model = model or ThermalModel()
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start)
+    start_ms = (start if start.tzinfo else start.tz_localize('UTC')).value // 1_000_000
+    n_rows = int(duration_s / interval)
+    regime_starts, regime_kinds = regimes(rng, duration_s, model.mean_regime_minutes)
+    alpha = 1.0 - np.exp(-interval / model.tau)
+    free_state = cooled_state = model.ambient
+    fan_state = 0
+
+    for first in range(0, n_rows, chunk_rows):
+        t = np.arange(first, min(first + chunk_rows, n_rows)) * interval
+        load = load_series(rng, t, regime_starts, regime_kinds)
+        # Coolest at midnight UTC, warmest at noon
+        day_phase = 2 * np.pi * ((start_ms / 1000 + t) % 86400) / 86400
+        ambient = model.ambient - model.ambient_swing * np.cos(day_phase)
+        target = ambient + load * model.load_heat
+
+        free, free_state = lag(target, alpha, free_state)
+        fan = hysteresis(free, model.fan_on, model.fan_off, fan_state)
+        fan_state = fan[-1]
+        temp, cooled_state = lag(target - fan * model.fan_cooling, alpha, cooled_state)
+
+        mhz = model.min_mhz + load * (model.max_mhz - model.min_mhz)
+        throttle_cap = model.max_mhz - np.maximum(temp - model.throttle_temp, 0) * model.throttle_mhz_per_deg
+        mhz = np.clip(np.minimum(mhz, throttle_cap) + rng.normal(0, model.mhz_noise, len(t)), model.min_mhz, model.max_mhz)
+
+        ts_ms = start_ms + np.round(t * 1000).astype(np.int64)
+        yield ts_ms, {
+            'temp': np.round(temp + rng.normal(0, model.temp_noise, len(t)), 1),
+            'avg_mhz': np.round(mhz, 1),
+            'load': np.round(load, 3),
+            'fan': fan,
+        }
+
+def to_frame(ts_ms, values, interval):
+    unit = 's' if interval >= 1 else 'ms'
+    timestamps = np.datetime_as_string(ts_ms.astype('datetime64[ms]'), unit=unit, timezone='UTC')
+    return pd.DataFrame({'timestamp': timestamps, **values})
+
+def write_csv(chunks, path, interval):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        for i, (ts_ms, values) in enumerate(chunks):
+            to_frame(ts_ms, values, interval).to_csv(f, header=(i == 0), index=False)
+            rows += len(ts_ms)
+    return rows
+
+def write_store(chunks, path):
+    store = HeatStore(path, columns=COLUMNS, create=True)
+    last = store.last_timestamp()
+    rows = 0
+    for ts_ms, values in chunks:
+        if last is not None:
+            keep = ts_ms > last.value // 1_000_000
+            ts_ms, values = ts_ms[keep], {col: v[keep] for col, v in values.items()}
+        store.append(ts_ms, values)
+        rows += len(ts_ms)
+    return rows
 
 def main():
-    # Generate 10 minutes of each pattern
-    full_load_data = generate_full_load(10)
-    idle_data = generate_idle(10)
-    dynamic_data = generate_dynamic(10)
-    
-    # Combine all data
-    all_data = full_load_data + idle_data + dynamic_data
-    
-    # Write to CSV file
-    with open('../data/tests/future.csv', 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['timestamp', 'mhz'])  # Header
-        writer.writerows(all_data)
+    parser = argparse.ArgumentParser(description='Generate synthetic heat telemetry')
+    parser.add_argument('--days', type=float, default=0.0)
+    parser.add_argument('--hours', type=float, default=0.0)
+    parser.add_argument('--rows', type=int, default=None, help='Number of rows (overrides --days/--hours)')
+    parser.add_argument('-i', '--interval', type=float, default=1.0, help='Sampling interval in seconds')
+    parser.add_argument('--start', default='2025-01-01', help='First timestamp (UTC)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ambient', type=float, default=38.0, help='Mean ambient temperature (°C)')
+    parser.add_argument('--tau', type=float, default=90.0, help='Thermal time constant in seconds')
+    parser.add_argument('--load-heat', type=float, default=52.0, help='Temperature rise at full load (°C)')
+    parser.add_argument('--fan-cooling', type=float, default=8.0, help='Temperature drop with the fan on (°C)')
+    parser.add_argument('--fan-on', type=float, default=65.0)
+    parser.add_argument('--fan-off', type=float, default=55.0)
+    parser.add_argument('-o', '--output', default=None, help='CSV file to write')
+    parser.add_argument('--store', default=None, help='HeatStore directory to append to')
+    args = parser.parse_args()
+
+    duration = args.rows * args.interval if args.rows else (args.days * 24 + args.hours) * 3600
+    if duration <= 0:
+        duration = 30 * 60  # same 30 minutes as the old generator
+    if not args.output and not args.store:
+        args.output = '../data/tests/simulated.csv'
+
+    model = ThermalModel(ambient=args.ambient, tau=args.tau, load_heat=args.load_heat, fan_cooling=args.fan_cooling,
+                         fan_on=args.fan_on, fan_off=args.fan_off)
+    if args.output:
+        rows = write_csv(simulate(args.start, duration, args.interval, args.seed, model), args.output, args.interval)
+        print(f"Wrote {rows} rows to {args.output}")
+    if args.store:
+        rows = write_store(simulate(args.start, duration, args.interval, args.seed, model), args.store)
+        print(f"Appended {rows} rows to {args.store}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from sklearn.preprocessing import MinMaxScaler
+from sequences import iter_batches, sliding_windows
+
+# Streaming-Eingabepipeline für das LSTM-Training: das Roh-Log wird in Chunks
+# gelesen, mit den MinMaxScalern skaliert und erst im Generator zu Fenstern
+# zusammengesetzt. Der Speicherbedarf hängt damit nur von chunksize ab.
+# array_dataset macht dasselbe für Fenster-Views im Speicher (iter_batches).
+
+CHUNKSIZE = 100_000
+
+def scan_log(csv_path, columns, scalers=None, chunksize=CHUNKSIZE):
+    """Count rows in one chunked pass, fitting MinMaxScalers if none are given."""
+    fit = scalers is None
+    if fit:
+        scalers = [MinMaxScaler() for _ in columns]
+    n_rows = 0
+    for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+        if fit:
+            for scaler, col in zip(scalers, columns):
+                scaler.partial_fit(chunk[[col]].values)
+        n_rows += len(chunk)
+    return scalers, n_rows
+
+def iter_scaled_chunks(csv_path, columns, scalers, skip_rows=0, max_rows=None, chunksize=CHUNKSIZE):
+    """Yield scaled float32 blocks of shape (rows, len(columns))."""
+    # Header read once, then skiprows as an int: a range would become a set with one entry per skipped row
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    reader = pd.read_csv(
+        csv_path,
+        header=None,
+        names=header,
+        usecols=columns,
+        chunksize=chunksize,
+        skiprows=skip_rows + 1,
+        nrows=max_rows,
+    )
+    for chunk in reader:
+        yield np.column_stack([
+            scaler.transform(chunk[[col]].values) for scaler, col in zip(scalers, columns)
+        ]).astype(np.float32)
+
+def iter_window_chunks(csv_path, columns, scalers, seq_length, start, stop, target=0, chunksize=CHUNKSIZE):
+    """Yield (X, y) blocks for window indices [start, stop).
+
+    Window i uses rows i .. i + seq_length - 1 and predicts row i + seq_length,
+    exactly like sliding_windows on the full array. The last seq_length rows of
+    each chunk are carried over so windows spanning chunk boundaries are kept.
+    """
+    carry = None
+    for block in iter_scaled_chunks(csv_path, columns, scalers, skip_rows=start,
+                                    max_rows=stop - start + seq_length, chunksize=chunksize):
+        if carry is not None:
+            block = np.concatenate([carry, block])
+        if len(block) > seq_length:
+            X, y = sliding_windows(block, seq_length, target=target)
+            yield np.ascontiguousarray(X), np.ascontiguousarray(y)
+        carry = block[-seq_length:]
+
+def window_dataset(csv_path, columns, scalers, seq_length, start, stop, batch_size,
+                   target=0, shuffle_buffer=None, chunksize=CHUNKSIZE):
+    """Batched, prefetching tf.data.Dataset over window indices [start, stop)."""
+    n_features = len(columns)
+    y_shape = (None,) if np.isscalar(target) else (None, len(target))
+    dataset = tf.data.Dataset.from_generator(
+        lambda: iter_window_chunks(csv_path, columns, scalers, seq_length, start, stop, target, chunksize),
+        output_signature=(
+            tf.TensorSpec(shape=(None, seq_length, n_features), dtype=tf.float32),
+            tf.TensorSpec(shape=y_shape, dtype=tf.float32),
+        ),
+    ).unbatch()
+    if shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def array_dataset(X, y, batch_size, shuffle=False, indices=None):
+    """Batched tf.data.Dataset over in-memory windows, copied one batch at a time.
+
+    model.fit(X, ...) on a sliding_windows view would first turn it into one
+    dense (N, seq_length, F) array; this feeds the view through iter_batches.
+    A shuffled dataset draws a new order every epoch.
+    """
+    n_batches = -(-(len(X) if indices is None else len(indices)) // batch_size)
+    dataset = tf.data.Dataset.from_generator(
+        lambda: iter_batches(X, y, batch_size, shuffle, indices=indices),
+        output_signature=(
+            tf.TensorSpec(shape=(None, *X.shape[1:]), dtype=tf.float32),
+            tf.TensorSpec(shape=(None, *y.shape[1:]), dtype=tf.float32),
+        ),
+    )
+    # Known length: Keras shows epoch progress and doesn't warn about the generator running out
+    return dataset.apply(tf.data.experimental.assert_cardinality(n_batches)).prefetch(tf.data.AUTOTUNE)
+
+def streaming_splits(csv_path, columns, seq_length, train_ratio, val_ratio, batch_size,
+                     target=0, scalers=None, n_rows=None, shuffle_buffer=None, chunksize=CHUNKSIZE):
+    """Chronological train/val/test datasets streamed from csv_path.
+
+    The split boundaries are computed on the window count, so the ratios match
+    split_chronological on the in-memory path (50/30/20, 70/15/15, ...).
+    Pass both scalers and n_rows (from a previous scan_log) to skip the scan.
+    Returns (scalers, n_rows, (train_ds, val_ds, test_ds)).
+    """
+    if scalers is None or n_rows is None:
+        scalers, n_rows = scan_log(csv_path, columns, scalers, chunksize)
+    n_windows = n_rows - seq_length
+    if n_windows <= 0:
+        raise ValueError(f"Need more than {seq_length} rows to build sequences, got {n_rows}")
+    train_end = int(n_windows * train_ratio)
+    val_end = train_end + int(n_windows * val_ratio)
+
+    def make(start, stop, shuffle=None):
+        return window_dataset(csv_path, columns, scalers, seq_length, start, stop, batch_size,
+                              target=target, shuffle_buffer=shuffle, chunksize=chunksize)
+
+    datasets = (
+        make(0, train_end, shuffle_buffer),
+        make(train_end, val_end),
+        make(val_end, n_windows),
+    )
+    return scalers, n_rows, datasets
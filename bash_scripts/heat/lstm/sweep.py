@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# Parallele Hyperparameter-Suche für die LSTM-Modelle.
+#
+#   python sweep.py ../data/raw/temp_log_2.csv                       # default grid, all cores
+#   python sweep.py ../data/store --seq 20 60 --units 32 50 --batch 32 64 128 \
+#       --features temp temp,avg_mhz -w 4 -t 2 -o ../models/sweep
+#
+# Das Log wird einmal geladen, mit einem MinMaxScaler pro Spalte skaliert und als
+# data.npy ins Ausgabeverzeichnis geschrieben. Die Worker (eigene Prozesse, je
+# --threads Threads für TensorFlow) öffnen es per np.load(mmap_mode='r'), teilen
+# sich also den Page-Cache statt je eine Kopie zu laden. Alle Trials nutzen
+# dieselbe Temperatur-Skalierung, die Validierungs-MSE ist damit vergleichbar.
+#
+# Pro Trial: Early Stopping auf der Validierungs-MSE (beste Gewichte zählen) und
+# Pruning nach der Median-Regel: ab --min-epochs wird ein Trial abgebrochen, wenn
+# sein bestes Ergebnis schlechter ist als der Median der anderen Trials nach
+# gleich vielen Epochen. Die Verläufe liegen dafür als JSON unter trials/.
+# --arch wählt die Architektur: basic = LSTM + Dense wie lstm_model.py, little =
+# build_model aus lstm_model_little.py (Dropout, Dense(16)).
+# Ergebnis: leaderboard.csv/.json (nach Validierungs-MSE sortiert) und best.json
+# mit dem besten Trial insgesamt und je Modell aus model_registry.MODELS (gleiche
+# Architektur, Sequenzlänge, Units, Features, Lernrate 1e-3). lstm_model_little.py
+# --sweep best.json übernimmt daraus Batch-Größe und Epochen statt der Heuristik.
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from multiprocessing import get_context
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from heat_store import load_telemetry
+from model_registry import MODELS
+from sequences import sliding_windows
+
+DEFAULT_OUTPUT = 'models/sweep'
+SPLIT = (0.7, 0.15)
+ARCHITECTURES = ('basic', 'little')
+
+# --- Gemeinsamer Datensatz -------------------------------------------------------
+
+def source_signature(source):
+    """Size and mtime of a CSV, or of the newest store segment, to detect changed input."""
+    paths = [source] if not os.path.isdir(source) else [os.path.join(source, name) for name in os.listdir(source)]
+    stats = [os.stat(path) for path in paths]
+    return {'source': os.path.abspath(source), 'bytes': sum(s.st_size for s in stats),
+            'mtime': max(s.st_mtime for s in stats)}
+
+def prepare_dataset(source, columns, out_dir):
+    """Scaled float32 data.npy plus dataset.json in out_dir; reused while source and columns are unchanged."""
+    from sklearn.preprocessing import MinMaxScaler
+    from model_registry import scaler_params
+    meta_path = os.path.join(out_dir, 'dataset.json')
+    signature = {**source_signature(source), 'columns': list(columns)}
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if {key: meta.get(key) for key in signature} == signature:
+            return meta
+
+    df = load_telemetry(source)
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"{source} has no column(s) {missing}")
+    data = df[columns].dropna().to_numpy(dtype=np.float64)
+    scalers = [MinMaxScaler().fit(data[:, [i]]) for i in range(len(columns))]
+    scaled = np.column_stack([scaler.transform(data[:, [i]]).ravel() for i, scaler in enumerate(scalers)])
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, 'data.npy'), scaled.astype(np.float32))
+    meta = {**signature, 'rows': len(data),
+            'scalers': [scaler_params(scaler, col) for scaler, col in zip(scalers, columns)]}
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+def default_feature_sets(columns):
+    """temp alone, temp with each other column, and all columns (the models of lstm_model.py)."""
+    others = [col for col in columns if col != 'temp']
+    sets = [['temp']] + [['temp', col] for col in others]
+    if len(others) > 1:
+        sets.append(['temp'] + others)
+    return sets
+
+def numeric_columns(source):
+    df = load_telemetry(source).head(1000)
+    return [col for col in df.columns if col != 'timestamp' and np.issubdtype(df[col].dtype, np.number)]
+
+def grid(seq_lengths, units, batch_sizes, feature_sets, learning_rates, architectures=('basic',)):
+    """Trial configs, most expensive first so the slow ones don't end up alone at the tail."""
+    configs = [{'arch': arch, 'sequence_length': seq, 'units': u, 'batch_size': b, 'features': list(features),
+                'learning_rate': lr}
+               for arch, seq, u, b, features, lr in itertools.product(architectures, seq_lengths, units, batch_sizes,
+                                                                      feature_sets, learning_rates)]
+    configs.sort(key=lambda c: -c['sequence_length'] * c['units'] * len(c['features']) / c['batch_size'])
+    for i, config in enumerate(configs):
+        config['trial'] = f"t{i:03d}"
+    return configs
+
+# --- Worker ------------------------------------------------------------------------
+
+def init_worker(threads):
+    # Before TensorFlow is imported in this process
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+        os.environ[var] = str(threads)
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def windows(data, columns, features, seq_length):
+    """Split (train, val, test) window views of the shared data for one feature set."""
+    idx = [columns.index(col) for col in features]
+    # Only the selected columns are copied (rows x features); the windows stay views
+    block = data if idx == list(range(len(columns))) else data[:, idx]
+    X, y = sliding_windows(block, seq_length, target=0)
+    train_end = int(len(X) * SPLIT[0])
+    val_end = train_end + int(len(X) * SPLIT[1])
+    return (X, y), (0, train_end), (train_end, val_end), (val_end, len(X))
+
+def train_batches(X, y, start, stop, batch_size, rng, limit=None):
+    """Shuffled, contiguous (X, y) batches of window indices [start, stop), at most `limit` windows."""
+    indices = rng.permutation(np.arange(start, stop))[:limit]
+    for first in range(0, len(indices), batch_size):
+        batch = np.sort(indices[first:first + batch_size])
+        yield np.ascontiguousarray(X[batch]), np.ascontiguousarray(y[batch])
+
+def predict(model, X, start, stop, batch_size=1024):
+    """Predictions for windows [start, stop); the last batch is padded so the predict function is traced once."""
+    out = []
+    for i in range(start, stop, batch_size):
+        batch = np.zeros((batch_size,) + X.shape[1:], dtype=np.float32)
+        n = min(batch_size, stop - i)
+        batch[:n] = X[i:i + n]
+        out.append(model.predict_on_batch(batch).ravel()[:n])
+    return np.concatenate(out)
+
+def should_prune(trials_dir, trial, epoch, best, min_epochs, min_trials):
+    """Median rule: best loss so far worse than the median of other trials' best after as many epochs."""
+    if epoch + 1 < min_epochs:
+        return False
+    others = []
+    for name in os.listdir(trials_dir):
+        if not name.endswith('.json') or name == f'{trial}.json':
+            continue
+        try:
+            with open(os.path.join(trials_dir, name)) as f:
+                history = json.load(f)['val_mse']
+        except (OSError, ValueError):
+            continue  # being written right now
+        if len(history) > epoch:
+            others.append(min(history[:epoch + 1]))
+    return len(others) >= min_trials and best > np.median(others)
+
+def write_trial(trials_dir, result):
+    path = os.path.join(trials_dir, f"{result['trial']}.json")
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(result, f)
+    os.replace(f'{path}.tmp', path)
+
+def run_trial(task):
+    """Train one config with early stopping and pruning; returns its leaderboard row."""
+    config, opts = task
+    import tensorflow as tf
+    from tensorflow.keras.layers import LSTM, Dense
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.optimizers import Adam
+    from lstm_model_little import build_model
+
+    start = time.perf_counter()
+    with open(os.path.join(opts['output'], 'dataset.json')) as f:
+        dataset = json.load(f)
+    data = np.load(os.path.join(opts['output'], 'data.npy'), mmap_mode='r')
+    seq, features, batch_size = config['sequence_length'], config['features'], config['batch_size']
+    (X, y), train, val, test = windows(data, dataset['columns'], features, seq)
+    temp_scale = dataset['scalers'][dataset['columns'].index('temp')]['scale']
+
+    tf.keras.utils.set_random_seed(opts['seed'])
+    if config['arch'] == 'little':
+        model = build_model(seq, len(features), config['units'])
+    else:
+        # Same architecture as lstm_model.py, units and inputs from the config
+        model = Sequential([
+            LSTM(config['units'], activation='relu', input_shape=(seq, len(features))),
+            Dense(1)
+        ])
+    model.compile(optimizer=Adam(learning_rate=config['learning_rate']), loss='mse')
+
+    result = {**config, 'status': 'running', 'val_mse': [], 'epoch_seconds': [],
+              'params': int(model.count_params()), 'train_windows': train[1] - train[0]}
+    trials_dir = os.path.join(opts['output'], 'trials')
+    rng = np.random.default_rng(opts['seed'])
+    best, best_weights, waited = np.inf, None, 0
+    try:
+        for epoch in range(opts['max_epochs']):
+            t = time.perf_counter()
+            for Xb, yb in train_batches(X, y, *train, batch_size, rng, opts['max_train_windows']):
+                model.train_on_batch(Xb, yb)
+            val_mse = float(np.mean((predict(model, X, *val) - y[val[0]:val[1]]) ** 2))
+            result['val_mse'].append(val_mse)
+            result['epoch_seconds'].append(round(time.perf_counter() - t, 2))
+            if val_mse < best - opts['min_delta']:
+                best, best_weights, waited = val_mse, model.get_weights(), 0
+            else:
+                waited += 1
+            write_trial(trials_dir, result)
+            if not np.isfinite(val_mse):
+                result['status'] = 'diverged'
+                break
+            if waited >= opts['patience']:
+                result['status'] = 'early_stopped'
+                break
+            if should_prune(trials_dir, config['trial'], epoch, best, opts['min_epochs'], opts['min_trials']):
+                result['status'] = 'pruned'
+                break
+        else:
+            result['status'] = 'done'
+
+        if best_weights is not None:
+            model.set_weights(best_weights)
+            error = (predict(model, X, *test) - y[test[0]:test[1]]) / temp_scale
+            result['test_mae_c'] = float(np.abs(error).mean())
+    except Exception as e:  # one broken config must not take the sweep down
+        result['status'], result['error'] = 'failed', repr(e)
+
+    result.update(
+        best_val_mse=float(best) if np.isfinite(best) else None,
+        best_val_rmse_c=float(np.sqrt(best) / temp_scale) if np.isfinite(best) else None,
+        best_epoch=int(np.argmin(result['val_mse'])) + 1 if result['val_mse'] else None,
+        epochs=len(result['val_mse']),
+        seconds=round(time.perf_counter() - start, 1),
+    )
+    write_trial(trials_dir, result)
+    return result
+
+# --- Leaderboard ---------------------------------------------------------------------
+
+LEADERBOARD_FIELDS = ['rank', 'trial', 'status', 'best_val_mse', 'best_val_rmse_c', 'test_mae_c', 'arch',
+                      'sequence_length',
+                      'units', 'batch_size', 'learning_rate', 'features', 'best_epoch', 'epochs', 'params', 'seconds']
+
+def leaderboard(results):
+    """Results ranked by best validation MSE; pruned trials rank by what they reached, failed ones last."""
+    ranked = sorted(results, key=lambda r: (r['best_val_mse'] is None, r['best_val_mse'] or 0.0))
+    return [{**r, 'rank': i + 1} for i, r in enumerate(ranked)]
+
+def write_leaderboard(out_dir, ranked, info):
+    with open(os.path.join(out_dir, 'leaderboard.json'), 'w') as f:
+        json.dump({**info, 'trials': ranked}, f, indent=2)
+    with open(os.path.join(out_dir, 'leaderboard.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, LEADERBOARD_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for row in ranked:
+            writer.writerow({**row, 'features': '+'.join(row['features'])})
+    usable = [r for r in ranked if r['status'] != 'failed' and r['best_val_mse'] is not None]
+    if not usable:
+        return None
+    keys = ('trial', 'arch', 'sequence_length', 'units', 'batch_size', 'learning_rate', 'features', 'best_epoch',
+            'best_val_mse', 'best_val_rmse_c', 'test_mae_c')
+    models = {}
+    for row in usable:  # ranked, so the first match per model is its best trial
+        name = model_name(row)
+        if name is not None and name not in models:
+            models[name] = {key: row.get(key) for key in keys}
+    with open(os.path.join(out_dir, 'best.json'), 'w') as f:
+        json.dump({'source': info['source'], 'rows': info['rows'],
+                   'overall': {key: usable[0].get(key) for key in keys}, 'models': models}, f, indent=2)
+    return usable[0]
+
+def model_name(row):
+    """Registry name (little, basic, regressor_<col>) of the model a trial reproduces exactly, else None."""
+    kind = 'little' if row['arch'] == 'little' else ('basic' if len(row['features']) == 1 else 'regressor')
+    spec = MODELS[kind]
+    if (row['sequence_length'], row['units'], row['learning_rate']) != (spec['sequence_length'], spec['units'], 1e-3):
+        return None
+    if kind == 'little':
+        return kind if row['features'] == spec['features'] else None
+    return kind if kind == 'basic' else (f"regressor_{row['features'][1]}" if len(row['features']) == 2 else None)
+
+def print_leaderboard(ranked, top=10):
+    print(f"\n{'#':>3} {'trial':<6} {'status':<13} {'val MSE':>10} {'val RMSE °C':>11} {'test MAE °C':>11}  "
+          f"{'arch':<6} {'seq':>4} {'units':>5} {'batch':>5}  {'epoch':>5}  features")
+    for row in ranked[:top]:
+        fmt = lambda value, spec: format(value, spec) if value is not None else '-'
+        print(f"{row['rank']:>3} {row['trial']:<6} {row['status']:<13} {fmt(row['best_val_mse'], '10.6f')} "
+              f"{fmt(row['best_val_rmse_c'], '11.3f')} {fmt(row.get('test_mae_c'), '11.3f')}  "
+              f"{row['arch']:<6} {row['sequence_length']:>4} {row['units']:>5} {row['batch_size']:>5}  "
+              f"{fmt(row['best_epoch'], '>5')}  {'+'.join(row['features'])}")
+
+def sweep(source, configs, out_dir=DEFAULT_OUTPUT, workers=None, threads=None, **opts):
+    """Run all configs on a process pool; returns the ranked leaderboard."""
+    workers = min(workers or os.cpu_count(), len(configs))
+    threads = threads or max(1, os.cpu_count() // workers)
+    columns = sorted({col for config in configs for col in config['features']}, key=lambda c: (c != 'temp', c))
+    dataset = prepare_dataset(source, columns, out_dir)
+    trials_dir = os.path.join(out_dir, 'trials')
+    os.makedirs(trials_dir, exist_ok=True)
+    for name in os.listdir(trials_dir):
+        os.remove(os.path.join(trials_dir, name))  # histories of an earlier sweep would skew the pruning
+
+    opts = {'output': out_dir, 'max_epochs': 50, 'patience': 3, 'min_delta': 0.0, 'min_epochs': 3,
+            'min_trials': 3, 'max_train_windows': None, 'seed': 0, **opts}
+    print(f"{len(configs)} trials on {workers} workers x {threads} threads, {dataset['rows']} rows")
+    start = time.perf_counter()
+    results = []
+    # spawn: TensorFlow is not fork-safe, and each worker sets its thread limits before importing it
+    with get_context('spawn').Pool(workers, initializer=init_worker, initargs=(threads,)) as pool:
+        for result in pool.imap_unordered(run_trial, [(config, opts) for config in configs]):
+            results.append(result)
+            print(f"[{len(results)}/{len(configs)}] {result['trial']} {result['status']:<13} "
+                  f"val MSE {result['best_val_mse'] or float('nan'):.6f} after {result['epochs']} epochs "
+                  f"({result['seconds']:.0f}s)")
+    wall = time.perf_counter() - start
+    ranked = leaderboard(results)
+    info = {'source': dataset['source'], 'rows': dataset['rows'], 'workers': workers, 'threads': threads,
+            'wall_seconds': round(wall, 1), 'trial_seconds': round(sum(r['seconds'] for r in results), 1),
+            'options': {key: value for key, value in opts.items() if key != 'output'}}
+    write_leaderboard(out_dir, ranked, info)
+    print(f"\nSweep took {wall:.0f}s wall time for {info['trial_seconds']:.0f}s of trials")
+    return ranked
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel hyperparameter sweep for the LSTM models')
+    parser.add_argument('source', nargs='?', default='data/raw/temp_log_2.csv', help='CSV log or store directory')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='Dataset, trial histories and leaderboard')
+    parser.add_argument('--seq', type=int, nargs='+', default=[20, 60], help='Sequence lengths')
+    parser.add_argument('--units', type=int, nargs='+', default=[32, 50], help='LSTM units')
+    parser.add_argument('--batch', type=int, nargs='+', default=[32, 64, 128], help='Batch sizes')
+    parser.add_argument('--features', nargs='+', default=None,
+                        help='Comma-separated feature sets, temp first (default: temp, temp + each column, all)')
+    parser.add_argument('--lr', type=float, nargs='+', default=[1e-3], help='Learning rates')
+    parser.add_argument('--arch', nargs='+', choices=ARCHITECTURES, default=list(ARCHITECTURES),
+                        help='basic: LSTM + Dense (lstm_model.py), little: build_model of lstm_model_little.py')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Processes (default: all cores)')
+    parser.add_argument('-t', '--threads', type=int, default=None, help='TensorFlow threads per worker')
+    parser.add_argument('--max-epochs', type=int, default=50)
+    parser.add_argument('--patience', type=int, default=3, help='Epochs without improvement before stopping')
+    parser.add_argument('--min-epochs', type=int, default=3, help='Epochs before a trial can be pruned')
+    parser.add_argument('--min-trials', type=int, default=3, help='Trials needed for the pruning median')
+    parser.add_argument('--max-train-windows', type=int, default=None,
+                        help='Random training windows per epoch (default: all)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    feature_sets = ([s.split(',') for s in args.features] if args.features
+                    else default_feature_sets(numeric_columns(args.source)))
+    if any(features[0] != 'temp' for features in feature_sets):
+        parser.error("every feature set has to start with temp (the prediction target)")
+    configs = grid(args.seq, args.units, args.batch, feature_sets, args.lr, args.arch)
+    ranked = sweep(args.source, configs, args.output, args.workers, args.threads,
+                   max_epochs=args.max_epochs, patience=args.patience, min_epochs=args.min_epochs,
+                   min_trials=args.min_trials, max_train_windows=args.max_train_windows, seed=args.seed)
+    print_leaderboard(ranked, args.top)
+    print(f"\nLeaderboard saved to {os.path.join(args.output, 'leaderboard.csv')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# TFLite-Export für die LSTM-Modelle aus lstm_model_little.py und lstm_model.py.
+#
+#   python tflite_export.py ../data/raw/temp_log_multi.csv -o ../models/little              # trainiert train_lstm
+#   python tflite_export.py ../data/raw/temp_log_2.csv --model basic --quantize int8 -o ../models/basic_int8
+#   python tflite_export.py ../data/raw/temp_log_multi.csv --from ../models/little --quantize float16 \
+#       -o ../models/little_f16                                                            # ohne neu zu trainieren
+#
+# Ein Exportverzeichnis enthält:
+#   model.keras   das Float-Modell (Referenz, kann mit --from erneut quantisiert werden)
+#   model.tflite  das konvertierte Modell (none, float16, dynamic = int8-Gewichte, int8 = mit Aktivierungen)
+#   meta.json     Features, Sequenzlänge, Split und die MinMaxScaler-Parameter
+#   report.json   Abweichung zum Float-Modell auf dem Test-Split, Größe und Latenz pro Aufruf
+# Auf dem Pi reicht dann lite_forecaster.py mit meta.json + model.tflite.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from heat_store import load_telemetry
+from lite_forecaster import LiteForecaster, latency_stats, read_recent
+from model_registry import MODELS, csv_data_range, model_meta, train
+from sequences import sliding_windows, split_chronological
+
+QUANTIZATIONS = ('none', 'float16', 'dynamic', 'int8')
+
+def inference_copy(model):
+    """Same weights without dropout and with the LSTM unrolled.
+
+    The training model's recurrent dropout keeps RNG state variables and its
+    while-loop needs a static batch size; neither converts to TFLite builtins.
+    """
+    config = model.get_config()
+    for layer in config['layers']:
+        if layer['class_name'] == 'LSTM':
+            layer['config'].update(dropout=0.0, recurrent_dropout=0.0, unroll=True)
+    copy = tf.keras.Sequential.from_config(config)
+    copy.set_weights(model.get_weights())
+    return copy
+
+def convert(model, quantize='none', representative=None):
+    """TFLite flatbuffer of a Keras model; representative windows are needed for int8."""
+    if quantize not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantize!r}, use one of {QUANTIZATIONS}")
+    converter = tf.lite.TFLiteConverter.from_keras_model(inference_copy(model))
+    if quantize != 'none':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    if quantize == 'int8':
+        if representative is None:
+            raise ValueError("int8 quantization needs representative windows")
+        samples = np.asarray(representative, dtype=np.float32)
+        # Float input/output stay, so the scaler handling is the same for every variant
+        converter.representative_dataset = lambda: ([samples[i:i + 1]] for i in range(len(samples)))
+    return converter.convert()
+
+def export_model(model, meta, out_dir, quantize='none', representative=None):
+    """Write model.keras, model.tflite and meta.json into out_dir; returns the updated meta."""
+    os.makedirs(out_dir, exist_ok=True)
+    model.save(os.path.join(out_dir, 'model.keras'))
+    tflite = convert(model, quantize, representative)
+    with open(os.path.join(out_dir, 'model.tflite'), 'wb') as f:
+        f.write(tflite)
+    meta = {**meta, 'quantization': quantize, 'tflite_bytes': len(tflite),
+            'exported': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+def scale_features(data, meta):
+    """Feature rows scaled with the exported scaler parameters."""
+    scale = np.array([s['scale'] for s in meta['scalers']], dtype=np.float32)
+    offset = np.array([s['min'] for s in meta['scalers']], dtype=np.float32)
+    return np.asarray(data, dtype=np.float32) * scale + offset
+
+def scaled_windows(df, meta):
+    """Train and test windows of df, scaled with the exported scaler parameters."""
+    X, y = sliding_windows(scale_features(df[meta['features']], meta), meta['sequence_length'], target=0)
+    (X_train, _), _, (X_test, y_test) = split_chronological(X, y, *meta['split'])
+    return X_train, X_test, y_test
+
+def streamed_windows(csv_path, meta, max_test_windows=20_000, train_rows=50_000):
+    """Like scaled_windows, but reads only the head and tail of a CSV log (--stream).
+
+    The test windows are the last max_test_windows of the test split; the train
+    windows (only used as int8 representative samples) come from the first
+    train_rows rows of the train split.
+    """
+    seq = meta['sequence_length']
+    n_windows = csv_data_range(csv_path)['rows'] - seq
+    train_size = int(n_windows * meta['split'][0])
+    test_size = n_windows - train_size - int(n_windows * meta['split'][1])
+    if train_size < 1 or test_size < 1:
+        raise ValueError(f"{csv_path} is too short for the {meta['split']} split of {seq}-row windows")
+    _, tail = read_recent(csv_path, min(max_test_windows, test_size) + seq, meta['features'])
+    X_test, y_test = sliding_windows(scale_features(tail, meta), seq, target=0)
+    head = pd.read_csv(csv_path, usecols=meta['features'], nrows=min(train_rows, train_size) + seq)
+    X_train, _ = sliding_windows(scale_features(head[meta['features']], meta), seq, target=0)
+    return X_train, X_test, y_test
+
+def representative_windows(X_train, n=200, seed=0):
+    idx = np.sort(np.random.default_rng(seed).choice(len(X_train), min(n, len(X_train)), replace=False))
+    return np.ascontiguousarray(X_train[idx])
+
+def time_calls(fn, window, calls):
+    fn(window)  # warm-up (allocations, tracing)
+    times = []
+    for _ in range(calls):
+        t = time.perf_counter()
+        fn(window)
+        times.append(time.perf_counter() - t)
+    return latency_stats(times)
+
+def evaluate(model, out_dir, X_test, y_test, max_windows=20_000, calls=200):
+    """Drift of the TFLite model against the float model on the test split, in °C."""
+    lite = LiteForecaster(out_dir)
+    X_eval = np.ascontiguousarray(X_test[-max_windows:])
+    y_eval = lite.unscale_target(np.asarray(y_test[-max_windows:]).ravel())
+    float_pred = lite.unscale_target(model.predict(X_eval, batch_size=256, verbose=0).ravel())
+    lite_pred = lite.unscale_target(lite.predict(X_eval))
+    drift = np.abs(lite_pred - float_pred)
+
+    window = X_eval[-1]
+    report = {
+        'quantization': lite.meta['quantization'],
+        'windows': len(X_eval),
+        'tflite_bytes': os.path.getsize(os.path.join(out_dir, 'model.tflite')),
+        'keras_bytes': os.path.getsize(os.path.join(out_dir, 'model.keras')),
+        'drift_vs_float': {'mae': float(drift.mean()), 'max': float(drift.max()),
+                           'p99': float(np.percentile(drift, 99))},
+        'mae_float': float(np.abs(float_pred - y_eval).mean()),
+        'mae_tflite': float(np.abs(lite_pred - y_eval).mean()),
+        'latency': {
+            'tflite': time_calls(lite.predict_one, window, calls),
+            'keras_call': time_calls(lambda w: model(w[np.newaxis], training=False), window, calls),
+            'keras_predict': time_calls(lambda w: model.predict(w[np.newaxis], verbose=0), window, min(calls, 50)),
+        },
+    }
+    with open(os.path.join(out_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def print_report(report):
+    drift = report['drift_vs_float']
+    print(f"\n{report['quantization']}: {report['tflite_bytes'] / 1024:.0f} kB TFLite "
+          f"(Keras file {report['keras_bytes'] / 1024:.0f} kB), {report['windows']} test windows")
+    print(f"Drift vs. float model: MAE {drift['mae']:.4f} °C, p99 {drift['p99']:.4f} °C, max {drift['max']:.4f} °C")
+    print(f"Test MAE: float {report['mae_float']:.4f} °C, TFLite {report['mae_tflite']:.4f} °C")
+    for name, stats in report['latency'].items():
+        print(f"Latency {name:<14} p50 {stats['p50_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='Export an LSTM model with its scalers to TFLite')
+    parser.add_argument('source', help='CSV log or store directory (training data and test split)')
+    parser.add_argument('-o', '--output', required=True, help='Export directory')
+    parser.add_argument('--model', choices=sorted(MODELS), default='little')
+    parser.add_argument('--regressor', default='avg_mhz', help='Second feature of --model regressor')
+    parser.add_argument('--from', dest='from_dir', default=None,
+                        help='Previous export or registry version directory: reuse its model.keras and scalers')
+    parser.add_argument('-q', '--quantize', choices=QUANTIZATIONS, default='none')
+    parser.add_argument('--stream', action='store_true',
+                        help='CSV source: train from it in chunks and read only the test tail instead of the whole log')
+    parser.add_argument('--max-test-windows', type=int, default=20_000)
+    args = parser.parse_args()
+
+    stream = args.stream and not os.path.isdir(args.source)
+    df = None if stream else load_telemetry(args.source)
+    if args.from_dir:
+        model = tf.keras.models.load_model(os.path.join(args.from_dir, 'model.keras'))
+        with open(os.path.join(args.from_dir, 'meta.json')) as f:
+            meta = json.load(f)
+    else:
+        spec = MODELS[args.model]
+        features = ['temp', args.regressor] if args.model == 'regressor' else spec['features']
+        model, scalers, _ = train(args.model, df, features, spec['sequence_length'], args.source if stream else None)
+        meta = model_meta(features, spec['sequence_length'], spec['split'], scalers)
+
+    if stream:
+        X_train, X_test, y_test = streamed_windows(args.source, meta, args.max_test_windows)
+    else:
+        X_train, X_test, y_test = scaled_windows(df, meta)
+    representative = representative_windows(X_train) if args.quantize == 'int8' else None
+    export_model(model, meta, args.output, args.quantize, representative)
+    print(f"Exported to {args.output}")
+
+    print_report(evaluate(model, args.output, X_test, y_test, args.max_test_windows))
+
+if __name__ == "__main__":
+    main()
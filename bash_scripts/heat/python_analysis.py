@@ -1,65 +1,94 @@
 import pandas as pd
+import numpy as np
 import seaborn as sns
+import matplotlib
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 import os
+import json
 import argparse
 import getpass
+from heat_store import load_telemetry
+from rolling_stats import RollingCache, compute_window
+from throttle_events import DEFAULT_INDEX, load_index, to_utc
 
-# Add argument parsing
-parser = argparse.ArgumentParser(description='Temperature analysis script')
-parser.add_argument('-f', '--full', action='store_true', help='Run analysis for all time windows')
-args = parser.parse_args()
-
-# Load the data
-print("\nLoading data...")
-df = pd.read_csv('data/raw/temp_log_multi.csv', parse_dates=['timestamp'])
-
-# Boxplot for temperature and MHz distribution
-print("Plotting distributions...")
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
-sns.boxplot(y=df['temp'], ax=ax1)
-ax1.set_title('Temperature Distribution')
-ax1.set_ylabel('Temperature')
-ax1.grid(True, axis='y', linestyle='--', alpha=0.7)
-
-sns.boxplot(y=df['avg_mhz'], ax=ax2)
-ax2.set_title('CPU Frequency Distribution')
-ax2.set_ylabel('MHz')
-ax2.grid(True, axis='y', linestyle='--', alpha=0.7)
-
-plt.tight_layout()
-os_user = getpass.getuser()
-os.makedirs(f'graphs/{os_user}', exist_ok=True)
-plt.savefig(f'graphs/{os_user}/boxplot_total.png')
-plt.show()
+FIG_DPI = 100
+PLOT_WIDTH_PX = 12 * FIG_DPI  # figsize=(12, 8)
+RENDER_STATE = 'rendered.json'  # per graph dir: PNG name -> data it was rendered from
 
-# Defining helper function for saving the last x minutes of data
-def plot_time_window(i, df, minutes, title_suffix, window_size):
-    # Calculate rolling statistics for temperature
-    df['mhz_rolling_avg'] = df['avg_mhz'].rolling(window=window_size).mean()
-    df['rolling_avg'] = df['temp'].rolling(window=window_size).mean()
-    df['rolling_std'] = df['temp'].rolling(window=window_size).std()
-    df['bollinger_upper'] = df['rolling_avg'] + (3 * df['rolling_std'])
-    df['bollinger_lower'] = df['rolling_avg'] - (3 * df['rolling_std'])
-
-    window_df = df[df['timestamp'] >= df['timestamp'].max() - timedelta(minutes=minutes)]
-    if len(window_df) == 0:
-        return
+# Time windows mapping - structured as proper dictionary
+time_windows = {
+    '10_min': {'minutes': 10, 'window_size': 20},    # 20 seconds
+    '30_min': {'minutes': 30, 'window_size': 60},    # 1 minute
+    '4_h': {'minutes': 240, 'window_size': 300},     # 5 minutes
+    '1_d': {'minutes': 1440, 'window_size': 3600},     # 1 hour
+    '1_w': {'minutes': 10080, 'window_size': 14400}   # 4 hours
+}
 
-    window_df = window_df.dropna()
+def parse_args():
+    parser = argparse.ArgumentParser(description='Temperature analysis script')
+    parser.add_argument('-f', '--full', action='store_true', help='Run analysis for all time windows')
+    parser.add_argument('-s', '--source', default='data/raw/temp_log_multi.csv',
+                        help='CSV log or binary store directory (see heat_store.py)')
+    parser.add_argument('--no-cache', action='store_true', help='Recompute rolling statistics from scratch')
+    parser.add_argument('-b', '--batch', action='store_true',
+                        help='Headless mode: Agg backend, no plt.show(), windows rendered in a process pool')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Render processes in batch mode')
+    parser.add_argument('-e', '--events', default=DEFAULT_INDEX, help='Throttle event index to highlight (throttle_events.py)')
+    parser.add_argument('--force', action='store_true', help='Re-render plots even if they were already rendered from this data')
+    return parser.parse_args()
+
+def decimate_minmax(df, columns, n_buckets=PLOT_WIDTH_PX):
+    """Reduce df to the min and max row of each column per pixel column.
+
+    Rows are bucketed by time into n_buckets; keeping the extremes per bucket
+    draws the same envelope as the full series at that resolution.
+    """
+    if len(df) <= 2 * n_buckets:
+        return df
+    ts = df['timestamp']
+    span = (ts.iloc[-1] - ts.iloc[0]) / n_buckets
+    buckets = ((ts - ts.iloc[0]) // span).clip(upper=n_buckets - 1).to_numpy()
+    positions = pd.Series(np.arange(len(df)))
+    keep = [positions.iloc[[0, -1]].to_numpy()]
+    for col in columns:
+        grouped = pd.Series(df[col].to_numpy()).groupby(buckets)
+        keep.append(grouped.idxmin().dropna().to_numpy(dtype=np.int64))
+        keep.append(grouped.idxmax().dropna().to_numpy(dtype=np.int64))
+    return df.iloc[np.unique(np.concatenate(keep))]
+
+def plot_boxplots(df, graph_dir, show=True):
+    # Boxplot for temperature and MHz distribution
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
+    sns.boxplot(y=df['temp'], ax=ax1)
+    ax1.set_title('Temperature Distribution')
+    ax1.set_ylabel('Temperature')
+    ax1.grid(True, axis='y', linestyle='--', alpha=0.7)
 
+    sns.boxplot(y=df['avg_mhz'], ax=ax2)
+    ax2.set_title('CPU Frequency Distribution')
+    ax2.set_ylabel('MHz')
+    ax2.grid(True, axis='y', linestyle='--', alpha=0.7)
+
+    plt.tight_layout()
+    plt.savefig(f'{graph_dir}/boxplot_total.png')
+    if show:
+        plt.show()
+    plt.close(fig)
+
+def render_time_window(window_df, save_path, title_suffix, window_size, show=False, events=None):
     # Create figure with two subplots
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), sharex=True)
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), sharex=True, dpi=FIG_DPI)
 
     # Temperature plot
-    sns.lineplot(x=window_df['timestamp'], y=window_df['temp'], 
-                color='black', linestyle='-', label='Temperature', alpha=0.1, ax=ax1, linewidth=2)
-    sns.lineplot(x=window_df['timestamp'], y=window_df['rolling_avg'], 
-                color='orange', label=f'Rolling Avg (window={window_size})', ax=ax1, linewidth=2.5)
-    ax1.fill_between(window_df['timestamp'], 
-                    window_df['bollinger_lower'], 
+    ax1.plot(window_df['timestamp'], window_df['temp'],
+             color='black', linestyle='-', label='Temperature', alpha=0.1, linewidth=2)
+    ax1.plot(window_df['timestamp'], window_df['rolling_avg'],
+             color='orange', label=f'Rolling Avg (window={window_size})', linewidth=2.5)
+    ax1.fill_between(window_df['timestamp'],
+                    window_df['bollinger_lower'],
                     window_df['bollinger_upper'],
                     color='grey', alpha=0.3, label=f'Bollinger Bands (±3σ, window={window_size})')
     ax1.set_title(f'Temperature Plot - Last {title_suffix}')
@@ -68,10 +97,10 @@ def plot_time_window(i, df, minutes, title_suffix, window_size):
     ax1.legend()
 
     # MHz plot
-    sns.lineplot(x=window_df['timestamp'], y=window_df['avg_mhz'], 
-                color='blue', label='CPU Frequency', alpha=0.1, ax=ax2, linewidth=2)
-    sns.lineplot(x=window_df['timestamp'], y=window_df['mhz_rolling_avg'], 
-                color='blue', label='Avg CPU Frequency', ax=ax2, linewidth=2.5)
+    ax2.plot(window_df['timestamp'], window_df['avg_mhz'],
+             color='blue', label='CPU Frequency', alpha=0.1, linewidth=2)
+    ax2.plot(window_df['timestamp'], window_df['mhz_rolling_avg'],
+             color='blue', label='Avg CPU Frequency', linewidth=2.5)
     ax2.set_title(f'CPU Frequency - Last {title_suffix}')
     ax2.set_xlabel('Timestamp')
     ax2.set_ylabel('MHz')
@@ -79,40 +108,142 @@ def plot_time_window(i, df, minutes, title_suffix, window_size):
     ax2.grid(True)
     ax2.legend()
 
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    
-    save_path = f'graphs/{os_user}/plot_{i}_{title_suffix}.png'
-    plt.savefig(save_path)
-    plt.show()
+    # Indexed throttle events (throttle_events.py scan) that overlap this window
+    if events is not None and len(window_df):
+        # The index is UTC; the log may be naive or carry another offset
+        window_ts = to_utc(window_df['timestamp'])
+        shown = events[(events['end'] >= window_ts.iloc[0]) & (events['start'] <= window_ts.iloc[-1])]
+        for event in shown.itertuples():
+            for ax in (ax1, ax2):
+                ax.axvspan(event.start, event.end, color='red', alpha=0.15)
+
+    plt.setp(ax2.get_xticklabels(), rotation=45)
+    fig.tight_layout()
+
+    fig.savefig(save_path)
+    if show:
+        plt.show()
+    plt.close(fig)
+    return save_path
+
+def data_stamp(source, df):
+    """What a plot shows: source path, newest timestamp (UTC) and row count."""
+    return {'source': os.path.abspath(source), 'last': to_utc(df['timestamp'].iloc[-1:]).iloc[0].isoformat(),
+            'rows': len(df)}
+
+def load_render_state(graph_dir):
+    try:
+        with open(os.path.join(graph_dir, RENDER_STATE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_render_state(graph_dir, state):
+    with open(os.path.join(graph_dir, RENDER_STATE), 'w') as f:
+        json.dump(state, f, indent=2)
+
+def is_up_to_date(save_path, stamp, state):
+    """True if the PNG exists and was rendered from the same source and data."""
+    return os.path.exists(save_path) and state.get(os.path.basename(save_path)) == stamp
 
-# Time windows mapping - structured as proper dictionary
-time_windows = {
-    '10_min': {'minutes': 10, 'window_size': 20},    # 20 seconds
-    '30_min': {'minutes': 30, 'window_size': 60},    # 1 minute
-    '4_h': {'minutes': 240, 'window_size': 300},     # 5 minutes
-    '1_d': {'minutes': 1440, 'window_size': 3600},     # 1 hour
-    '1_w': {'minutes': 10080, 'window_size': 14400}   # 4 hours
-}
-
-# Plot different time windows
-print("Plotting temperature time windows...")
-if args.full:
-    windows_to_plot = time_windows
-else:
-    # Only use first two time windows if -f is not set
-    windows_to_plot = dict(list(time_windows.items())[:2])
-
-for i, (window_name, settings) in enumerate(tqdm(windows_to_plot.items(), desc="Rendering Time Windows")):
-    plot_time_window(
-        i,
-        df,
-        minutes=settings['minutes'],
-        title_suffix=window_name,
-        window_size=settings['window_size']
-    )
-
-# Filter the dataframe for rows where the timestamp is equal to today
-today = datetime.now().date()
-yesterday = today - timedelta(days=1)
-df = df[(df['timestamp'].dt.date >= today)] #  - timedelta(days=1))]
\ No newline at end of file
+# Defining helper function for saving the last x minutes of data
+def plot_time_window(i, df, minutes, title_suffix, window_size, graph_dir, rolling_cache=None, show=True, events=None):
+    # Rolling statistics only for the last `minutes` (+ warm-up rows), reusing the
+    # cached state from the previous run when the log was only appended to
+    if rolling_cache is None:
+        window_df = compute_window(df, minutes, window_size)
+    else:
+        window_df = rolling_cache.window(df, title_suffix, minutes, window_size)
+    if len(window_df) == 0:
+        return None
+
+    window_df = decimate_minmax(window_df, ['temp', 'avg_mhz'])
+    save_path = f'{graph_dir}/plot_{i}_{title_suffix}.png'
+    return render_time_window(window_df, save_path, title_suffix, window_size, show=show, events=events)
+
+def _init_render_worker():
+    matplotlib.use('Agg')
+
+def main():
+    args = parse_args()
+    if args.batch:
+        matplotlib.use('Agg')
+
+    # Load the data
+    print("\nLoading data...")
+    df = load_telemetry(args.source)
+    if not df['timestamp'].is_monotonic_increasing:
+        df = df.sort_values('timestamp', ignore_index=True)
+    rolling_cache = None if args.no_cache else RollingCache()
+    events = load_index(args.events) if os.path.exists(args.events) else None
+
+    os_user = getpass.getuser()
+    graph_dir = f'graphs/{os_user}'
+    os.makedirs(graph_dir, exist_ok=True)
+    stamp = data_stamp(args.source, df)
+    render_state = load_render_state(graph_dir)
+
+    # Plot different time windows
+    if args.full:
+        windows_to_plot = time_windows
+    else:
+        # Only use first two time windows if -f is not set
+        windows_to_plot = dict(list(time_windows.items())[:2])
+
+    if not args.batch:
+        print("Plotting distributions...")
+        plot_boxplots(df, graph_dir)
+        render_state['boxplot_total.png'] = stamp
+
+        print("Plotting temperature time windows...")
+        for i, (window_name, settings) in enumerate(tqdm(windows_to_plot.items(), desc="Rendering Time Windows")):
+            save_path = plot_time_window(
+                i,
+                df,
+                minutes=settings['minutes'],
+                title_suffix=window_name,
+                window_size=settings['window_size'],
+                graph_dir=graph_dir,
+                rolling_cache=rolling_cache,
+                events=events
+            )
+            if save_path is not None:
+                render_state[os.path.basename(save_path)] = stamp
+    else:
+        # Headless: statistics are computed here, only the (decimated) windows are
+        # shipped to the render processes; plots already rendered from this data are skipped
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_render_worker) as pool:
+            futures = []
+            for i, (window_name, settings) in enumerate(windows_to_plot.items()):
+                save_path = f'{graph_dir}/plot_{i}_{window_name}.png'
+                if not args.force and is_up_to_date(save_path, stamp, render_state):
+                    print(f"Skipping {window_name}: {save_path} is up to date")
+                    continue
+                if rolling_cache is None:
+                    window_df = compute_window(df, settings['minutes'], settings['window_size'])
+                else:
+                    window_df = rolling_cache.window(df, window_name, settings['minutes'], settings['window_size'])
+                if len(window_df) == 0:
+                    continue
+                window_df = decimate_minmax(window_df, ['temp', 'avg_mhz'])
+                futures.append(pool.submit(render_time_window, window_df, save_path, window_name, settings['window_size'], events=events))
+
+            boxplot_path = f'{graph_dir}/boxplot_total.png'
+            if args.force or not is_up_to_date(boxplot_path, stamp, render_state):
+                print("Plotting distributions...")
+                plot_boxplots(df, graph_dir, show=False)
+                render_state['boxplot_total.png'] = stamp
+
+            for future in tqdm(futures, desc="Rendering Time Windows"):
+                save_path = future.result()
+                render_state[os.path.basename(save_path)] = stamp
+                print(f"Saved {save_path}")
+    save_render_state(graph_dir, render_state)
+
+    # Filter the dataframe for rows where the timestamp is equal to today
+    today = datetime.now().date()
+    yesterday = today - timedelta(days=1)
+    df = df[(df['timestamp'].dt.date >= today)] #  - timedelta(days=1))]
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import math
+import os
+from collections import deque
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+# Rolling-Statistiken für die Zeitfenster in python_analysis.py.
+#
+# Statt rolling mean/std über die komplette Historie zu rechnen und danach auf die
+# letzten N Minuten zu schneiden, wird nur das benötigte Stück plus window_size - 1
+# Zeilen Vorlauf berechnet. Zusätzlich wird pro Fenster ein kleiner Zustand
+# (Ende der Eingabewerte + bereits berechnete Ausgaben) unter data/processed/rolling
+# abgelegt, sodass ein erneuter Lauf auf einem angehängten Log nur die neuen Zeilen
+# mit Welford-Updates verarbeitet.
+
+DEFAULT_CACHE_DIR = 'data/processed/rolling'
+# Ab so vielen neuen Zeilen ist die vektorisierte Neuberechnung schneller als die Schleife
+MAX_INCREMENTAL_ROWS = 20_000
+
+class RollingStats:
+    """Mean and sample std (ddof=1) over a fixed-size window with Welford updates."""
+
+    def __init__(self, window_size, tail=()):
+        self.window_size = window_size
+        self.values = deque(maxlen=window_size)
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        if len(tail):
+            self.values.extend(float(v) for v in tail[-window_size:])
+            arr = np.asarray(self.values, dtype=np.float64)
+            self.n, self.mean = len(arr), float(arr.mean())
+            self.m2 = float(((arr - self.mean) ** 2).sum())
+
+    def push(self, x):
+        if self.n < self.window_size:
+            self.n += 1
+            delta = x - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.values[0]
+            old_mean = self.mean
+            self.mean += (x - old) / self.n
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+        self.values.append(x)
+        if self.n < self.window_size:
+            return math.nan, math.nan
+        return self.mean, math.sqrt(max(self.m2, 0.0) / (self.n - 1)) if self.n > 1 else math.nan
+
+    def update(self, values):
+        """Push many values, returning (means, stds) arrays with NaN until the window is full."""
+        out = np.array([self.push(float(x)) for x in values], dtype=np.float64).reshape(-1, 2)
+        return out[:, 0], out[:, 1]
+
+def _add_bands(out):
+    out['bollinger_upper'] = out['rolling_avg'] + (3 * out['rolling_std'])
+    out['bollinger_lower'] = out['rolling_avg'] - (3 * out['rolling_std'])
+    return out
+
+def window_slice(df, minutes, window_size):
+    """Index range [pad_start, start) warm-up rows and [start, len) plot rows for the last `minutes`."""
+    ts = df['timestamp']
+    start = int(ts.searchsorted(ts.iloc[-1] - timedelta(minutes=minutes), side='left'))
+    return max(start - (window_size - 1), 0), start
+
+def compute_window(df, minutes, window_size):
+    """Rolling stats for the last `minutes` of df, computed on the slice + warm-up only.
+
+    df must be sorted by timestamp; it is not modified. Returns a new frame with
+    timestamp, temp, avg_mhz and the rolling/Bollinger columns (NaN rows dropped).
+    """
+    if len(df) == 0:
+        return df.iloc[0:0]
+    pad_start, start = window_slice(df, minutes, window_size)
+    part = df.iloc[pad_start:][['timestamp', 'temp', 'avg_mhz']].copy()
+    part['mhz_rolling_avg'] = part['avg_mhz'].rolling(window=window_size).mean()
+    part['rolling_avg'] = part['temp'].rolling(window=window_size).mean()
+    part['rolling_std'] = part['temp'].rolling(window=window_size).std()
+    part = _add_bands(part).iloc[start - pad_start:]
+    return part.dropna()
+
+class RollingCache:
+    """Persists per-window rolling state so appended logs only cost the new rows."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, f'{name}.npz')
+
+    def load(self, name, window_size):
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        state = dict(np.load(path))
+        if int(state['window_size']) != window_size:
+            return None
+        return state
+
+    def save(self, name, window_size, df, out):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tail = df.iloc[-window_size:]
+        np.savez(
+            self._path(name),
+            window_size=window_size,
+            last_ts=_to_ms(tail['timestamp'].iloc[-1:])[0],
+            last_temp=tail['temp'].iloc[-1],
+            temp_tail=tail['temp'].to_numpy(dtype=np.float64),
+            mhz_tail=tail['avg_mhz'].to_numpy(dtype=np.float64),
+            out_ts=_to_ms(out['timestamp']),
+            **{col: out[col].to_numpy(dtype=np.float64) for col in ('temp', 'avg_mhz', 'rolling_avg', 'rolling_std', 'mhz_rolling_avg')},
+        )
+
+    def window(self, df, name, minutes, window_size):
+        """Like compute_window, but reuses the cached state for `name` when df only grew."""
+        if len(df) == 0:
+            return compute_window(df, minutes, window_size)
+        state = self.load(name, window_size)
+        new_start = _resume_position(df, state) if state is not None else None
+
+        if new_start is None or len(df) - new_start > MAX_INCREMENTAL_ROWS:
+            out = compute_window(df, minutes, window_size)
+        else:
+            new = df.iloc[new_start:]
+            temp_stats = RollingStats(window_size, state['temp_tail'])
+            mhz_stats = RollingStats(window_size, state['mhz_tail'])
+            rolling_avg, rolling_std = temp_stats.update(new['temp'].to_numpy())
+            mhz_rolling_avg, _ = mhz_stats.update(new['avg_mhz'].to_numpy())
+
+            cached = pd.DataFrame({
+                'timestamp': pd.to_datetime(state['out_ts'], unit='ms', utc=True),
+                **{col: state[col] for col in ('temp', 'avg_mhz', 'mhz_rolling_avg', 'rolling_avg', 'rolling_std')},
+            })
+            tz = df['timestamp'].dt.tz
+            cached['timestamp'] = cached['timestamp'].dt.tz_convert(tz) if tz is not None else cached['timestamp'].dt.tz_localize(None)
+            fresh = pd.DataFrame({
+                'timestamp': new['timestamp'].reset_index(drop=True),
+                'temp': new['temp'].to_numpy(),
+                'avg_mhz': new['avg_mhz'].to_numpy(),
+                'mhz_rolling_avg': mhz_rolling_avg,
+                'rolling_avg': rolling_avg,
+                'rolling_std': rolling_std,
+            })
+            out = pd.concat([cached, fresh], ignore_index=True)
+            out = out[out['timestamp'] >= df['timestamp'].iloc[-1] - timedelta(minutes=minutes)]
+            out = _add_bands(out).dropna()
+
+        self.save(name, window_size, df, out)
+        return out
+
+def _to_ms(timestamps):
+    ts = pd.to_datetime(timestamps, utc=True)
+    return ((ts - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(milliseconds=1)).to_numpy(dtype=np.int64)
+
+def _resume_position(df, state):
+    """Row index of the first new row if df is the cached log plus appended rows, else None."""
+    last_ms = int(state['last_ts'])
+    ts_ms = _to_ms(df['timestamp'])
+    pos = int(np.searchsorted(ts_ms, last_ms, side='left'))
+    if pos >= len(df) or ts_ms[pos] != last_ms or not np.isclose(df['temp'].iloc[pos], state['last_temp']):
+        return None
+    return pos + 1
@@ -1,4 +1,4 @@
 #!/bin/bash
 source "/home/kali/Desktop/nico-hoff/venv/bin/activate"
-python3 "/home/kali/Desktop/nico-hoff/bash_scripts/heat/python_analysis.py"
+python3 "/home/kali/Desktop/nico-hoff/bash_scripts/heat/python_analysis.py" --batch
 deactivate
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# Erkennung und Index von Throttle-Episoden in den Heat-Logs.
+#
+# Ein einziger vektorisierter Durchlauf markiert drei Arten von Episoden:
+#   freq_drop   avg_mhz unter --mhz-threshold, während temp >= --warm-temp (thermisches Throttling)
+#   over_temp   temp >= --temp-threshold
+#   bollinger   temp außerhalb der ±3σ-Bänder (wie in plot_time_window)
+# Die Episoden landen mit start, end, duration_s, peak_temp und min_mhz in
+# data/processed/throttle_events.csv; `list` und `plot` lesen danach nur noch
+# diesen Index bzw. (mit Binär-Store) nur den Zeitbereich der Episode.
+
+import argparse
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from heat_store import HeatStore, load_telemetry
+
+DEFAULT_INDEX = 'data/processed/throttle_events.csv'
+EVENT_COLUMNS = ['kind', 'start', 'end', 'duration_s', 'peak_temp', 'min_mhz', 'rows']
+
+def runs(mask, merge_gap=0, min_rows=1):
+    """(start, stop) row ranges of True runs; gaps of <= merge_gap rows are bridged."""
+    mask = np.asarray(mask, dtype=bool)
+    if not mask.any():
+        return np.empty((0, 2), dtype=np.int64)
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if merge_gap > 0 and len(starts) > 1:
+        keep = np.concatenate(([True], starts[1:] - stops[:-1] > merge_gap))
+        starts, stops = starts[keep], np.concatenate((stops[:-1][keep[1:]], stops[-1:]))
+    long_enough = stops - starts >= min_rows
+    return np.column_stack((starts[long_enough], stops[long_enough]))
+
+def event_masks(df, mhz_threshold=1000.0, warm_temp=60.0, temp_threshold=80.0, window_size=300):
+    temp = df['temp'].to_numpy(dtype=np.float64)
+    mhz = df['avg_mhz'].to_numpy(dtype=np.float64)
+    rolling = df['temp'].rolling(window=window_size)
+    mean, std = rolling.mean().to_numpy(), rolling.std().to_numpy()
+    with np.errstate(invalid='ignore'):
+        return {
+            'freq_drop': (mhz < mhz_threshold) & (temp >= warm_temp),
+            'over_temp': temp >= temp_threshold,
+            'bollinger': (temp > mean + 3 * std) | (temp < mean - 3 * std),
+        }
+
+def detect_events(df, mhz_threshold=1000.0, warm_temp=60.0, temp_threshold=80.0, window_size=300,
+                  merge_gap=5, min_rows=2):
+    """DataFrame of episodes (one row each), sorted by start."""
+    ts = df['timestamp']
+    temp = df['temp'].to_numpy(dtype=np.float64)
+    mhz = df['avg_mhz'].to_numpy(dtype=np.float64)
+    frames = []
+    for kind, mask in event_masks(df, mhz_threshold, warm_temp, temp_threshold, window_size).items():
+        ranges = runs(mask, merge_gap, min_rows)
+        if len(ranges) == 0:
+            continue
+        starts, stops = ranges[:, 0], ranges[:, 1]
+        start_ts, end_ts = ts.iloc[starts].reset_index(drop=True), ts.iloc[stops - 1].reset_index(drop=True)
+        frames.append(pd.DataFrame({
+            'kind': kind,
+            'start': start_ts,
+            'end': end_ts,
+            'duration_s': (end_ts - start_ts).dt.total_seconds(),
+            'peak_temp': _reduce(np.fmax, temp, starts, stops),
+            'min_mhz': _reduce(np.fmin, mhz, starts, stops),
+            'rows': stops - starts,
+        }))
+    if not frames:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values('start', ignore_index=True)
+
+def _reduce(ufunc, values, starts, stops):
+    # reduceat over the [start, stop) boundaries; every second segment is an event.
+    # A trailing NaN keeps stop == len(values) a valid index (fmax/fmin ignore it).
+    padded = np.append(values, np.nan)
+    return ufunc.reduceat(padded, np.column_stack((starts, stops)).ravel())[::2]
+
+def write_index(events, path=DEFAULT_INDEX):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    events.to_csv(path, index=False)
+
+def to_utc(ts):
+    """Timestamps in UTC; naive ones (CSV logs without offset) are taken as UTC, like the store does."""
+    ts = pd.to_datetime(ts, format='ISO8601')
+    return ts.dt.tz_localize('UTC') if ts.dt.tz is None else ts.dt.tz_convert('UTC')
+
+def load_index(path=DEFAULT_INDEX):
+    events = pd.read_csv(path)
+    for col in ('start', 'end'):
+        events[col] = to_utc(events[col])
+    return events
+
+def event_data(source, event, padding_minutes=10):
+    """Telemetry around one event; with a binary store only that range is read."""
+    start = event['start'] - timedelta(minutes=padding_minutes)
+    end = event['end'] + timedelta(minutes=padding_minutes)
+    if os.path.isdir(source):
+        return HeatStore(source).read(start=start, end=end)
+    df = load_telemetry(source)
+    ts = to_utc(df['timestamp'])
+    return df[(ts >= start) & (ts <= end)]
+
+def plot_event(source, event, save_path, padding_minutes=10):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    df = event_data(source, event, padding_minutes)
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 6), sharex=True)
+    ax1.plot(df['timestamp'], df['temp'], color='black', linewidth=1)
+    ax1.set_ylabel('Temperature')
+    ax1.set_title(f"{event['kind']} {event['start']} ({event['duration_s']:.0f} s, "
+                  f"peak {event['peak_temp']:.1f}°C, min {event['min_mhz']:.0f} MHz)")
+    ax2.plot(df['timestamp'], df['avg_mhz'], color='blue', linewidth=1)
+    ax2.set_ylabel('MHz')
+    ax2.set_ylim(0, 2500)
+    for ax in (ax1, ax2):
+        ax.axvspan(event['start'], event['end'], color='red', alpha=0.15)
+        ax.grid(True)
+    plt.setp(ax2.get_xticklabels(), rotation=45)
+    fig.tight_layout()
+    fig.savefig(save_path)
+    plt.close(fig)
+    return save_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Detect and index throttle events')
+    parser.add_argument('-s', '--source', default='data/raw/temp_log_multi.csv',
+                        help='CSV log or binary store directory (see heat_store.py)')
+    parser.add_argument('-i', '--index', default=DEFAULT_INDEX, help='Event index CSV')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    scan = sub.add_parser('scan', help='Scan the telemetry and write the event index')
+    scan.add_argument('--mhz-threshold', type=float, default=1000.0)
+    scan.add_argument('--warm-temp', type=float, default=60.0)
+    scan.add_argument('--temp-threshold', type=float, default=80.0)
+    scan.add_argument('--window-size', type=int, default=300, help='Bollinger window (rows)')
+    scan.add_argument('--merge-gap', type=int, default=5, help='Bridge gaps of up to this many rows')
+    scan.add_argument('--min-rows', type=int, default=2)
+
+    listing = sub.add_parser('list', help='Print indexed events')
+    listing.add_argument('--kind', choices=['freq_drop', 'over_temp', 'bollinger'])
+    listing.add_argument('--min-duration', type=float, default=0.0, help='Seconds')
+
+    plot = sub.add_parser('plot', help='Plot indexed events')
+    plot.add_argument('events', type=int, nargs='+', help='Row numbers from `list`')
+    plot.add_argument('--padding', type=float, default=10.0, help='Minutes around the event')
+    args = parser.parse_args()
+
+    if args.command == 'scan':
+        print("\nLoading data...")
+        df = load_telemetry(args.source)
+        events = detect_events(df, args.mhz_threshold, args.warm_temp, args.temp_threshold,
+                               args.window_size, args.merge_gap, args.min_rows)
+        write_index(events, args.index)
+        print(events.groupby('kind').size().to_string() if len(events) else "No events found")
+        print(f"Event index saved to {args.index}")
+    elif args.command == 'list':
+        events = load_index(args.index)
+        if args.kind:
+            events = events[events['kind'] == args.kind]
+        print(events[events['duration_s'] >= args.min_duration].to_string())
+    else:
+        events = load_index(args.index)
+        os.makedirs('graphs/events', exist_ok=True)
+        for n in args.events:
+            event = events.iloc[n]
+            print(f"Saved {plot_event(args.source, event, f'graphs/events/event_{n}_{event.kind}.png', args.padding)}")
@@ -0,0 +1,225 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# Capture side of the camera pipeline: frame sources, a ring of preallocated frame
+# buffers and the grabber thread that keeps it filled.
+#
+# The grabber reads as fast as the source delivers, straight into the next ring
+# slot, so the camera's own buffer never backs up and consumers always get the
+# freshest frame. Slow consumers simply skip frames instead of slowing the capture.
+
+class SyntheticSource:
+    """Moving square on a noisy background; stands in for a camera in benchmarks."""
+
+    def __init__(self, width=640, height=480, fps=30.0, seed=0):
+        self.width, self.height, self.fps = width, height, fps
+        self.rng = np.random.default_rng(seed)
+        self.background = self.rng.integers(0, 40, (height, width, 3), dtype=np.uint8)
+        self.n = 0
+        self._next = time.monotonic()
+
+    def isOpened(self):
+        return True
+
+    def read(self, image=None):
+        if self.fps:
+            self._next += 1.0 / self.fps
+            time.sleep(max(self._next - time.monotonic(), 0))
+        if image is None:
+            image = np.empty_like(self.background)
+        np.copyto(image, self.background)
+        # The square moves for 3 s, then rests for 3 s, so motion detection has something to find
+        phase = self.n % int(6 * (self.fps or 30))
+        if phase < 3 * (self.fps or 30):
+            size = self.height // 6
+            x = int(phase * 4) % (self.width - size)
+            y = self.height // 2 - size // 2
+            image[y:y + size, x:x + size] = (40, 200, 240)
+        self.n += 1
+        return True, image
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FPS: self.fps, cv2.CAP_PROP_FRAME_WIDTH: self.width,
+                cv2.CAP_PROP_FRAME_HEIGHT: self.height}.get(prop, 0)
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        pass
+
+class FileSource:
+    """Video file, optionally paced at its native FPS and looped."""
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.realtime = realtime
+        self.loop = loop
+        self._next = time.monotonic()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        if self.realtime:
+            self._next += 1.0 / self.fps
+            time.sleep(max(self._next - time.monotonic(), 0))
+        ret, frame = self.cap.read(image)
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(image)
+        return ret, frame
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+def open_source(source="0", width=640, height=480, fps=30.0, realtime=True, loop=False):
+    """Camera index ("0"), video file path or "synthetic"."""
+    if source == "synthetic":
+        return SyntheticSource(width, height, fps if realtime else 0)
+    if str(source).isdigit():
+        cap = cv2.VideoCapture(int(source))
+        if not cap.isOpened():
+            raise Exception("Could not open the USB camera.")
+        # Optionally set the resolution
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # don't queue stale frames in the driver
+        return cap
+    cap = FileSource(source, realtime, loop)
+    if not cap.isOpened():
+        raise Exception(f"Could not open video file: {source}")
+    return cap
+
+class RateCounter:
+    """Events per second, smoothed over the last `window` seconds."""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self.times = deque()
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.times.append(now)
+        while self.times[0] < now - self.window:
+            self.times.popleft()
+
+    @property
+    def rate(self):
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0])
+
+class LatencyStats:
+    def __init__(self):
+        self.count, self.total, self.max, self.last = 0, 0.0, 0.0, 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+class FrameRing:
+    """Preallocated frame slots; the writer fills them round-robin.
+
+    A frame returned by latest() stays valid until the writer has wrapped around
+    the ring once, i.e. for slots - 1 further frames. Consumers that keep frames
+    longer than that must copy them.
+    """
+
+    def __init__(self, slots, shape, dtype=np.uint8):
+        self.frames = np.empty((slots, *shape), dtype=dtype)
+        self.timestamps = np.zeros(slots)
+        self.slots = slots
+        self.seq = -1
+        self.cond = threading.Condition()
+
+    def next_slot(self):
+        return self.frames[(self.seq + 1) % self.slots]
+
+    def publish(self, timestamp):
+        """Mark the slot returned by next_slot() as the newest frame."""
+        with self.cond:
+            self.seq += 1
+            self.timestamps[self.seq % self.slots] = timestamp
+            self.cond.notify_all()
+
+    def latest(self):
+        with self.cond:
+            if self.seq < 0:
+                return -1, 0.0, None
+            slot = self.seq % self.slots
+            return self.seq, self.timestamps[slot], self.frames[slot]
+
+    def get(self, seq):
+        """(timestamp, frame) of an older frame, or None once its slot is (about to be) reused."""
+        with self.cond:
+            if seq > self.seq or seq <= self.seq - self.slots + 1:
+                return None
+            slot = seq % self.slots
+            return self.timestamps[slot], self.frames[slot]
+
+    def wait_next(self, after_seq, timeout=1.0):
+        """Newest frame with seq > after_seq, or (-1, 0, None) on timeout."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > after_seq, timeout):
+                return -1, 0.0, None
+        return self.latest()
+
+class Grabber(threading.Thread):
+    """Reads frames from a source into a FrameRing on its own thread."""
+
+    def __init__(self, cap, slots=4):
+        super().__init__(daemon=True)
+        self.cap = cap
+        ret, first = cap.read()
+        if not ret:
+            raise Exception("Failed to grab frame.")
+        self.ring = FrameRing(slots, first.shape, first.dtype)
+        np.copyto(self.ring.next_slot(), first)
+        self.ring.publish(time.monotonic())
+        self.fps = RateCounter()
+        self.failed = False
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            slot = self.ring.next_slot()
+            ret, frame = self.cap.read(slot)
+            timestamp = time.monotonic()
+            if not ret:
+                self.failed = True
+                break
+            if not np.may_share_memory(frame, slot) and frame.shape == slot.shape:
+                np.copyto(slot, frame)  # backends that ignore the output buffer
+            self.ring.publish(timestamp)
+            self.fps.tick(timestamp)
+        with self.ring.cond:
+            self.ring.cond.notify_all()
+
+    @property
+    def running(self):
+        return self.is_alive() and not self.failed
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=2.0)
+        self.cap.release()
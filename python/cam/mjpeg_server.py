@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from capture import Grabber, RateCounter, open_source
+
+# MJPEG over HTTP for the camera pipeline (asyncio, no extra dependencies).
+#
+#   python mjpeg_server.py --port 8080 --width 640 --height 360 --quality 70 --max-fps 15
+#   http://<pi>:8080/            page with the stream
+#   http://<pi>:8080/stream.mjpg multipart/x-mixed-replace stream
+#   http://<pi>:8080/snapshot.jpg newest frame
+#   http://<pi>:8080/stats       encoder and per-client counters as JSON
+#
+# An encoder thread JPEG-encodes the newest frame once (only while someone is
+# watching, at most --max-fps times a second) and every client gets the same bytes.
+# Each client is served by its own coroutine that waits for the next frame and for
+# its socket to drain; a slow client therefore just skips frames and never delays
+# the encoder or the other clients.
+
+BOUNDARY = "frame"
+INDEX_HTML = b"<html><head><title>Camera</title></head><body style='margin:0;background:#000'>" \
+             b"<img src='/stream.mjpg' style='width:100%'></body></html>"
+
+class FrameHub:
+    """Newest encoded frame, shared by all client coroutines (event-loop side)."""
+
+    def __init__(self):
+        self.seq = -1
+        self.jpeg = None
+        self.event = asyncio.Event()
+        self.clients = {}
+        self.watching = threading.Event()  # tells the encoder thread whether to work
+
+    def publish(self, jpeg):
+        # seq counts encoded frames, so gaps seen by a client are frames it skipped
+        self.seq, self.jpeg = self.seq + 1, jpeg
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+    async def wait_next(self, after_seq):
+        while self.seq <= after_seq:
+            await self.event.wait()
+        return self.seq, self.jpeg
+
+    def add_client(self, peer):
+        stats = {"peer": str(peer), "sent": 0, "skipped": 0, "connected": time.time()}
+        self.clients[id(stats)] = stats
+        self.watching.set()
+        return stats
+
+    def remove_client(self, stats):
+        self.clients.pop(id(stats), None)
+        if not self.clients:
+            self.watching.clear()
+
+class Encoder(threading.Thread):
+    def __init__(self, ring, hub, loop, size=None, quality=75, max_fps=15.0):
+        super().__init__(daemon=True)
+        self.ring = ring
+        self.hub = hub
+        self.loop = loop
+        self.size = size
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.max_fps = max_fps
+        self.fps = RateCounter()
+        self.encoded = 0
+        self.skipped = 0
+        self.buffer = None
+        self.stop_event = threading.Event()
+
+    def encode(self, frame):
+        if self.size and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame, self.params)
+        return buf.tobytes() if ok else None
+
+    def run(self):
+        last, next_time = -1, 0.0
+        while not self.stop_event.is_set():
+            if not self.hub.watching.wait(timeout=0.5):
+                continue
+            if self.max_fps:
+                time.sleep(max(next_time - time.monotonic(), 0))
+                next_time = max(next_time + 1.0 / self.max_fps, time.monotonic())
+            seq, _, frame = self.ring.wait_next(last, timeout=0.5)
+            if frame is None:
+                continue
+            last = seq
+            # Encode a private copy: the grabber refills this ring slot slots - 1 frames later,
+            # and a slow resize/imencode would otherwise send a torn JPEG to every client
+            if self.buffer is None or self.buffer.shape != frame.shape:
+                self.buffer = np.empty_like(frame)
+            np.copyto(self.buffer, frame)
+            if self.ring.seq - seq >= self.ring.slots - 1:
+                self.skipped += 1  # slot was being overwritten while copying
+                continue
+            jpeg = self.encode(self.buffer)
+            if jpeg is None:
+                continue
+            self.encoded += 1
+            self.fps.tick()
+            self.loop.call_soon_threadsafe(self.hub.publish, jpeg)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=2.0)
+
+def http_response(status, content_type, body=b"", extra_headers=()):
+    headers = [f"HTTP/1.1 {status}", f"Content-Type: {content_type}", f"Content-Length: {len(body)}",
+               "Cache-Control: no-cache", "Connection: close", *extra_headers]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+
+class MJPEGServer:
+    def __init__(self, hub, encoder, buffered_frames=2):
+        self.hub = hub
+        self.encoder = encoder
+        self.buffered_frames = buffered_frames
+
+    def limit_buffers(self, writer, frame_size):
+        # Small buffers (ours and the kernel's): drain() blocks after about
+        # buffered_frames frames, then the client skips ahead instead of queueing stale frames
+        limit = max(self.buffered_frames * frame_size, 16 * 1024)
+        writer.transport.set_write_buffer_limits(high=limit)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, limit)
+
+    async def stream(self, writer, peer):
+        writer.write((f"HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary={BOUNDARY}\r\n"
+                      "Cache-Control: no-cache\r\nConnection: close\r\n\r\n").encode())
+        stats = self.hub.add_client(peer)
+        last, sized_for = -1, 0
+        try:
+            while True:
+                seq, jpeg = await self.hub.wait_next(last)
+                if last >= 0:
+                    stats["skipped"] += seq - last - 1
+                last = seq
+                if not sized_for / 2 <= len(jpeg) <= sized_for * 2:  # resize buffers when frame size changes a lot
+                    self.limit_buffers(writer, len(jpeg))
+                    sized_for = len(jpeg)
+                writer.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode())
+                writer.write(jpeg)
+                writer.write(b"\r\n")
+                await writer.drain()  # only this client waits for its socket
+                stats["sent"] += 1
+        finally:
+            self.hub.remove_client(stats)
+
+    async def snapshot(self, writer, peer):
+        stats = self.hub.add_client(peer)
+        try:
+            # The cached frame may be old if nobody was watching, so wait for a fresh one
+            _, jpeg = await asyncio.wait_for(self.hub.wait_next(self.hub.seq), 5.0)
+        finally:
+            self.hub.remove_client(stats)
+        writer.write(http_response("200 OK", "image/jpeg", jpeg))
+
+    def stats(self):
+        return {
+            "encoded": self.encoder.encoded,
+            "encode_fps": round(self.encoder.fps.rate, 1),
+            "encode_skipped": self.encoder.skipped,
+            "clients": list(self.hub.clients.values()),
+        }
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10.0)
+            method, path = request.split(b" ", 2)[:2]
+            path = path.decode().split("?")[0]
+            if method != b"GET":
+                writer.write(http_response("405 Method Not Allowed", "text/plain", b"GET only"))
+            elif path == "/stream.mjpg":
+                await self.stream(writer, peer)
+            elif path == "/snapshot.jpg":
+                await self.snapshot(writer, peer)
+            elif path == "/stats":
+                writer.write(http_response("200 OK", "application/json", json.dumps(self.stats()).encode()))
+            elif path in ("/", "/index.html"):
+                writer.write(http_response("200 OK", "text/html", INDEX_HTML))
+            else:
+                writer.write(http_response("404 Not Found", "text/plain", b"Not found"))
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(source="0", host="0.0.0.0", port=8080, width=640, height=480, fps=30.0, size=None, quality=75,
+                max_fps=15.0, loop=False, duration=None):
+    grabber = Grabber(open_source(source, width, height, fps, loop=loop))
+    hub = FrameHub()
+    encoder = Encoder(grabber.ring, hub, asyncio.get_running_loop(), size, quality, max_fps)
+    server = MJPEGServer(hub, encoder)
+    grabber.start()
+    encoder.start()
+    tcp_server = await asyncio.start_server(server.handle, host, port)
+    print(f"MJPEG stream on http://{host}:{port}/stream.mjpg")
+    try:
+        async with tcp_server:
+            start = time.monotonic()
+            while grabber.running and (duration is None or time.monotonic() - start < duration):
+                await asyncio.sleep(0.5)
+    finally:
+        encoder.stop()
+        grabber.stop()
+    return server.stats()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MJPEG HTTP server for the camera")
+    parser.add_argument("-s", "--source", default="0", help='Camera index, video file or "synthetic"')
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("-p", "--port", type=int, default=8080)
+    parser.add_argument("--capture-width", type=int, default=640)
+    parser.add_argument("--capture-height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate of the synthetic source")
+    parser.add_argument("--width", type=int, default=None, help="Stream width (default: capture size)")
+    parser.add_argument("--height", type=int, default=None, help="Stream height (default: capture size)")
+    parser.add_argument("-q", "--quality", type=int, default=75, help="JPEG quality (0-100)")
+    parser.add_argument("--max-fps", type=float, default=15.0, help="Maximum encoded frames per second")
+    parser.add_argument("--loop", action="store_true", help="Loop video files")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    args = parser.parse_args()
+
+    size = (args.width, args.height) if args.width and args.height else None
+    try:
+        asyncio.run(serve(args.source, args.host, args.port, args.capture_width, args.capture_height, args.fps,
+                          size, args.quality, args.max_fps, args.loop, args.duration))
+    except KeyboardInterrupt:
+        pass
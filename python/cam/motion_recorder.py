@@ -0,0 +1,200 @@
+import argparse
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from capture import Grabber, open_source
+from video_stream import MotionDetector
+
+# Motion-triggered recording for the camera pipeline.
+#
+# The grabber's frame ring is sized to hold the pre-roll, so nothing is encoded while
+# nothing happens: only every `detect_every`-th frame is copied out of the ring and
+# goes through the motion detector. When motion starts, the pre-roll frames still in
+# the ring are written first, then every new frame until there has been no motion
+# for `post_roll` seconds. Each event ends up in its own video file.
+#
+# Frames are copied out of their ring slot before use and dropped if the grabber
+# refilled the slot meanwhile (see video_stream.Processor), so a recorder that falls
+# behind, e.g. while writing the pre-roll, loses frames instead of recording torn ones.
+#
+#   python motion_recorder.py                          # camera 0 -> recordings/
+#   python motion_recorder.py --source clip.avi --pre-roll 2      # replays the file at its own FPS
+
+class MotionRecorder(threading.Thread):
+    def __init__(self, ring, fps, output_dir="recordings", pre_roll=3.0, post_roll=5.0, max_segment=300.0,
+                 detector=None, detect_every=2, fourcc="mp4v", extension=".mp4"):
+        super().__init__(daemon=True)
+        self.ring = ring
+        self.fps = fps
+        self.output_dir = output_dir
+        self.pre_roll_frames = int(pre_roll * fps)
+        if self.pre_roll_frames > ring.slots - 2:
+            raise ValueError(f"Frame ring too small for {pre_roll}s pre-roll ({ring.slots} slots)")
+        self.post_roll = post_roll
+        self.max_segment = max_segment
+        self.detector = detector or MotionDetector()
+        self.detect_every = detect_every
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.extension = extension
+        self.writer = None
+        self.segment = None
+        self.events = []
+        self.frames_seen = 0
+        self.frames_written = 0
+        self.frames_lost = 0
+        self.buffers = [None, None]  # current frame, pre-roll frame
+        self.stop_event = threading.Event()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _open(self, timestamp, frame):
+        path = os.path.join(self.output_dir, datetime.now().strftime("motion_%Y%m%d_%H%M%S") + self.extension)
+        height, width = frame.shape[:2]
+        self.writer = cv2.VideoWriter(path, self.fourcc, self.fps, (width, height))
+        self.segment = {"path": path, "start": timestamp, "last_motion": timestamp, "frames": 0}
+        print(f"Motion detected, recording to {path}")
+
+    def _write(self, frame):
+        self.writer.write(frame)
+        self.segment["frames"] += 1
+        self.frames_written += 1
+
+    def _close(self):
+        self.writer.release()
+        self.writer = None
+        segment = self.segment
+        segment["bytes"] = os.path.getsize(segment["path"]) if os.path.exists(segment["path"]) else 0
+        segment["seconds"] = segment["frames"] / self.fps
+        self.events.append(segment)
+        print(f"Recording stopped: {segment['path']} ({segment['seconds']:.1f}s, {segment['bytes'] / 1024:.0f} kB)")
+
+    def _private(self, seq, frame, index=0):
+        """Copy of a ring frame in a reused buffer, or None if its slot was refilled while copying."""
+        buffer = self.buffers[index]
+        if buffer is None or buffer.shape != frame.shape:
+            buffer = self.buffers[index] = np.empty_like(frame)
+        np.copyto(buffer, frame)
+        if self.ring.seq - seq >= self.ring.slots - 1:
+            return None
+        return buffer
+
+    def handle(self, seq, timestamp, frame):
+        if self.writer is not None or seq % self.detect_every == 0:
+            frame = self._private(seq, frame)
+            if frame is None:
+                self.frames_lost += 1
+                return
+        self.frames_seen += 1
+        meta = {"motion": False}
+        if seq % self.detect_every == 0:
+            self.detector(frame, meta)
+        motion = meta["motion"]
+
+        if self.writer is None:
+            if motion:
+                self._open(timestamp, frame)
+                for old in range(max(0, seq - self.pre_roll_frames), seq):
+                    entry = self.ring.get(old)
+                    old_frame = None if entry is None else self._private(old, entry[1], index=1)
+                    if old_frame is not None:
+                        self._write(old_frame)
+                self._write(frame)
+            return
+
+        self._write(frame)
+        if motion:
+            self.segment["last_motion"] = timestamp
+        if (timestamp - self.segment["last_motion"] > self.post_roll
+                or timestamp - self.segment["start"] > self.max_segment):
+            self._close()
+
+    def run(self):
+        last = -1
+        while not self.stop_event.is_set():
+            seq, _, _ = self.ring.wait_next(last, timeout=0.5)
+            if seq < 0:
+                continue
+            # Handle every frame since the last one, as long as the ring still holds it
+            for current in range(last + 1, seq + 1):
+                entry = self.ring.get(current)
+                if entry is None:
+                    self.frames_lost += 1
+                    continue
+                self.handle(current, *entry)
+            last = seq
+        if self.writer is not None:
+            self._close()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=5.0)
+
+def summarize(recorder, elapsed):
+    recorded_bytes = sum(event["bytes"] for event in recorder.events)
+    share = recorder.frames_written / recorder.frames_seen if recorder.frames_seen else 0.0
+    text = (f"{len(recorder.events)} events, {recorder.frames_written} of {recorder.frames_seen} frames recorded "
+            f"({share * 100:.1f}%), {recorded_bytes / 1024 / 1024:.1f} MB, {elapsed:.0f}s")
+    if recorder.frames_written:
+        # Same codec and bitrate for every frame gives the size of always-on recording
+        continuous = recorded_bytes / recorder.frames_written * recorder.frames_seen
+        text += f"\nalways-on recording would be about {continuous / 1024 / 1024:.1f} MB"
+    if recorder.frames_lost:
+        text += f"\n{recorder.frames_lost} frames lost (encoder too slow, increase --ring-seconds)"
+    return text
+
+def record_motion(source="0", width=640, height=480, fps=30.0, output_dir="recordings", pre_roll=3.0,
+                  post_roll=5.0, min_fraction=0.005, detect_every=2, duration=None, realtime=True,
+                  ring_seconds=1.0, fourcc="mp4v", extension=".mp4"):
+    cap = open_source(source, width, height, fps, realtime)
+    fps = cap.get(cv2.CAP_PROP_FPS) or fps
+    # The ring holds the pre-roll plus some slack for the encoder falling behind
+    grabber = Grabber(cap, slots=math.ceil((pre_roll + ring_seconds) * fps) + 2)
+    recorder = MotionRecorder(grabber.ring, fps, output_dir, pre_roll, post_roll,
+                              detector=MotionDetector(min_fraction=min_fraction), detect_every=detect_every,
+                              fourcc=fourcc, extension=extension)
+    grabber.start()
+    recorder.start()
+
+    start = time.monotonic()
+    try:
+        while grabber.running and (duration is None or time.monotonic() - start < duration):
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        grabber.stop()
+        # Let the recorder catch up with the frames still in the ring before stopping it
+        while recorder.is_alive() and recorder.frames_seen + recorder.frames_lost < grabber.ring.seq + 1:
+            time.sleep(0.05)
+        recorder.stop()
+    print(summarize(recorder, time.monotonic() - start))
+    return recorder.events
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Motion-triggered recording with pre-roll")
+    parser.add_argument("-s", "--source", default="0", help='Camera index, video file or "synthetic"')
+    parser.add_argument("-o", "--output", default="recordings", help="Directory for the event videos")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--pre-roll", type=float, default=3.0, help="Seconds recorded before motion starts")
+    parser.add_argument("--post-roll", type=float, default=5.0, help="Seconds recorded after motion ends")
+    parser.add_argument("--min-fraction", type=float, default=0.005, help="Changed pixel fraction that counts as motion")
+    parser.add_argument("--detect-every", type=int, default=2, help="Run motion detection on every n-th frame")
+    parser.add_argument("--ring-seconds", type=float, default=1.0, help="Extra frame buffer for encoder lag")
+    parser.add_argument("--fourcc", default="mp4v", help="Codec, e.g. mp4v (.mp4) or MJPG (.avi)")
+    parser.add_argument("--extension", default=".mp4")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--no-realtime", dest="realtime", action="store_false",
+                        help="Read files/synthetic frames as fast as possible (frames the encoder can't keep up with are lost)")
+    args = parser.parse_args()
+
+    record_motion(args.source, args.width, args.height, args.fps, args.output, args.pre_roll, args.post_roll,
+                  args.min_fraction, args.detect_every, args.duration, args.realtime, args.ring_seconds,
+                  args.fourcc, args.extension)
@@ -1,33 +1,221 @@
+import argparse
+import threading
+import time
+
 import cv2
+import numpy as np
+
+from capture import Grabber, LatencyStats, RateCounter, open_source
+
+# Threaded camera pipeline:
+#   Grabber thread -> FrameRing -> Processor thread(s) running pluggable stages -> display
+# Every stage of the chain works on the freshest frame only; if a stage (or the
+# display) is slower than the camera, frames are skipped rather than queued, so the
+# latency stays at about one frame plus the processing time.
+#
+#   python video_stream.py                                   # camera 0 in a window
+#   python video_stream.py --stages resize:320x240,motion    # with processing stages
+#   python video_stream.py --source synthetic --headless --no-realtime --duration 10   # benchmark
+
+class Resize:
+    def __init__(self, width, height):
+        self.size = (width, height)
+
+    def __call__(self, frame, meta):
+        return cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+
+class Grayscale:
+    def __call__(self, frame, meta):
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+class MotionDetector:
+    """Frame differencing against a running-average background on a small gray copy.
+
+    Sets meta["motion"] and meta["motion_score"] (fraction of changed pixels) and
+    passes the frame through unchanged.
+    """
+
+    def __init__(self, width=160, threshold=25, min_fraction=0.005, alpha=0.1):
+        self.width = width
+        self.threshold = threshold
+        self.min_fraction = min_fraction
+        self.alpha = alpha
+        self.background = None
+
+    def score(self, frame):
+        height = max(1, frame.shape[0] * self.width // frame.shape[1])
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        if self.background is None:
+            self.background = small.astype(np.float32)
+            return 0.0
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(small, self.background, self.alpha)
+        return np.count_nonzero(diff > self.threshold) / diff.size
 
-def capture_video():
-    # Open the default camera (usually device 0)
-    cap = cv2.VideoCapture(0)
+    def __call__(self, frame, meta):
+        meta["motion_score"] = self.score(frame)
+        meta["motion"] = meta["motion_score"] >= self.min_fraction
+        return frame
 
-    if not cap.isOpened():
-        raise Exception("Could not open the USB camera.")
+def parse_stages(spec):
+    """"resize:320x240,gray,motion" -> list of stage objects."""
+    stages = []
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, _, arg = item.partition(":")
+        if name == "resize":
+            width, height = (int(v) for v in arg.lower().split("x"))
+            stages.append(Resize(width, height))
+        elif name == "gray":
+            stages.append(Grayscale())
+        elif name == "motion":
+            stages.append(MotionDetector(**({"min_fraction": float(arg)} if arg else {})))
+        else:
+            raise ValueError(f"Unknown stage: {name} (use resize:WxH, gray, motion[:fraction])")
+    return stages
 
-    # Optionally set the resolution
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+class Processor(threading.Thread):
+    """Runs a chain of stages on the newest frame of a FrameRing.
 
+    Several processors can share one grabber (e.g. a display chain and a motion
+    chain); each one skips the frames it is too slow for.
+    """
+
+    def __init__(self, ring, stages=()):
+        super().__init__(daemon=True)
+        self.ring = ring
+        self.stages = list(stages)
+        self.fps = RateCounter()
+        self.latency = LatencyStats()
+        self.processed = 0
+        self.skipped = 0
+        self.output = (-1, 0.0, None, {})
+        self.buffer = None
+        self.cond = threading.Condition()
+        self.stop_event = threading.Event()
+
+    def run(self):
+        last = -1
+        while not self.stop_event.is_set():
+            seq, timestamp, frame = self.ring.wait_next(last, timeout=0.5)
+            if frame is None:
+                continue
+            if last >= 0:
+                self.skipped += seq - last - 1
+            last = seq
+            # Stages run on a private copy: the grabber refills this ring slot slots - 1 frames later,
+            # which a slow stage chain would otherwise see as a torn frame
+            if self.buffer is None or self.buffer.shape != frame.shape:
+                self.buffer = np.empty_like(frame)
+            np.copyto(self.buffer, frame)
+            if self.ring.seq - seq >= self.ring.slots - 1:
+                self.skipped += 1  # slot was being overwritten while copying
+                continue
+            meta = {"seq": seq, "timestamp": timestamp}
+            result = self.buffer
+            for stage in self.stages:
+                result = stage(result, meta)
+            if result is self.buffer:
+                result = self.buffer.copy()  # the buffer is reused for the next frame
+            now = time.monotonic()
+            self.latency.add(now - timestamp)
+            self.fps.tick(now)
+            self.processed += 1
+            with self.cond:
+                self.output = (seq, timestamp, result, meta)
+                self.cond.notify_all()
+
+    def wait_next(self, after_seq, timeout=1.0):
+        """Newest result (seq, timestamp, frame, meta) with seq > after_seq."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.output[0] > after_seq, timeout)
+            return self.output
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=2.0)
+
+def stats_line(grabber, processor):
+    line = (f"capture {grabber.fps.rate:5.1f} fps | processed {processor.fps.rate:5.1f} fps, "
+            f"skipped {processor.skipped} | latency {processor.latency.last * 1000:5.1f} ms "
+            f"(mean {processor.latency.mean * 1000:.1f}, max {processor.latency.max * 1000:.1f})")
+    meta = processor.output[3]
+    if "motion" in meta:
+        line += f" | motion {'YES' if meta['motion'] else 'no '} {meta['motion_score']:.3f}"
+    return line
+
+def capture_video(source="0", width=640, height=480, fps=30.0, stages=(), headless=False, duration=None,
+                  ring_slots=4, realtime=True, loop=False):
+    grabber = Grabber(open_source(source, width, height, fps, realtime, loop), ring_slots)
+    processor = Processor(grabber.ring, stages)
+    grabber.start()
+    processor.start()
+
+    start = last_report = time.monotonic()
+    last_seq = -1
+    shown = 0
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Failed to grab frame.")
-                break
-
-            # Display the frame in a window named "Video Stream"
-            cv2.imshow("Video Stream", frame)
-
-            # Exit if 'q' is pressed
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+        while grabber.running and (duration is None or time.monotonic() - start < duration):
+            if headless:
+                time.sleep(0.1)
+            else:
+                seq, timestamp, frame, meta = processor.wait_next(last_seq, timeout=0.5)
+                if seq > last_seq:
+                    last_seq = seq
+                    shown += 1
+                    # Display the frame in a window named "Video Stream"
+                    cv2.imshow("Video Stream", frame)
+
+                # Exit if 'q' is pressed
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            if time.monotonic() - last_report >= 1.0:
+                last_report = time.monotonic()
+                print(stats_line(grabber, processor))
+        if grabber.failed:
+            print("Failed to grab frame.")
+    except KeyboardInterrupt:
+        pass
     finally:
         # Release the camera and destroy all windows
-        cap.release()
-        cv2.destroyAllWindows()
+        processor.stop()
+        grabber.stop()
+        if not headless:
+            cv2.destroyAllWindows()
+
+    elapsed = time.monotonic() - start
+    summary = {
+        "captured": grabber.ring.seq + 1,
+        "processed": processor.processed,
+        "skipped": processor.skipped,
+        "displayed": shown,
+        "capture_fps": (grabber.ring.seq + 1) / elapsed,
+        "process_fps": processor.processed / elapsed,
+        "latency_mean_ms": processor.latency.mean * 1000,
+        "latency_max_ms": processor.latency.max * 1000,
+    }
+    print(" | ".join(f"{k} {v:.1f}" if isinstance(v, float) else f"{k} {v}" for k, v in summary.items()))
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Threaded camera capture pipeline")
+    parser.add_argument("-s", "--source", default="0", help='Camera index, video file or "synthetic"')
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate of the synthetic source")
+    parser.add_argument("--stages", default="", help="Processing chain, e.g. resize:320x240,gray,motion")
+    parser.add_argument("--ring", type=int, default=4, help="Preallocated frame buffers")
+    parser.add_argument("--headless", action="store_true", help="No window, print statistics only")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--no-realtime", dest="realtime", action="store_false",
+                        help="Read files/synthetic frames as fast as possible (benchmarking)")
+    parser.add_argument("--loop", action="store_true", help="Loop video files")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    capture_video()
+    args = parse_args()
+    capture_video(args.source, args.width, args.height, args.fps, parse_stages(args.stages), args.headless,
+                  args.duration, args.ring, args.realtime, args.loop)
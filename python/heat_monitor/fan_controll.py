@@ -1,18 +1,242 @@
-import RPi.GPIO as GPIO
+#!/usr/bin/env python3
+# Closed-loop fan controller for the fan on GPIO 4.
+#
+# Modes:
+#   hysteresis  fan on above --on-temp, off below --off-temp, with a minimum dwell time
+#   duty        software PWM: duty cycle ramps from --off-temp (0 %) to --max-temp (100 %)
+# --predictive additionally uses the short-horizon forecast written by the LSTM
+# scripts (data/processed/forecast.csv) or a linear trend to start the fan early.
+# --simulate runs against a simulated GPIO pin and thermal model, so it works off-Pi.
+
+import argparse
+import csv
+import os
+import random
+import signal
 import time
+from collections import deque
+from datetime import datetime, timezone
+
+FAN_PIN = 4
+FORECAST_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "bash_scripts", "heat", "data", "processed", "forecast.csv"
+)
+
+class RPiGPIO:
+    """RPi.GPIO backed output pin."""
+
+    def __init__(self, pin=FAN_PIN, active_high=True):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        self.pin = pin
+        self.on_level = GPIO.HIGH if active_high else GPIO.LOW
+        self.off_level = GPIO.LOW if active_high else GPIO.HIGH
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(pin, GPIO.OUT)
+        self.state = False
+        self.set(False)
+
+    def set(self, on):
+        self.GPIO.output(self.pin, self.on_level if on else self.off_level)
+        self.state = on
+
+    def cleanup(self):
+        # Fail-safe: leave the pin driven with the fan ON. GPIO.cleanup() would turn it
+        # into a floating input, and nothing would cool the SoC after the controller exits.
+        self.set(True)
+
+class SimulatedGPIO:
+    """Records pin changes instead of driving hardware."""
+
+    def __init__(self, pin=FAN_PIN):
+        self.pin = pin
+        self.state = False
+        self.switches = 0
+        self.on_seconds = 0.0
+        self._since = time.monotonic()
+
+    def set(self, on):
+        now = time.monotonic()
+        if self.state:
+            self.on_seconds += now - self._since
+        self._since = now
+        if on != self.state:
+            self.switches += 1
+        self.state = on
+
+    def cleanup(self):
+        self.set(True)  # same fail-safe as RPiGPIO
+
+class SimulatedThermal:
+    """First-order thermal model: temperature follows load heat minus fan cooling."""
+
+    def __init__(self, gpio, ambient=40.0, load_heat=45.0, fan_cooling=25.0, tau=60.0, speedup=1.0):
+        self.gpio = gpio
+        self.ambient, self.load_heat, self.fan_cooling, self.tau = ambient, load_heat, fan_cooling, tau
+        self.speedup = speedup
+        self.current = ambient
+        self.load = 0.5
+        self._last = time.monotonic()
+
+    def temp(self):
+        now = time.monotonic()
+        dt = (now - self._last) * self.speedup
+        self._last = now
+        self.load = min(max(self.load + random.uniform(-0.05, 0.05), 0.0), 1.0)
+        target = self.ambient + self.load * self.load_heat - (self.fan_cooling if self.gpio.state else 0.0)
+        self.current += (target - self.current) * min(dt / self.tau, 1.0) + random.gauss(0, 0.1)
+        return self.current
+
+    def close(self):
+        pass
+
+class Forecast:
+    """Predicted temperature `lead_time` seconds ahead.
+
+    Uses the forecast CSV written by the LSTM scripts (timestamp,temp) when it
+    covers the requested time, otherwise a least-squares trend over the samples of
+    the last `trend_seconds` (only once they span at least half of that).
+    """
+
+    def __init__(self, path=FORECAST_FILE, lead_time=60.0, trend_seconds=None):
+        self.path = path
+        self.lead_time = lead_time
+        self.trend_seconds = trend_seconds or lead_time
+        self.recent = deque()
+        self._mtime = None
+        self._rows = []
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._rows = []
+            return
+        if mtime != self._mtime:
+            with open(self.path, newline="") as f:
+                self._rows = [(datetime.fromisoformat(row["timestamp"]).timestamp(), float(row["temp"]))
+                              for row in csv.DictReader(f)]
+            self._mtime = mtime
+
+    def observe(self, now, temp):
+        self.recent.append((now, temp))
+        while now - self.recent[0][0] > self.trend_seconds:
+            self.recent.popleft()
+
+    def predict(self, wall_time):
+        self._load()
+        target = wall_time + self.lead_time
+        ahead = [temp for ts, temp in self._rows if wall_time <= ts <= target]
+        if ahead:
+            return max(ahead)
+        if len(self.recent) < 2 or self.recent[-1][0] - self.recent[0][0] < self.trend_seconds / 2:
+            return None
+        t0 = self.recent[0][0]
+        xs = [t - t0 for t, _ in self.recent]
+        ys = [temp for _, temp in self.recent]
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        var = sum((x - mean_x) ** 2 for x in xs)
+        if var == 0:
+            return None
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+        return ys[-1] + slope * self.lead_time
+
+class FanController:
+    def __init__(self, gpio, on_temp=65.0, off_temp=55.0, max_temp=75.0, min_dwell=30.0,
+                 pwm_period=20.0, mode="hysteresis", forecast=None):
+        if off_temp >= on_temp:
+            raise ValueError("off_temp must be below on_temp")
+        self.gpio = gpio
+        self.on_temp, self.off_temp, self.max_temp = on_temp, off_temp, max_temp
+        self.min_dwell = min_dwell
+        self.pwm_period = pwm_period
+        self.mode = mode
+        self.forecast = forecast
+        self._last_switch = -float("inf")
+
+    def control_temp(self, temp, now):
+        """Measured temperature, or the forecast if that is higher (predictive mode)."""
+        if self.forecast is None:
+            return temp
+        self.forecast.observe(now, temp)
+        predicted = self.forecast.predict(time.time())
+        return temp if predicted is None else max(temp, predicted)
+
+    def desired_state(self, temp, now):
+        if self.mode == "duty":
+            duty = min(max((temp - self.off_temp) / (self.max_temp - self.off_temp), 0.0), 1.0)
+            return (now % self.pwm_period) < duty * self.pwm_period
+        if self.gpio.state:
+            return temp > self.off_temp
+        return temp >= self.on_temp
+
+    def step(self, temp, now=None):
+        now = time.monotonic() if now is None else now
+        want = self.desired_state(self.control_temp(temp, now), now)
+        # Dwell time only applies to hysteresis mode; duty mode switches on its own period
+        if want != self.gpio.state and (self.mode == "duty" or now - self._last_switch >= self.min_dwell):
+            self.gpio.set(want)
+            self._last_switch = now
+        return self.gpio.state
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop fan controller")
+    parser.add_argument("--mode", choices=["hysteresis", "duty"], default="hysteresis")
+    parser.add_argument("--on-temp", type=float, default=65.0, help="Fan on at/above this temperature (°C)")
+    parser.add_argument("--off-temp", type=float, default=55.0, help="Fan off below this temperature (°C)")
+    parser.add_argument("--max-temp", type=float, default=75.0, help="Temperature for 100%% duty in duty mode")
+    parser.add_argument("--min-dwell", type=float, default=30.0, help="Minimum seconds between switches")
+    parser.add_argument("--pwm-period", type=float, default=20.0, help="Duty cycle period in seconds")
+    parser.add_argument("--interval", type=float, default=0.5, help="Temperature read interval in seconds")
+    parser.add_argument("--predictive", action="store_true", help="Start the fan early based on the forecast")
+    parser.add_argument("--forecast-file", default=FORECAST_FILE)
+    parser.add_argument("--lead-time", type=float, default=60.0, help="Forecast horizon in seconds")
+    parser.add_argument("--pin", type=int, default=FAN_PIN)
+    parser.add_argument("--active-low", action="store_true", help="Fan runs while the pin is LOW")
+    parser.add_argument("--simulate", action="store_true", help="Simulated GPIO and thermal model")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    args = parser.parse_args()
+
+    if args.simulate:
+        gpio = SimulatedGPIO(args.pin)
+        sensor = SimulatedThermal(gpio, speedup=10.0)
+    else:
+        from sensors import SysfsSensors
+        gpio = RPiGPIO(args.pin, active_high=not args.active_low)
+        sensor = SysfsSensors()
 
-FAN_PIN = 4 
+    forecast = Forecast(args.forecast_file, args.lead_time) if args.predictive else None
+    controller = FanController(gpio, args.on_temp, args.off_temp, args.max_temp, args.min_dwell,
+                               args.pwm_period, args.mode, forecast)
 
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(FAN_PIN, GPIO.OUT)
+    # systemd/kill send SIGTERM; end the loop like Ctrl-C so the finally block still runs
+    stop = False
 
-print("FAN LOW")
-GPIO.output(FAN_PIN, GPIO.LOW)
+    def handle_stop(signum, frame):
+        nonlocal stop
+        stop = True
 
-print("Sleep")
-time.sleep(5)
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
 
-print("HIGH again")
-GPIO.output(FAN_PIN, GPIO.HIGH)
+    start = next_tick = time.monotonic()
+    state = None
+    try:
+        while not stop and (args.duration is None or time.monotonic() - start < args.duration):
+            temp = sensor.temp()
+            if controller.step(temp) != state:
+                state = gpio.state
+                print(f"{datetime.now(timezone.utc).isoformat(timespec='seconds')} {temp:.1f}°C FAN {'ON' if state else 'OFF'}")
+            next_tick += args.interval
+            time.sleep(max(next_tick - time.monotonic(), 0))
+    finally:
+        if isinstance(gpio, SimulatedGPIO):
+            gpio.set(gpio.state)
+            elapsed = time.monotonic() - start
+            print(f"Switches: {gpio.switches}, fan duty: {gpio.on_seconds / elapsed * 100:.1f}%")
+        gpio.cleanup()
+        print("Exiting with the fan ON")
+        sensor.close()
 
-GPIO.cleanup()
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 #!/home/pi/Desktop/nico-hoff/python/venv/bin python3
 
+import argparse
+import threading
 import time
+
+import numpy as np
 import psutil
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 
+from sensors import SysfsSensors
+
 def get_cpu_temp():
     try:
         with open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
@@ -12,41 +18,135 @@ def get_cpu_temp():
     except Exception:
         return psutil.sensors_temperatures().get("coretemp", [{}])[0].get("current", 0)
 
-times = []
-temps = []
-start_time = time.time()
+class RingBuffer:
+    """Fixed-size numpy ring buffer with a copy-free, time-ordered view.
+
+    Every value is written twice (slot i and i + size), so the last `size`
+    samples are always the contiguous slice data[head:head + size].
+    """
+
+    def __init__(self, size, columns=1):
+        self.size = size
+        self.data = np.full((2 * size, columns), np.nan)
+        self.head = 0
+
+    def append(self, row):
+        self.data[self.head] = row
+        self.data[self.head + self.size] = row
+        self.head = (self.head + 1) % self.size
+
+    def view(self):
+        return self.data[self.head:self.head + self.size]
+
+class Sampler(threading.Thread):
+    """Samples the sensors on its own fixed-rate schedule, independent of redraws."""
+
+    def __init__(self, sensors, history, interval):
+        super().__init__(daemon=True)
+        self.sensors = sensors
+        self.interval = interval
+        self.n_cores = max(len(sensors.core_mhz()), 1)
+        self.lock = threading.Lock()
+        self.temp = RingBuffer(history)
+        self.mhz = RingBuffer(history, self.n_cores)
+        self.load = RingBuffer(history)
+        self.fan = RingBuffer(history)
+        self.stopped = threading.Event()
+        sensors.load()  # prime psutil's cpu_percent delta
+
+    def run(self):
+        next_tick = time.monotonic()
+        while not self.stopped.is_set():
+            temp = self.sensors.temp()
+            mhz = self.sensors.core_mhz()[:self.n_cores]
+            load = self.sensors.load()
+            fan = self.sensors.fan_state()
+            with self.lock:
+                self.temp.append(temp)
+                self.mhz.append(mhz)
+                self.load.append(load)
+                self.fan.append(np.nan if fan is None else fan)
+
+            next_tick += self.interval
+            self.stopped.wait(max(next_tick - time.monotonic(), 0))
+
+    def snapshot(self):
+        with self.lock:
+            return (self.temp.view()[:, 0].copy(), self.mhz.view().copy(),
+                    self.load.view()[:, 0].copy(), self.fan.view()[:, 0].copy())
+
+def build_figure(sampler, history, interval):
+    # Fixed x axis in "seconds ago", so the axes never need rescaling and blitting works
+    x = (np.arange(history) - (history - 1)) * interval
+    fig, (ax_temp, ax_mhz, ax_load, ax_fan) = plt.subplots(
+        4, 1, figsize=(10, 9), sharex=True, gridspec_kw={"height_ratios": [3, 2, 1, 1]}
+    )
+    fig.suptitle("Raspberry Pi Temperature Monitor")
+
+    temp_line, = ax_temp.plot(x, np.full(history, np.nan), "-r", lw=2)
+    ax_temp.set_ylabel("Temperature (°C)")
+    ax_temp.set_ylim(30, 90)
+
+    mhz_lines = [ax_mhz.plot(x, np.full(history, np.nan), lw=1, label=f"cpu{i}")[0]
+                 for i in range(sampler.n_cores)]
+    ax_mhz.set_ylabel("MHz")
+    ax_mhz.set_ylim(0, 2500)
+    ax_mhz.legend(loc="upper left", ncol=min(sampler.n_cores, 8), fontsize="small")
+
+    load_line, = ax_load.plot(x, np.full(history, np.nan), "-b", lw=1)
+    ax_load.set_ylabel("Load (%)")
+    ax_load.set_ylim(0, 100)
+
+    fan_line, = ax_fan.step(x, np.full(history, np.nan), "-g", lw=1, where="post")
+    ax_fan.set_ylabel("Fan")
+    ax_fan.set_ylim(-0.1, sampler.sensors.fan_max_state + 0.1)
+    ax_fan.set_xlabel("Time (seconds ago)")
+    ax_fan.set_xlim(x[0], x[-1])
+
+    for ax in (ax_temp, ax_mhz, ax_load, ax_fan):
+        ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+
+    artists = [temp_line, *mhz_lines, load_line, fan_line]
 
-fig, ax = plt.subplots()
-ax.set_title("Raspberry Pi Temperature Monitor")
-ax.set_xlabel("Time (seconds)")
-ax.set_ylabel("Temperature (°C)")
-ax.set_ylim(30, 90)
-line, = ax.plot([], [], "-r", lw=2)
+    def update(frame):
+        temps, mhz, load, fan = sampler.snapshot()
+        temp_line.set_ydata(temps)
+        for i, line in enumerate(mhz_lines):
+            line.set_ydata(mhz[:, i])
+        load_line.set_ydata(load)
+        fan_line.set_ydata(fan)
+        return artists
 
-def update(frame):
-    current_time = round(time.time() - start_time, 1)
-    current_temp = get_cpu_temp()
+    return fig, update, artists
 
-    times.append(current_time)
-    temps.append(current_temp)
+def main():
+    parser = argparse.ArgumentParser(description="Live temperature / frequency / load / fan monitor")
+    parser.add_argument("-n", "--history", type=int, default=3000, help="Number of samples shown")
+    parser.add_argument("-i", "--interval", type=float, default=0.5, help="Sampling interval in seconds")
+    parser.add_argument("-r", "--refresh", type=float, default=1.0, help="Redraw interval in seconds")
+    args = parser.parse_args()
 
-    # Keep only the last 50 values
-    times[:] = times[-50:]
-    temps[:] = temps[-50:]
+    with SysfsSensors() as sensors:
+        sampler = Sampler(sensors, args.history, args.interval)
+        sampler.start()
 
-    line.set_data(times, temps)
-    ax.set_xlim(max(0, times[0]), times[-1])
-    return line,
+        fig, update, artists = build_figure(sampler, args.history, args.interval)
+        ani = animation.FuncAnimation(
+            fig,
+            update,
+            init_func=lambda: artists,
+            interval=args.refresh * 1000,
+            blit=True,
+            cache_frame_data=False
+        )
 
-ani = animation.FuncAnimation(
-    fig,
-    update,
-    interval=1000,
-    save_count=50,
-    cache_frame_data=False
-)
+        # Attach the animation to the figure so it isn't garbage collected.
+        fig.anim = ani
 
-# Attach the animation to the figure so it isn't garbage collected.
-fig.anim = ani
+        plt.show()
+        sampler.stopped.set()
+        sampler.join()
 
-plt.show()
+if __name__ == "__main__":
+    main()
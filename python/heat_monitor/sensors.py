@@ -0,0 +1,82 @@
+import glob
+import os
+import re
+
+import psutil
+
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+CPUFREQ_GLOB = "/sys/devices/system/cpu/cpu[0-9]*/cpufreq/scaling_cur_freq"
+# gpio-fan / pwm-fan overlays register as a thermal cooling device
+FAN_STATE = "/sys/class/thermal/cooling_device0/cur_state"
+
+class SysfsSensors:
+    """Keeps the sysfs sensor files open and re-reads them with os.pread.
+
+    Opening, reading and closing a sysfs file (or forking `sensors`/`lscpu`)
+    on every sample is what made the old logger show up in its own numbers;
+    a pread on an already open descriptor is a single syscall.
+    """
+
+    def __init__(self, thermal_zone=THERMAL_ZONE, cpufreq_glob=CPUFREQ_GLOB, fan_state=FAN_STATE):
+        self.temp_fd = self._open(thermal_zone)
+        self.freq_fds = [fd for fd in map(self._open, sorted(glob.glob(cpufreq_glob), key=_cpu_index))
+                         if fd is not None]
+        self.fan_fd = self._open(fan_state)
+        self.fan_max_state = 1
+        if self.fan_fd is not None:
+            with open(os.path.join(os.path.dirname(fan_state), "max_state")) as f:
+                self.fan_max_state = max(int(f.read()), 1)
+
+    @staticmethod
+    def _open(path):
+        try:
+            return os.open(path, os.O_RDONLY)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _read_int(fd):
+        return int(os.pread(fd, 32, 0))
+
+    def temp(self):
+        """CPU temperature in °C."""
+        if self.temp_fd is not None:
+            return self._read_int(self.temp_fd) / 1000.0
+        return psutil.sensors_temperatures().get("coretemp", [{}])[0].get("current", 0)
+
+    def core_mhz(self):
+        """Current frequency per core in MHz (scaling_cur_freq is in kHz)."""
+        if self.freq_fds:
+            return [self._read_int(fd) / 1000.0 for fd in self.freq_fds]
+        return [freq.current for freq in psutil.cpu_freq(percpu=True)]
+
+    def avg_mhz(self):
+        freqs = self.core_mhz()
+        return sum(freqs) / len(freqs) if freqs else 0.0
+
+    def load(self):
+        """CPU load in percent since the previous call (non-blocking)."""
+        return psutil.cpu_percent(interval=None)
+
+    def fan_state(self):
+        """Cooling device state (0 = off), or None if no fan is registered."""
+        if self.fan_fd is None:
+            return None
+        return self._read_int(self.fan_fd)
+
+    def close(self):
+        for fd in [self.temp_fd, self.fan_fd, *self.freq_fds]:
+            if fd is not None:
+                os.close(fd)
+        self.temp_fd, self.fan_fd, self.freq_fds = None, None, []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _cpu_index(path):
+    # /sys/devices/system/cpu/cpu12/... -> 12, so cores are ordered numerically
+    match = re.search(r"/cpu(\d+)/", path)
+    return int(match.group(1)) if match else 0
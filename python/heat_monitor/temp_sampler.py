@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Long-running replacement for the sampling loop in bash_scripts/heat/temp_logger.sh.
+# Writes the same timestamp,temp,avg_mhz CSV, but without forking a dozen processes
+# per sample and with batched appends instead of one `echo >>` per row.
+
+import argparse
+import os
+import signal
+import time
+from datetime import datetime
+
+from sensors import SysfsSensors
+
+HEADER = "timestamp,temp,avg_mhz\n"
+DEFAULT_LOGFILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "bash_scripts", "heat", "data", "raw", "temp_log_multi.csv"
+)
+
+def open_log(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    log = open(path, "a", buffering=64 * 1024)
+    if new_file:
+        log.write(HEADER)
+        log.flush()
+    return log
+
+def format_row(sensors, timespec):
+    timestamp = datetime.now().astimezone().isoformat(timespec=timespec)
+    return f"{timestamp},{sensors.temp():.1f},{sensors.avg_mhz():.1f}\n"
+
+def run(logfile, interval=3.0, flush_rows=20, flush_seconds=60.0):
+    # Sub-second sampling needs sub-second timestamps, otherwise rows collide
+    timespec = "seconds" if interval >= 1 else "milliseconds"
+    stop = False
+
+    def handle_stop(signum, frame):
+        nonlocal stop
+        stop = True
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    pending = []
+    last_flush = time.monotonic()
+    with SysfsSensors() as sensors, open_log(logfile) as log:
+        next_tick = time.monotonic()
+        while not stop:
+            pending.append(format_row(sensors, timespec))
+
+            now = time.monotonic()
+            if len(pending) >= flush_rows or now - last_flush >= flush_seconds:
+                log.write("".join(pending))
+                log.flush()
+                pending.clear()
+                last_flush = now
+
+            # Fixed-rate schedule: a slow sample shortens the next sleep instead of drifting
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
+
+        if pending:
+            log.write("".join(pending))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Temperature / CPU frequency sampler")
+    parser.add_argument("-o", "--logfile", default=DEFAULT_LOGFILE, help="CSV file to append to")
+    parser.add_argument("-i", "--interval", type=float, default=3.0, help="Sampling interval in seconds (may be < 1)")
+    parser.add_argument("--flush-rows", type=int, default=20, help="Write after this many buffered rows")
+    parser.add_argument("--flush-seconds", type=float, default=60.0, help="Write at least this often")
+    args = parser.parse_args()
+
+    print(f"Logging to: {args.logfile} every {args.interval}s")
+    run(args.logfile, args.interval, args.flush_rows, args.flush_seconds)
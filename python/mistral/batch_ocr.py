@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# Batch OCR for folders of PDFs on top of structured_ocr.process_pdf.
+#
+#   python batch_ocr.py scans/                 # every *.pdf below scans/
+#   python batch_ocr.py "scans/2024-*.pdf" -w 8 --rate 4
+#
+# Documents run concurrently in a thread pool that shares one Mistral client (and
+# therefore one pooled HTTP connection pool). Every HTTP request takes a token from
+# a shared rate limiter. Finished files are appended to a JSONL manifest, so a
+# re-run after a crash skips everything that is already done.
+
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+
+import httpx
+from tqdm import tqdm
+
+from ocr_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, OCRCache
+from paged_ocr import process_pdf_pages
+from structured_ocr import create_client, process_pdf
+
+MANIFEST_NAME = "ocr_manifest.jsonl"
+
+class RateLimiter:
+    """Token bucket shared by all threads; used as an httpx request hook."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def __call__(self, request: httpx.Request) -> None:
+        self.acquire()
+
+class Manifest:
+    """Append-only JSONL record of finished files, keyed by path, size and mtime."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = {}
+        if path.exists():
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line after a crash
+                    if entry.get("status") == "done":
+                        self.done[entry["path"]] = entry
+
+    @staticmethod
+    def key(file_path: Path) -> dict:
+        stat = file_path.stat()
+        return {"path": str(file_path.resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def is_done(self, file_path: Path) -> bool:
+        key = self.key(file_path)
+        entry = self.done.get(key["path"])
+        return (entry is not None and entry["size"] == key["size"] and entry["mtime_ns"] == key["mtime_ns"]
+                and Path(entry["output"]).exists())
+
+    def record(self, file_path: Path, **fields) -> None:
+        entry = {**self.key(file_path), **fields}
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if fields.get("status") == "done":
+                self.done[entry["path"]] = entry
+
+def collect_pdfs(source: str) -> list:
+    path = Path(source)
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if p.suffix.lower() == ".pdf")
+    return sorted(Path(p) for p in glob.glob(source, recursive=True) if p.lower().endswith(".pdf"))
+
+def input_root(files: list) -> Path:
+    """Deepest directory containing all files; output paths below output_dir mirror the layout under it."""
+    return Path(os.path.commonpath([str(f.resolve().parent) for f in files])) if files else Path.cwd()
+
+def output_for(file_path: Path, output_dir: Path = None, root: Path = None) -> Path:
+    if not output_dir:
+        return file_path.with_suffix(".md")
+    # a/report.pdf and b/report.pdf must not share one report.md
+    relative = file_path.resolve().relative_to(root) if root else Path(file_path.name)
+    return (output_dir / relative).with_suffix(".md")
+
+def run_batch(files: list, client, manifest: Manifest, workers: int = 4, output_dir: Path = None,
+              process=process_pdf, cache: OCRCache = None, extract_images: bool = False) -> dict:
+    """OCR all files not yet in the manifest; returns counts of done/skipped/failed."""
+    pending = [f for f in files if not manifest.is_done(f)]
+    counts = {"done": 0, "skipped": len(files) - len(pending), "failed": 0}
+    root = input_root(files)
+
+    def work(file_path: Path):
+        start = time.monotonic()
+        output_path = output_for(file_path, output_dir, root)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output = process(file_path, client=client, output_path=output_path, cache=cache,
+                         extract_images=extract_images)
+        return output, time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(work, f): f for f in pending}
+        with tqdm(total=len(files), initial=counts["skipped"], desc="OCR", unit="pdf") as progress:
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    output, seconds = future.result()
+                    if output is None:
+                        raise ValueError("no markdown written (size limit or API error, see log)")
+                    manifest.record(file_path, status="done", output=str(output), seconds=round(seconds, 2))
+                    counts["done"] += 1
+                except Exception as e:
+                    manifest.record(file_path, status="failed", error=str(e))
+                    counts["failed"] += 1
+                progress.update(1)
+                progress.set_postfix(failed=counts["failed"])
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent batch OCR with a resumable manifest")
+    parser.add_argument("source", help="Directory (searched recursively) or glob pattern of PDFs")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Documents processed concurrently")
+    parser.add_argument("--rate", type=float, default=2.0, help="Max HTTP requests per second (0 = unlimited)")
+    parser.add_argument("-o", "--output-dir", type=Path, default=None, help="Write .md files here instead of next to the PDFs")
+    parser.add_argument("--manifest", type=Path, default=None, help=f"Manifest path (default: <output-dir or cwd>/{MANIFEST_NAME})")
+    parser.add_argument("--pages-per-request", type=int, default=None, help="OCR page ranges of this size in parallel (see paged_ocr.py)")
+    parser.add_argument("--page-workers", type=int, default=4, help="Concurrent page ranges per document")
+    parser.add_argument("--extract-images", action="store_true", help="Write images as files next to the .md instead of inline base64")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="OCR result cache directory")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3, help="OCR result cache limit in GB")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API")
+    parser.add_argument("--server-url", default=None, help="API base URL, e.g. a local mock_ocr_server.py")
+    args = parser.parse_args()
+
+    files = collect_pdfs(args.source)
+    if not files:
+        print(f"Error: No PDF files found for: {args.source}")
+        sys.exit(1)
+
+    limiter = RateLimiter(args.rate, burst=args.workers)
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=args.workers * 2, max_keepalive_connections=args.workers),
+        timeout=httpx.Timeout(300.0),
+        event_hooks={"request": [limiter]},
+    )
+    client = create_client(server_url=args.server_url, http_client=http_client)
+    cache = False if args.no_cache else OCRCache(args.cache_dir, int(args.cache_size * 1024 ** 3))
+    manifest = Manifest(args.manifest or (args.output_dir or Path.cwd()) / MANIFEST_NAME)
+
+    print(f"Found {len(files)} PDF files, {args.workers} workers, {args.rate} requests/s")
+    process = process_pdf
+    if args.pages_per_request:
+        process = partial(process_pdf_pages, pages_per_request=args.pages_per_request, workers=args.page_workers)
+    counts = run_batch(files, client, manifest, args.workers, args.output_dir, process, cache=cache,
+                       extract_images=args.extract_images)
+    print(f"Done: {counts['done']}, skipped: {counts['skipped']}, failed: {counts['failed']}")
+    http_client.close()
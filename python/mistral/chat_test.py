@@ -1,28 +1,231 @@
 from mistralai import Mistral
 from dotenv import load_dotenv
+import argparse
+import asyncio
+import hashlib
+import json
 import os
+import statistics
+import sys
+import time
+import httpx
+
+# Interactive:  python chat_test.py                  (streams replies, keeps the conversation)
+# Scripted:     python chat_test.py --prompts prompts.jsonl -o results.jsonl -c 8
+#
+# prompts.jsonl holds one prompt per line, either a JSON string or an object with
+# "prompt" (or a full "messages" list) and optional "id" and "model". Prompts run
+# concurrently on one pooled async client; every result records time-to-first-token
+# and total latency. Identical (model, messages) pairs are answered from a local
+# cache and are only sent once per run.
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Retrieve the API key from the environment variable
-api_key = os.getenv("MISTRAL_API_KEY")
+model = "mistral-large-latest"
 
-# Initialize the Mistral client with the API key
-client = Mistral(api_key=api_key)
+CACHE_FILE = "chat_cache.jsonl"
 
-model = "mistral-large-latest"
+def create_client(server_url: str = None, async_client: httpx.AsyncClient = None) -> Mistral:
+    # Retrieve the API key from the environment variable
+    api_key = os.getenv("MISTRAL_API_KEY")
+    if not api_key:
+        print("Error: MISTRAL_API_KEY not found in environment variables")
+        sys.exit(1)
+
+    # Initialize the Mistral client with the API key
+    return Mistral(api_key=api_key, server_url=server_url, async_client=async_client)
+
+class ResponseCache:
+    """Replies keyed by (model, messages), appended to a JSONL file."""
+
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["key"]] = entry["content"]
+
+    @staticmethod
+    def key(model: str, messages: list) -> str:
+        return hashlib.sha256(json.dumps([model, messages], sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> str:
+        return self.entries.get(key)
+
+    def put(self, key: str, content: str) -> None:
+        self.entries[key] = content
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, "content": content}) + "\n")
+
+def stream_reply(client: Mistral, model: str, messages: list, out=sys.stdout) -> dict:
+    """Stream one completion to `out`; returns the reply with its latencies."""
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+    for event in client.chat.stream(model=model, messages=messages):
+        delta = event.data.choices[0].delta.content if event.data.choices else None
+        if delta:
+            ttft = ttft if ttft is not None else time.perf_counter() - start
+            parts.append(delta)
+            out.write(delta)
+            out.flush()
+    out.write("\n")
+    return {"content": "".join(parts), "ttft": ttft, "total": time.perf_counter() - start}
+
+async def stream_reply_async(client: Mistral, model: str, messages: list) -> dict:
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+    async for event in await client.chat.stream_async(model=model, messages=messages):
+        delta = event.data.choices[0].delta.content if event.data.choices else None
+        if delta:
+            ttft = ttft if ttft is not None else time.perf_counter() - start
+            parts.append(delta)
+    return {"content": "".join(parts), "ttft": ttft, "total": time.perf_counter() - start}
+
+class Conversation:
+    """Chat that keeps its message history across turns."""
+
+    def __init__(self, client: Mistral, model: str = model, cache: ResponseCache = None, system: str = None):
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.messages = [{"role": "system", "content": system}] if system else []
+
+    def ask(self, prompt: str, out=sys.stdout) -> dict:
+        # The history only grows once the reply is complete, so a failed request can simply be asked again
+        messages = self.messages + [{"role": "user", "content": prompt}]
+        key = ResponseCache.key(self.model, messages)
+        cached = self.cache.get(key) if self.cache else None
+        if cached is not None:
+            out.write(cached + "\n")
+            result = {"content": cached, "ttft": 0.0, "total": 0.0}
+        else:
+            result = stream_reply(self.client, self.model, messages, out)
+            if self.cache:
+                self.cache.put(key, result["content"])
+        self.messages = messages + [{"role": "assistant", "content": result["content"]}]
+        return result
+
+def load_prompts(path: str) -> list:
+    prompts = []
+    with open(path) as f:
+        for n, line in enumerate(f):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {"prompt": entry}
+            entry.setdefault("id", n)
+            entry.setdefault("messages", [{"role": "user", "content": entry.get("prompt", "")}])
+            prompts.append(entry)
+    return prompts
+
+async def run_prompts(client: Mistral, prompts: list, default_model: str = model, concurrency: int = 4,
+                      cache: ResponseCache = None, on_result=None) -> list:
+    """Answer all prompts with at most `concurrency` requests in flight; results keep the input order."""
+    semaphore = asyncio.Semaphore(concurrency)
+    in_flight = {}  # identical prompts within one run share a single request
+
+    async def fetch(prompt_model, messages):
+        async with semaphore:
+            result = await stream_reply_async(client, prompt_model, messages)
+        if cache:
+            cache.put(ResponseCache.key(prompt_model, messages), result["content"])
+        return result
+
+    async def answer(entry):
+        prompt_model = entry.get("model", default_model)
+        key = ResponseCache.key(prompt_model, entry["messages"])
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            result = {"content": cached, "ttft": 0.0, "total": 0.0, "cached": True}
+        else:
+            shared = key in in_flight
+            if not shared:
+                in_flight[key] = asyncio.ensure_future(fetch(prompt_model, entry["messages"]))
+            try:
+                result = {**await in_flight[key], "cached": shared}
+            except Exception as e:
+                result = {"content": None, "ttft": None, "total": None, "cached": False, "error": str(e)}
+        record = {"id": entry["id"], "model": prompt_model, **result}
+        if on_result:
+            on_result(record)
+        return record
+
+    return await asyncio.gather(*(answer(entry) for entry in prompts))
+
+def summarize(results: list) -> str:
+    sent = [r for r in results if not r["cached"] and r["total"] is not None]
+    failed = sum(1 for r in results if r.get("error"))
+    text = f"{len(results)} prompts, {len(sent)} sent, {len(results) - len(sent) - failed} cached, {failed} failed"
+    for name in ("ttft", "total"):
+        values = sorted(r[name] for r in sent if r[name] is not None)
+        if values:
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            text += f"\n{name}: median {statistics.median(values):.3f}s, p95 {p95:.3f}s, max {values[-1]:.3f}s"
+    return text
+
+async def run_batch(args) -> list:
+    async with httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency),
+        timeout=httpx.Timeout(300.0),
+    ) as async_client:
+        client = create_client(args.server_url, async_client)
+        cache = None if args.no_cache else ResponseCache(args.cache_file)
+        with open(args.output, "w") if args.output else open(os.devnull, "w") as out:
+            def on_result(record):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if not args.output:
+                    print(f"[{record['id']}] {record['content'] if not record.get('error') else 'Error: ' + record['error']}")
+
+            start = time.perf_counter()
+            results = await run_prompts(client, load_prompts(args.prompts), args.model, args.concurrency, cache, on_result)
+        print(summarize(results))
+        print(f"Wall time: {time.perf_counter() - start:.2f}s")
+        return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming Mistral chat client")
+    parser.add_argument("--prompts", help="JSONL file of prompts to run concurrently")
+    parser.add_argument("-o", "--output", help="Write results (reply, ttft, total) as JSONL")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Max requests in flight")
+    parser.add_argument("-m", "--model", default=model)
+    parser.add_argument("--system", default=None, help="System prompt for the interactive chat")
+    parser.add_argument("--cache-file", default=CACHE_FILE)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--server-url", default=None, help="API base URL, e.g. a local mock_ocr_server.py")
+    args = parser.parse_args()
+
+    if args.prompts:
+        asyncio.run(run_batch(args))
+        sys.exit(0)
 
-input = input("\nWhat's up?\n")
-print("\n")
-
-chat_response = client.chat.complete(
-    model= model,
-    messages = [
-        {
-            "role": "user",
-            "content": input,
-        },
-    ]
-)
-print(chat_response.choices[0].message.content)
\ No newline at end of file
+    conversation = Conversation(create_client(args.server_url), args.model,
+                                None if args.no_cache else ResponseCache(args.cache_file), args.system)
+    while True:
+        try:
+            prompt = input("\nWhat's up?\n")
+        except (EOFError, KeyboardInterrupt):
+            break
+        if prompt.strip() in ("", "exit", "quit"):
+            break
+        print("\n")
+        try:
+            result = conversation.ask(prompt)
+        except KeyboardInterrupt:
+            print("\n(interrupted)")
+            continue
+        except Exception as e:
+            print(f"\nError: {str(e)}")
+            continue
+        if result["ttft"] is not None:
+            print(f"\n(first token {result['ttft']:.2f}s, total {result['total']:.2f}s)")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Minimal local stand-in for the Mistral files/OCR/chat endpoints, for testing the
+# OCR and chat scripts without API key or network:
+#
+#   python mock_ocr_server.py --port 8765 --latency 0.5
+#   MISTRAL_API_KEY=dummy python batch_ocr.py docs/ --server-url http://127.0.0.1:8765
+#   MISTRAL_API_KEY=dummy python chat_test.py --prompts prompts.jsonl --server-url http://127.0.0.1:8765
+#
+# Every uploaded file gets one markdown page per PDF page (or per 10 kB for files
+# that are not real PDFs) with one small inline image, so the markdown/image code
+# paths are exercised too. Chat completions echo the last user message word by
+# word, streamed as server-sent events with --token-latency between chunks.
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PIXEL_PNG = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+
+class MockState:
+    def __init__(self, latency=0.0, fail_every=0, token_latency=0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.fail_every = fail_every
+        self.files = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def _should_fail(self):
+            with state.lock:
+                state.requests += 1
+                return state.fail_every and state.requests % state.fail_every == 0
+
+        def do_POST(self):
+            body = self._body()
+            time.sleep(state.latency)
+            if self._should_fail():
+                return self._send(503, {"message": "mock failure"})
+            if self.path.rstrip("/") == "/v1/files":
+                file_id = str(uuid.uuid4())
+                match = re.search(rb'filename="([^"]*)"', body)
+                filename = match.group(1).decode() if match else "upload"
+                n_pages = len(re.findall(rb"/Type\s*/Page(?!s)", body)) or len(body) // 10_000 + 1
+                with state.lock:
+                    state.files[file_id] = (len(body), n_pages)
+                return self._send(200, {
+                    "id": file_id, "object": "file", "size_bytes": len(body), "created_at": int(time.time()),
+                    "filename": filename, "purpose": "ocr", "sample_type": "ocr_input", "source": "upload",
+                })
+            if self.path.rstrip("/") == "/v1/ocr":
+                request = json.loads(body)
+                file_id = request["document"]["document_url"].rsplit("/", 1)[-1]
+                size, n_pages = state.files.get(file_id, (0, 1))
+                pages = request.get("pages") or list(range(n_pages))
+                include_images = request.get("include_image_base64")
+                return self._send(200, {
+                    "pages": [{
+                        "index": page,
+                        "markdown": f"# Page {page + 1}\n\nMock text for {file_id}.\n\n![img-{page}.png](img-{page}.png)\n",
+                        "images": [{
+                            "id": f"img-{page}.png", "top_left_x": 0, "top_left_y": 0,
+                            "bottom_right_x": 1, "bottom_right_y": 1,
+                            "image_base64": f"data:image/png;base64,{PIXEL_PNG}" if include_images else None,
+                        }],
+                        "dimensions": {"dpi": 200, "height": 2200, "width": 1700},
+                    } for page in pages if page < n_pages],
+                    "model": request.get("model", "mistral-ocr-latest"),
+                    "usage_info": {"pages_processed": len(pages), "doc_size_bytes": size},
+                })
+            if self.path.rstrip("/") == "/v1/chat/completions":
+                return self._chat(json.loads(body))
+            self._send(404, {"message": f"unknown endpoint {self.path}"})
+
+        def _chat(self, request):
+            prompt = next((m["content"] for m in reversed(request["messages"]) if m["role"] == "user"), "")
+            words = f"You said: {prompt}".split(" ")
+            model = request.get("model", "mistral-large-latest")
+            chat_id = str(uuid.uuid4())
+            usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(words),
+                     "total_tokens": len(prompt.split()) + len(words)}
+            if not request.get("stream"):
+                time.sleep(state.token_latency * len(words))
+                return self._send(200, {
+                    "id": chat_id, "object": "chat.completion", "model": model, "created": int(time.time()),
+                    "usage": usage,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)},
+                                 "finish_reason": "stop"}],
+                })
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            for i, word in enumerate(words):
+                time.sleep(state.token_latency)
+                last = i == len(words) - 1
+                chunk = {"id": chat_id, "model": model, "choices": [{
+                    "index": 0, "delta": {"role": "assistant", "content": word if i == 0 else " " + word},
+                    "finish_reason": "stop" if last else None,
+                }]}
+                if last:
+                    chunk["usage"] = usage
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def do_GET(self):
+            time.sleep(state.latency)
+            match = re.match(r"^/v1/files/([^/]+)/url", self.path)
+            if match:
+                host = self.headers.get("Host", "127.0.0.1")
+                return self._send(200, {"url": f"http://{host}/signed/{match.group(1)}"})
+            self._send(404, {"message": f"unknown endpoint {self.path}"})
+
+    return Handler
+
+def serve(host="127.0.0.1", port=8765, latency=0.0, fail_every=0, token_latency=0.0):
+    """Start the mock server in a background thread and return it (server.shutdown() to stop)."""
+    server = ThreadingHTTPServer((host, port), make_handler(MockState(latency, fail_every, token_latency)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the Mistral files/OCR API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of delay per request")
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every n-th POST with HTTP 503")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed chat chunks")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(MockState(args.latency, args.fail_every, args.token_latency)))
+    print(f"Mock OCR server on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,116 @@
+# Content-addressed on-disk cache for OCR responses.
+#
+# Entries are keyed by sha256(file bytes) + OCR model + include_image_base64, so a
+# renamed or re-sent duplicate PDF is answered locally without upload or OCR call.
+# Each entry is the raw OCRResponse as JSON; the total size is bounded and the least
+# recently used entries (by mtime, refreshed on every hit) are evicted first.
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from mistralai.models import OCRResponse
+
+DEFAULT_CACHE_DIR = Path(os.getenv("OCR_CACHE_DIR", Path.home() / ".cache" / "mistral_ocr"))
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2GB
+
+def file_digest(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+class OCRCache:
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(file_path: Path, model: str, include_image_base64: bool) -> str:
+        options = f"{model}:{int(include_image_base64)}".encode()
+        return f"{file_digest(file_path)}-{hashlib.sha256(options).hexdigest()[:16]}"
+
+    def _entry(self, key: str) -> Path:
+        # Two-level fan-out keeps directories small for large corpora
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> OCRResponse:
+        entry = self._entry(key)
+        try:
+            data = entry.read_text()
+        except FileNotFoundError:
+            return None
+        try:
+            response = OCRResponse.model_validate_json(data)
+        except ValueError:
+            entry.unlink(missing_ok=True)  # torn or outdated entry
+            return None
+        os.utime(entry)  # mark as recently used
+        return response
+
+    def put(self, key: str, response: OCRResponse) -> None:
+        entry = self._entry(key)
+        entry.parent.mkdir(exist_ok=True)
+        tmp = entry.with_name(f"{entry.name}.{threading.get_ident()}.tmp")
+        tmp.write_text(response.model_dump_json())
+        os.replace(tmp, entry)
+        self.evict()
+
+    def entries(self) -> list:
+        """(mtime, size, path) of all entries, oldest first."""
+        stats = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            stats.append((stat.st_mtime, stat.st_size, path))
+        return sorted(stats)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits max_bytes."""
+        removed = 0
+        with self.lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        for _, _, path in self.entries():
+            path.unlink(missing_ok=True)
+
+_default_cache = None
+
+def default_cache() -> OCRCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = OCRCache()
+    return _default_cache
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the OCR result cache")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+
+    cache = OCRCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+    entries = cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print(f"{cache.cache_dir}: {len(entries)} entries, {total / 1024 / 1024:.1f} of {cache.max_bytes / 1024 / 1024:.0f} MB")
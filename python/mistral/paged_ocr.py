@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# Page-range parallel OCR for large PDFs.
+#
+#   python paged_ocr.py scan.pdf --pages-per-request 8 --workers 4
+#
+# The document is uploaded once, then page ranges are OCR'd in parallel requests
+# (ocr.process(pages=[...])). Every page is written to <stem>_pages/ as soon as its
+# range returns, so output starts after the first range and a crash or timeout
+# only loses the ranges in flight: a restart skips all pages already on disk.
+# When every page is there they are stitched into <stem>.md in page order, and the
+# range responses (kept next to the pages) are merged into one OCR cache entry.
+# Needs pypdf for the page count; without it the whole-document path is used.
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from mistralai import DocumentURLChunk, Mistral
+from mistralai.models import OCRResponse
+
+from ocr_cache import OCRCache, default_cache
+from structured_ocr import (MAX_FILE_SIZE, OCR_MODEL, PdfReader, ImageExtractor, backoff_delay, get_client,
+                            is_retryable, merge_responses, page_markdowns, process_pdf, upload_for_ocr)
+
+PAGES_PER_REQUEST = 8
+CHECKPOINT_NAME = "checkpoint.json"
+
+def page_count(file_path: Path) -> int:
+    return len(PdfReader(file_path).pages) if PdfReader is not None else None
+
+def page_ranges(n_pages: int, pages_per_request: int) -> list:
+    return [list(range(start, min(start + pages_per_request, n_pages)))
+            for start in range(0, n_pages, pages_per_request)]
+
+def ocr_pages_with_retry(client: Mistral, signed_url: str, pages: list, max_retries: int = 3) -> OCRResponse:
+    for attempt in range(max_retries):
+        try:
+            return client.ocr.process(
+                document=DocumentURLChunk(document_url=signed_url),
+                model=OCR_MODEL,
+                pages=pages,
+                include_image_base64=True
+            )
+        except Exception as e:
+            if not is_retryable(e) or attempt == max_retries - 1:
+                raise
+            time.sleep(backoff_delay(attempt))
+
+class PageCheckpoint:
+    """Per-page markdown files plus a checkpoint.json identifying the source file."""
+
+    def __init__(self, page_dir: Path, file_path: Path):
+        self.page_dir = page_dir
+        stat = file_path.stat()
+        self.source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "model": OCR_MODEL}
+        self.n_pages = None
+        checkpoint = page_dir / CHECKPOINT_NAME
+        if checkpoint.exists():
+            state = json.loads(checkpoint.read_text())
+            if state.get("source") == self.source:
+                self.n_pages = state["n_pages"]
+            else:
+                shutil.rmtree(page_dir)  # pages of an older version of the file
+        page_dir.mkdir(parents=True, exist_ok=True)
+
+    def page_path(self, index: int) -> Path:
+        return self.page_dir / f"page_{index + 1:05d}.md"
+
+    def is_done(self, pages: list) -> bool:
+        return all(self.page_path(index).exists() for index in pages)
+
+    def write_page(self, index: int, markdown: str) -> None:
+        path = self.page_path(index)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(markdown)
+        os.replace(tmp, path)
+
+    def write_response(self, pages: list, response: OCRResponse) -> None:
+        path = self.page_dir / f"range_{pages[0] + 1:05d}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(response.model_dump_json())
+        os.replace(tmp, path)
+
+    def merged_response(self) -> OCRResponse:
+        """All range responses as one, or None if they don't cover every page."""
+        responses = [OCRResponse.model_validate_json(path.read_text())
+                     for path in sorted(self.page_dir.glob("range_*.json"))]
+        merged = merge_responses(responses)
+        return merged if [page.index for page in merged.pages] == list(range(self.n_pages)) else None
+
+    def save(self, n_pages: int) -> None:
+        self.n_pages = n_pages
+        (self.page_dir / CHECKPOINT_NAME).write_text(json.dumps({"source": self.source, "n_pages": n_pages}))
+
+    def stitch(self, output_path: Path) -> None:
+        with open(output_path, "w") as out:
+            for index in range(self.n_pages):
+                if index:
+                    out.write("\n\n")
+                with open(self.page_path(index)) as page:
+                    shutil.copyfileobj(page, out)
+
+def process_pdf_pages(file_path: Path, client: Mistral = None, output_path: Path = None, cache: OCRCache = None,
+                      extract_images: bool = False, pages_per_request: int = PAGES_PER_REQUEST,
+                      workers: int = 4, keep_pages: bool = False) -> Path:
+    """Like process_pdf, but OCRs page ranges in parallel and checkpoints every page."""
+    cache = default_cache() if cache is None else cache
+    if cache and cache.get(cache.key(file_path, OCR_MODEL, True)) is not None:
+        return process_pdf(file_path, client, output_path, cache, extract_images)
+    if file_path.stat().st_size > MAX_FILE_SIZE or PdfReader is None:
+        print("Paged OCR needs pypdf and a file below 100MB, processing the whole document")
+        return process_pdf(file_path, client, output_path, cache, extract_images)
+
+    output_path = output_path or file_path.with_suffix('.md')
+    checkpoint = PageCheckpoint(output_path.with_name(f"{output_path.stem}_pages"), file_path)
+    n_pages = checkpoint.n_pages or page_count(file_path)
+    checkpoint.save(n_pages)
+    pending = [pages for pages in page_ranges(n_pages, pages_per_request) if not checkpoint.is_done(pages)]
+    print(f"{file_path.name}: {n_pages} pages, {len(pending)} of {-(-n_pages // pages_per_request)} ranges to OCR")
+
+    if pending:
+        client = client or get_client()
+        signed_url = upload_for_ocr(client, file_path)
+        extractor = ImageExtractor(output_path.with_name(f"{output_path.stem}_images"), output_path.parent) \
+            if extract_images else None
+        start, failed = time.monotonic(), []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(ocr_pages_with_retry, client, signed_url, pages): pages for pages in pending}
+            # Pages are written here in the calling thread, so the extractor needs no locking
+            for future in as_completed(futures):
+                pages = futures[future]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    print(f"Pages {pages[0] + 1}-{pages[-1] + 1} failed: {str(e)}")
+                    failed.append(pages)
+                    continue
+                for page, markdown in zip(response.pages, page_markdowns(response, extractor)):
+                    checkpoint.write_page(page.index, markdown)
+                if cache:
+                    checkpoint.write_response(pages, response)
+                if not checkpoint.is_done(pages):
+                    missing = [index + 1 for index in pages if not checkpoint.page_path(index).exists()]
+                    print(f"Pages {pages[0] + 1}-{pages[-1] + 1} incomplete, missing {missing}")
+                    failed.append(pages)
+                    continue
+                print(f"Pages {pages[0] + 1}-{pages[-1] + 1} done after {time.monotonic() - start:.1f}s")
+        if failed:
+            raise RuntimeError(f"{len(failed)} page ranges failed, run again to resume")
+
+    if cache:
+        # Same cache entry as process_pdf would write, so later runs (paged or not) skip the OCR
+        merged = checkpoint.merged_response()
+        if merged is not None:
+            cache.put(cache.key(file_path, OCR_MODEL, True), merged)
+    checkpoint.stitch(output_path)
+    if not keep_pages:
+        shutil.rmtree(checkpoint.page_dir)
+    print(f"Successfully saved markdown to: {output_path}")
+    return output_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Page-range parallel OCR with per-page checkpoints")
+    parser.add_argument("pdf", type=Path)
+    parser.add_argument("-p", "--pages-per-request", type=int, default=PAGES_PER_REQUEST)
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Page ranges OCR'd concurrently")
+    parser.add_argument("-o", "--output", type=Path, default=None)
+    parser.add_argument("--extract-images", action="store_true", help="Write images as files next to the .md")
+    parser.add_argument("--keep-pages", action="store_true", help="Keep the per-page files after stitching")
+    args = parser.parse_args()
+
+    if not args.pdf.is_file():
+        print(f"Error: File not found: {args.pdf}")
+        sys.exit(1)
+
+    process_pdf_pages(args.pdf, output_path=args.output, extract_images=args.extract_images,
+                      pages_per_request=args.pages_per_request, workers=args.workers, keep_pages=args.keep_pages)
@@ -5,95 +5,263 @@ from pathlib import Path
 from mistralai import Mistral
 from dotenv import load_dotenv
 from mistralai import DocumentURLChunk, ImageURLChunk, TextChunk
+import base64
+import hashlib
+import io
 import json
+import mimetypes
+import random
+import re
 import sys
-from mistralai.models import OCRResponse
+import time
+from contextlib import ExitStack
+from mistralai.models import OCRResponse, OCRUsageInfo, SDKError
 import httpx
 
+try:
+    from pypdf import PdfReader, PdfWriter  # optional, only needed to split oversize PDFs
+except ImportError:
+    PdfReader = PdfWriter = None
+
+from ocr_cache import OCRCache, default_cache
+
 # Maximum file size (100MB)
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB in bytes
 
+OCR_MODEL = "mistral-ocr-latest"
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Retrieve the API key from the environment variable
-api_key = os.getenv("MISTRAL_API_KEY")
-if not api_key:
-    print("Error: MISTRAL_API_KEY not found in environment variables")
-    sys.exit(1)
+client = None
+
+def create_client(server_url: str = None, http_client: httpx.Client = None) -> Mistral:
+    # Retrieve the API key from the environment variable
+    api_key = os.getenv("MISTRAL_API_KEY")
+    if not api_key:
+        print("Error: MISTRAL_API_KEY not found in environment variables")
+        sys.exit(1)
+
+    # Initialize the Mistral client with the API key and custom timeout
+    return Mistral(
+        api_key=api_key,
+        server_url=server_url,  # e.g. a local mock server for testing
+        client=http_client,
+        timeout_ms=300000,  # 5 minutes timeout (300000 milliseconds)
+    )
 
-# Initialize the Mistral client with the API key and custom timeout
-client = Mistral(
-    api_key=api_key,
-    timeout_ms=300000,  # 5 minutes timeout (300000 milliseconds)
-)
+def get_client() -> Mistral:
+    # The default client is created on first use, so importing this module is side-effect free
+    global client
+    if client is None:
+        client = create_client()
+    return client
 
 def check_file_size(file_path: Path) -> bool:
     size = file_path.stat().st_size
     if size > MAX_FILE_SIZE:
-        print(f"Error: File size ({size/1024/1024:.2f}MB) exceeds maximum allowed size (100MB)")
+        if PdfReader is not None:
+            print(f"File size ({size/1024/1024:.2f}MB) exceeds 100MB, splitting by page range")
+            return True
+        print(f"Error: File size ({size/1024/1024:.2f}MB) exceeds maximum allowed size (100MB), install pypdf to split it")
         return False
     return True
 
-def upload_file_with_retry(file_path: Path, max_retries: int = 3) -> any:
-    for attempt in range(max_retries):
-        try:
-            return client.files.upload(
-                file={
-                    "file_name": file_path.stem,
-                    "content": file_path.read_bytes(),
-                },
-                purpose="ocr",
-            )
-        except (httpx.RemoteProtocolError, httpx.ReadTimeout) as e:
-            if attempt == max_retries - 1:
-                print(f"Error: Failed to upload file after {max_retries} attempts: {str(e)}")
-                raise
-            print(f"Attempt {attempt + 1} failed, retrying...")
-            continue
-
-def process_pdf(file_path: Path) -> None:
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, httpx.TransportError):  # connection resets, timeouts, protocol errors
+        return True
+    return isinstance(e, SDKError) and (e.status_code == 429 or e.status_code >= 500)
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    # Exponential backoff with full jitter, so concurrent uploads don't retry in lockstep
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def upload_file_with_retry(file_path: Path, max_retries: int = 3, client: Mistral = None,
+                           content: bytes = None, file_name: str = None) -> any:
+    """Upload a file (or an in-memory part via `content`) without reading it into memory.
+
+    The file is opened once and streamed in chunks by httpx; a retry rewinds the
+    same file object instead of loading the file again.
+    """
+    client = client or get_client()
+    file_name = file_name or file_path.stem
+    with ExitStack() as stack:
+        if content is None:
+            content = stack.enter_context(open(file_path, "rb"))
+        for attempt in range(max_retries):
+            if not isinstance(content, bytes):
+                content.seek(0)
+            try:
+                return client.files.upload(
+                    file={
+                        "file_name": file_name,
+                        "content": content,
+                    },
+                    purpose="ocr",
+                )
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if attempt == max_retries - 1:
+                    print(f"Error: Failed to upload file after {max_retries} attempts: {str(e)}")
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"Attempt {attempt + 1} failed, retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+def split_pdf(file_path: Path, max_bytes: int = MAX_FILE_SIZE):
+    """Yield (first_page, BytesIO) parts of a PDF that each stay below max_bytes.
+
+    Parts are built one at a time; the page count per part is estimated from the
+    average page size and halved until the written part fits.
+    """
+    reader = PdfReader(file_path)
+    n_pages = len(reader.pages)
+    per_part = max(1, int(n_pages * max_bytes * 0.9 / file_path.stat().st_size))
+    start = 0
+    while start < n_pages:
+        count = min(per_part, n_pages - start)
+        while True:
+            writer = PdfWriter()
+            for page in reader.pages[start:start + count]:
+                writer.add_page(page)
+            part = io.BytesIO()
+            writer.write(part)
+            if part.tell() <= max_bytes:
+                break
+            if count == 1:
+                raise ValueError(f"Page {start + 1} alone exceeds the maximum upload size")
+            count //= 2
+        yield start, part
+        start += count
+
+def upload_for_ocr(client: Mistral, file_path: Path, content: bytes = None, file_name: str = None) -> str:
+    print(f"Uploading file: {file_name or file_path.name}")
+    uploaded_file = upload_file_with_retry(file_path, client=client, content=content, file_name=file_name)
+
+    print("Getting signed URL...")
+    return client.files.get_signed_url(file_id=uploaded_file.id, expiry=1).url
+
+def ocr_document(client: Mistral, file_path: Path, content: bytes = None, file_name: str = None) -> OCRResponse:
+    signed_url = upload_for_ocr(client, file_path, content, file_name)
+
+    print("Processing OCR...")
+    return client.ocr.process(
+        document=DocumentURLChunk(document_url=signed_url),
+        model=OCR_MODEL,
+        include_image_base64=True
+    )
+
+def ocr_file(client: Mistral, file_path: Path) -> OCRResponse:
+    """OCR a PDF; files above MAX_FILE_SIZE are OCR'd in page-range parts and merged."""
+    if file_path.stat().st_size <= MAX_FILE_SIZE:
+        return ocr_document(client, file_path)
+
+    responses = []
+    for first_page, part in split_pdf(file_path, MAX_FILE_SIZE):
+        response = ocr_document(client, file_path, content=part.getvalue(), file_name=f"{file_path.stem}_p{first_page + 1}")
+        for page in response.pages:
+            page.index += first_page
+        responses.append(response)
+    return merge_responses(responses)
+
+def merge_responses(responses: list) -> OCRResponse:
+    """One response from responses for different pages (page indices relative to the whole document)."""
+    pages = {page.index: page for response in responses for page in response.pages}
+    return OCRResponse(
+        pages=[pages[index] for index in sorted(pages)],
+        model=responses[-1].model if responses else OCR_MODEL,
+        usage_info=OCRUsageInfo(pages_processed=sum(r.usage_info.pages_processed for r in responses)),
+    )
+
+def process_pdf(file_path: Path, client: Mistral = None, output_path: Path = None, cache: OCRCache = None,
+                extract_images: bool = False) -> Path:
+    # cache=None uses the default on-disk cache, cache=False disables it
+    cache = default_cache() if cache is None else cache
     try:
         if not check_file_size(file_path):
-            return
+            return None
 
-        print(f"Uploading file: {file_path.name}")
-        uploaded_file = upload_file_with_retry(file_path)
-        
-        print("Getting signed URL...")
-        signed_url = client.files.get_signed_url(file_id=uploaded_file.id, expiry=1)
-
-        print("Processing OCR...")
-        pdf_response = client.ocr.process(
-            document=DocumentURLChunk(document_url=signed_url.url),
-            model="mistral-ocr-latest",
-            include_image_base64=True
-        )
+        cache_key = cache.key(file_path, OCR_MODEL, True) if cache else None
+        pdf_response = cache.get(cache_key) if cache else None
+        if pdf_response is not None:
+            print(f"Using cached OCR result for: {file_path.name}")
+        else:
+            pdf_response = ocr_file(client or get_client(), file_path)
+            if cache:
+                cache.put(cache_key, pdf_response)
 
         # Convert response to markdown and save in the same folder as input
-        pdf_markdown = get_combined_markdown(pdf_response)
-        output_path = file_path.with_suffix('.md')
-        output_path.write_text(pdf_markdown)
+        output_path = output_path or file_path.with_suffix('.md')
+        image_dir = output_path.with_name(f"{output_path.stem}_images") if extract_images else None
+        write_markdown(pdf_response, output_path, image_dir)
         print(f"Successfully saved markdown to: {output_path}")
+        return output_path
 
     except Exception as e:
         print(f"Error processing PDF: {str(e)}")
         raise
 
+# ![alt](target) - OCR pages reference their images as ![img-0.jpeg](img-0.jpeg)
+IMAGE_REF = re.compile(r"!\[([^\]]*)\]\(([^)\s]+)\)")
+
 def replace_images_in_markdown(markdown_str: str, images_dict: dict) -> str:
-    for img_name, base64_str in images_dict.items():
-        markdown_str = markdown_str.replace(f"![{img_name}]({img_name})", f"![{img_name}]({base64_str})")
-    return markdown_str
+    """Point image references at images_dict[name] in one pass over the markdown."""
+    def substitute(match: re.Match) -> str:
+        name, target = match.groups()
+        replacement = images_dict.get(target)
+        if name != target or replacement is None:
+            return match.group(0)
+        return f"![{name}]({replacement})"
 
-def get_combined_markdown(ocr_response: OCRResponse) -> str:
-    markdowns: list[str] = []
+    return IMAGE_REF.sub(substitute, markdown_str)
+
+class ImageExtractor:
+    """Decodes base64 page images into files, deduplicated by content hash."""
+
+    def __init__(self, image_dir: Path, markdown_dir: Path):
+        self.image_dir = image_dir
+        self.markdown_dir = markdown_dir
+        self.written = {}  # sha256 -> relative link
+
+    def save(self, img_id: str, data_uri: str) -> str:
+        header, _, payload = data_uri.partition(",") if data_uri.startswith("data:") else ("", "", data_uri)
+        data = base64.b64decode(payload)
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self.written:
+            suffix = Path(img_id).suffix or mimetypes.guess_extension(header[5:].split(";")[0]) or ".bin"
+            self.image_dir.mkdir(parents=True, exist_ok=True)
+            image_path = self.image_dir / f"{digest[:16]}{suffix}"
+            if not image_path.exists():
+                image_path.write_bytes(data)
+            self.written[digest] = Path(os.path.relpath(image_path, self.markdown_dir)).as_posix()
+        return self.written[digest]
+
+def page_markdowns(ocr_response: OCRResponse, extractor: ImageExtractor = None):
+    """Yield the markdown of each page with images inlined (or linked via the extractor)."""
     for page in ocr_response.pages:
         image_data = {}
         for img in page.images:
-            image_data[img.id] = img.image_base64
-        markdowns.append(replace_images_in_markdown(page.markdown, image_data))
+            if img.image_base64 is None:
+                continue
+            image_data[img.id] = extractor.save(img.id, img.image_base64) if extractor else img.image_base64
+        yield replace_images_in_markdown(page.markdown, image_data)
+
+def get_combined_markdown(ocr_response: OCRResponse) -> str:
+    return "\n\n".join(page_markdowns(ocr_response))
+
+def write_markdown(ocr_response: OCRResponse, output_path: Path, image_dir: Path = None) -> None:
+    """Write the pages to output_path one at a time instead of building one big string.
 
-    return "\n\n".join(markdowns)
+    With image_dir the base64 images are written there as files and linked
+    relatively, which keeps the markdown small.
+    """
+    extractor = ImageExtractor(image_dir, output_path.parent) if image_dir else None
+    with open(output_path, "w") as f:
+        for i, markdown in enumerate(page_markdowns(ocr_response, extractor)):
+            if i:
+                f.write("\n\n")
+            f.write(markdown)
 
 if __name__ == "__main__":
     pdf_file = Path(input("Enter the path of the PDF file: "))
@@ -102,4 +270,4 @@ if __name__ == "__main__":
         print(f"Error: File not found: {pdf_file}")
         sys.exit(1)
         
-    process_pdf(pdf_file)
+    process_pdf(pdf_file, extract_images="--extract-images" in sys.argv)